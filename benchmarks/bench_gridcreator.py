@@ -0,0 +1,199 @@
+"""
+Benchmarks of the grid creator (airspeed velocity, https://asv.readthedocs.io)
+
+    asv run            # benchmark the current commit
+    asv continuous main HEAD
+    asv publish && asv preview
+
+The grids are built from synthetic layer and parameter tables with KMAX from 10^2 to 10^6.
+time_* benchmarks record run time, peakmem_* peak memory and track_*_throughput
+the number of control volumes processed per second.
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from ftu.FreThaw1D_gridcreator import (grid1D, set_parameters, set_initial_condition,
+                                       write_grid_netCDF, main as make_grid)
+
+KMAX = [10**2, 10**3, 10**4, 10**5, 10**6]
+
+DEPTH = 100.0
+
+
+def grid_table(kmax, grid_type):
+    """ layers of a DEPTH m column with about kmax control volumes """
+    if grid_type == 'exponential':
+        return pd.DataFrame({'Type': ['L', 'L'], 'eta': [0.0, -DEPTH], 'K': [0, 0],
+                             'rheologyID': [1, 1], 'parameterID': [0, 0]})
+
+    eta = np.array([0.0, -1.0, -5.0, -20.0, -DEPTH])
+    K = np.append(np.diff(np.linspace(0, kmax, eta.size)).astype(int), 0)
+    return pd.DataFrame({'Type': ['L'] * eta.size, 'eta': eta, 'K': K,
+                         'rheologyID': [1] * eta.size, 'parameterID': [0, 1, 2, 3, 0]})
+
+
+def exponential_options(kmax):
+    """ (dz_min, b) of an exponential grid with kmax control volumes over DEPTH m """
+    b = 2.0 / kmax
+    dz_min = DEPTH * b / np.expm1(kmax * np.log1p(b))
+    return dz_min, b
+
+
+def parameter_table(n=4):
+    return pd.DataFrame({'spDensity': np.full(n, 2650.0), 'spConductivity': np.linspace(2, 3, n),
+                         'spSpecificHeatCapacity': np.full(n, 900.0), 'thetaS': np.linspace(0.3, 0.45, n),
+                         'thetaR': np.full(n, 0.05), 'meltingT': np.full(n, 273.15),
+                         'par1': np.full(n, 1.5), 'par2': np.full(n, 0.5), 'par3': np.nan, 'par4': np.nan})
+
+
+def ic_table():
+    return pd.DataFrame({'eta': [0.0, -2.0, -10.0, -DEPTH], 'T0': [270.0, 271.5, 272.5, 274.0]})
+
+
+def _quiet():
+    """ context discarding stdout (write_grid_netCDF and make_grid print a line per grid) """
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+def _throughput(fn, kmax):
+    n, t = timeit.Timer(fn).autorange()
+    return kmax * n / t
+
+
+class Grid1D:
+    params = (KMAX, ['classical', 'exponential'])
+    param_names = ['KMAX', 'grid_type']
+    timeout = 600
+
+    def setup(self, kmax, grid_type):
+        self.data_grid = grid_table(kmax, grid_type)
+        self.dz_min, self.b = exponential_options(kmax)
+
+    def _build(self, kmax, grid_type):
+        return grid1D(self.data_grid, self.dz_min, self.b, grid_type)
+
+    def time_grid1D(self, kmax, grid_type):
+        self._build(kmax, grid_type)
+
+    def peakmem_grid1D(self, kmax, grid_type):
+        self._build(kmax, grid_type)
+
+    def track_grid1D_throughput(self, kmax, grid_type):
+        return _throughput(lambda: self._build(kmax, grid_type), kmax)
+    track_grid1D_throughput.unit = "control volumes/s"
+
+
+class Parameters:
+    params = KMAX
+    param_names = ['KMAX']
+    timeout = 600
+
+    def setup(self, kmax):
+        self.data_grid = grid_table(kmax, 'classical')
+        self.data_parameter = parameter_table()
+        self.KMAX, self.eta = grid1D(self.data_grid, None, None, 'classical')[:2]
+
+    def time_set_parameters(self, kmax):
+        set_parameters(self.data_grid, self.data_parameter, self.KMAX, self.eta)
+
+    def peakmem_set_parameters(self, kmax):
+        set_parameters(self.data_grid, self.data_parameter, self.KMAX, self.eta)
+
+    def track_set_parameters_throughput(self, kmax):
+        return _throughput(lambda: set_parameters(self.data_grid, self.data_parameter, self.KMAX, self.eta), kmax)
+    track_set_parameters_throughput.unit = "control volumes/s"
+
+
+class InitialCondition:
+    params = KMAX
+    param_names = ['KMAX']
+    timeout = 600
+
+    def setup(self, kmax):
+        self.data_ic = ic_table()
+        self.eta = grid1D(grid_table(kmax, 'classical'), None, None, 'classical')[1]
+
+    def time_set_initial_condition(self, kmax):
+        set_initial_condition(self.data_ic, self.eta, 'linear')
+
+    def peakmem_set_initial_condition(self, kmax):
+        set_initial_condition(self.data_ic, self.eta, 'linear')
+
+    def track_set_initial_condition_throughput(self, kmax):
+        return _throughput(lambda: set_initial_condition(self.data_ic, self.eta, 'linear'), kmax)
+    track_set_initial_condition_throughput.unit = "control volumes/s"
+
+
+class WriteGrid:
+    params = KMAX
+    param_names = ['KMAX']
+    timeout = 600
+
+    def setup(self, kmax):
+        self.tmp = tempfile.TemporaryDirectory()
+        data_grid = grid_table(kmax, 'classical')
+        [KMAX, eta, eta_dual, space_delta, z, z_dual, control_volume] = grid1D(data_grid, None, None, 'classical')
+        ic = set_initial_condition(ic_table(), eta, 'linear')
+        p = set_parameters(data_grid, parameter_table(), KMAX, eta)
+        self.args = [eta, eta_dual, z, z_dual, space_delta, control_volume, ic, p['rheologyID'], p['parameterID'], KMAX,
+                     p['soilParticlesDensity'], p['thermalConductivitySoilParticles'], p['specificThermalCapacitySoilParticles'],
+                     p['thetaS'], p['thetaR'], p['meltingTemperature'], p['par1'], p['par2'], p['par3'], p['par4'],
+                     os.path.join(self.tmp.name, 'grid.nc'), 'benchmark', '', '', '', 'grid.csv', 'parameter.csv']
+
+    def teardown(self, kmax):
+        self.tmp.cleanup()
+
+    def time_write_grid_netCDF(self, kmax):
+        with _quiet():
+            write_grid_netCDF(*self.args)
+
+    def peakmem_write_grid_netCDF(self, kmax):
+        with _quiet():
+            write_grid_netCDF(*self.args)
+
+    def track_write_grid_netCDF_throughput(self, kmax):
+        with _quiet():
+            return _throughput(lambda: write_grid_netCDF(*self.args), kmax)
+    track_write_grid_netCDF_throughput.unit = "control volumes/s"
+
+
+class MakeGrid:
+    params = (KMAX, ['classical', 'exponential'])
+    param_names = ['KMAX', 'grid_type']
+    timeout = 600
+
+    def setup(self, kmax, grid_type):
+        self.tmp = tempfile.TemporaryDirectory()
+        files = {name: os.path.join(self.tmp.name, f"{name}.csv") for name in ['grid', 'ic', 'parameter']}
+        grid_table(kmax, grid_type).to_csv(files['grid'], index=False)
+        ic_table().to_csv(files['ic'], index=False)
+        parameter_table().to_csv(files['parameter'], index=False)
+        dz_min, b = exponential_options(kmax)
+        self.args = argparse.Namespace(grid_input_file_name=files['grid'], ic_input_file_name=files['ic'],
+                                       parameter_input_file_name=files['parameter'],
+                                       output_file_name=os.path.join(self.tmp.name, 'grid.nc'),
+                                       dz_min=dz_min, b=b, grid_type=grid_type, interp_model='linear',
+                                       output_title='benchmark', output_institution='', output_summary='')
+
+    def teardown(self, kmax, grid_type):
+        self.tmp.cleanup()
+
+    def time_make_grid(self, kmax, grid_type):
+        with _quiet():
+            make_grid(self.args)
+
+    def peakmem_make_grid(self, kmax, grid_type):
+        with _quiet():
+            make_grid(self.args)
+
+    def track_make_grid_throughput(self, kmax, grid_type):
+        with _quiet():
+            return _throughput(lambda: make_grid(self.args), kmax)
+    track_make_grid_throughput.unit = "control volumes/s"
@@ -101,11 +101,9 @@ def build_grid(data_grid):
     KMAX = int(data_grid['K'].sum())
 #     VECTOR_LENGTH = int(np.ceil(data_grid['K'].sum())*size_factor)
 
-    
-    # list containing centroids coordinates
-    tmp_eta = []
-    # list containing control volumes interface coordinates
-    tmp_eta_dual = []
+    grid_eta = data_grid['eta'].to_numpy(dtype=float)
+    grid_K = data_grid['K'].to_numpy(dtype=int)
+    grid_type = data_grid['Type'].to_numpy()
     
     # array containing centroids coordinates measured along eta
     eta = np.zeros(KMAX,dtype=float)
@@ -115,70 +113,78 @@ def build_grid(data_grid):
     z = np.zeros(KMAX,dtype=float)
     # array containing control volumes interface coordinates measured along z
     z_dual = np.zeros(KMAX+1,dtype=float)
-    # array containing distances between centroids (used to compute gradient)
-    space_delta = np.zeros(KMAX+1,dtype=float)
-    # array containing control volume size
-    control_volume = np.zeros(KMAX,dtype=float)
-
-
 
+    # each layer contributes one segment of centroids and one of interfaces, 
+    # from the bottom of the column upward. The segments are written in preallocated 
+    # buffers and the interfaces shared by adjacent segments are removed at the end
+    tmp_eta = np.zeros(grid_K[:-1].sum(), dtype=float)
+    tmp_eta_dual = np.zeros(grid_K[:-1].sum() + grid_K.size - 1, dtype=float)
+    n_eta = 0
+    n_eta_dual = 0
     
-    for i in range(np.size(data_grid.index)-1,0,-1):
+    for i in range(np.size(grid_eta)-1,0,-1):
         
-        if data_grid['Type'][i]=='L' and data_grid['Type'][i-1]=='L':
+        K = grid_K[i-1]
+        deta = (grid_eta[i]-grid_eta[i-1])/K
+
+        if grid_type[i]=='L' and grid_type[i-1]=='L':
             
-            deta = ( data_grid['eta'][i]-data_grid['eta'][i-1])/data_grid['K'][i-1]
-            tmp_eta=np.append(tmp_eta, np.linspace(data_grid['eta'][i]-deta/2,data_grid['eta'][i-1]+deta/2,num=data_grid['K'][i-1],endpoint=True) )
-            tmp_eta_dual=np.append(tmp_eta_dual, np.linspace(data_grid['eta'][i],data_grid['eta'][i-1],num=data_grid['K'][i-1]+1,endpoint=True) )
+            segment_eta = np.linspace(grid_eta[i]-deta/2,grid_eta[i-1]+deta/2,num=K,endpoint=True)
+            segment_eta_dual = np.linspace(grid_eta[i],grid_eta[i-1],num=K+1,endpoint=True)
             
-        elif data_grid['Type'][i]=='L' and data_grid['Type'][i-1]=='M':
+        elif grid_type[i]=='L' and grid_type[i-1]=='M':
             
-            deta = ( data_grid['eta'][i]-data_grid['eta'][i-1])/data_grid['K'][i-1]
-            tmp_eta=np.append(tmp_eta, np.linspace(data_grid['eta'][i]-deta/2,data_grid['eta'][i-1],num=data_grid['K'][i-1],endpoint=True) )
-            tmp_eta_dual=np.append(tmp_eta_dual, np.linspace(data_grid['eta'][i],data_grid['eta'][i-1]+deta/2,num=data_grid['K'][i-1],endpoint=True) )
+            segment_eta = np.linspace(grid_eta[i]-deta/2,grid_eta[i-1],num=K,endpoint=True)
+            segment_eta_dual = np.linspace(grid_eta[i],grid_eta[i-1]+deta/2,num=K,endpoint=True)
             
-        elif data_grid['Type'][i]=='M' and data_grid['Type'][i-1]=='L':
+        elif grid_type[i]=='M' and grid_type[i-1]=='L':
             
-            deta = ( data_grid['eta'][i]-data_grid['eta'][i-1])/data_grid['K'][i-1]
-            tmp_eta=np.append(tmp_eta, np.linspace(data_grid['eta'][i],data_grid['eta'][i-1]+deta/2,num=data_grid['K'][i-1],endpoint=True) )
-            tmp_eta_dual=np.append(tmp_eta_dual, np.linspace(data_grid['eta'][i]-deta/2,data_grid['eta'][i-1],num=data_grid['K'][i-1],endpoint=True) )
+            segment_eta = np.linspace(grid_eta[i],grid_eta[i-1]+deta/2,num=K,endpoint=True)
+            segment_eta_dual = np.linspace(grid_eta[i]-deta/2,grid_eta[i-1],num=K,endpoint=True)
             
         else:
-            print("ERROR!!")  
+            print("ERROR!!")
+            continue
+
+        tmp_eta[n_eta:n_eta+segment_eta.size] = segment_eta
+        tmp_eta_dual[n_eta_dual:n_eta_dual+segment_eta_dual.size] = segment_eta_dual
+        n_eta += segment_eta.size
+        n_eta_dual += segment_eta_dual.size
         
     # to eliminate doubles
-    tmp_eta=[ii for n,ii in enumerate(tmp_eta) if ii not in tmp_eta[:n]]
-    tmp_eta_dual=[ii for n,ii in enumerate(tmp_eta_dual) if ii not in tmp_eta_dual[:n]]
+    tmp_eta = _drop_duplicates(tmp_eta[:n_eta])
+    tmp_eta_dual = _drop_duplicates(tmp_eta_dual[:n_eta_dual])
 
-    # move from list to array
-    for i in range(0,len(tmp_eta)):
-        
-        eta[i] = tmp_eta[i]
-        z[i] = tmp_eta[i] - data_grid['eta'][np.size(data_grid['eta'])-1]
-        
-    for i in range(0,len(tmp_eta_dual)):
-        
-        eta_dual[i] = tmp_eta_dual[i]
-        z_dual[i] = tmp_eta_dual[i] - data_grid['eta'][np.size(data_grid['eta'])-1]
-        
-        if i==0:
-            
-            space_delta[i] = np.abs(eta_dual[i]-eta[i])
-            
-        elif i==np.size(eta_dual)-1:
-            
-            space_delta[i] = np.abs(eta_dual[i]-eta[i-1])
-            
-        else:
-            
-            space_delta[i] = np.abs(eta[i-1]-eta[i]) 
-           
-    for i in range(0,len(eta_dual)-1):
-        control_volume[i] = np.abs(eta_dual[i]-eta_dual[i+1])        
+    # move to the output arrays
+    eta[:tmp_eta.size] = tmp_eta
+    z[:tmp_eta.size] = tmp_eta - grid_eta[-1]
+    eta_dual[:tmp_eta_dual.size] = tmp_eta_dual
+    z_dual[:tmp_eta_dual.size] = tmp_eta_dual - grid_eta[-1]
+    
+    space_delta, control_volume = _dual_spacing(eta, eta_dual)
         
     return [KMAX, eta, eta_dual, space_delta, z, z_dual, control_volume]
 
 
+def _drop_duplicates(x, rtol=1E-12):
+    '''
+    Remove the values of x that are equal, within a tolerance, to a previous value of x. 
+    The order of the remaining values is preserved.
+    '''
+    if x.size < 2:
+        return x
+    
+    tol = rtol * max(1.0, np.max(np.abs(x)))
+    
+    # a stable sort keeps the first occurrence in front of its duplicates
+    order = np.argsort(x, kind='stable')
+    duplicate = np.diff(x[order]) <= tol
+    keep = np.ones(x.size, dtype=bool)
+    keep[order[1:][duplicate]] = False
+    
+    return x[keep]
+
+
 def build_grid_exponential(data_grid, dz_min, b):
     '''
     This function creates the geometry of 1D grid for a finite volume numerical. The discretizion is 
@@ -222,79 +228,123 @@ def build_grid_exponential(data_grid, dz_min, b):
         
     '''
   
-    # list containing layer thickness
-    tmp_dz = []
-
     z_max = -data_grid['eta'][1]
-    dz_sum = 0
-    k = 0
-    while (z_max-dz_sum)>1E-12:
-
-        tmp_dz.append(dz_min*(1+b)**k)
-        dz_sum = dz_sum + dz_min*(1+b)**k
+    dz = _exponential_thickness(z_max, np.atleast_1d(dz_min), np.atleast_1d(b))[0]
 
-        if(dz_sum>z_max):
+    return _column_geometry(dz, z_max)
 
-            tmp_dz.pop()
-            dz_sum = dz_sum-dz_min*(1+b)**k
-            tmp_dz.append(z_max-dz_sum)
-            dz_sum = dz_sum + z_max-dz_sum
 
-        k = k+1
-        
-    # get the number og control volumes
-    KMAX = len(tmp_dz)
-    dz = np.zeros(KMAX,dtype=float)
+def build_grid_exponential_family(data_grid, dz_min, b):
+    '''
+    This function creates a family of exponential 1D grids, one for each pair of (dz_min, b),
+    in a single call. dz_min and b are broadcast against each other, so a scalar can be
+    combined with an array of values (e.g. several growth rates for the same first layer).
+    
     
-    for i in range(0,KMAX):
+    :param data_grid: pandas dataframe containg the grid_input_file.csv
+    :type data_grid: pandas dataframe
+
+    :param dz_min: thickness of the first layer
+    :type dz_min: float or array
 
-        dz[i] = tmp_dz[i]
+    :param b: growth rate, range [0, 1[.
+    :type b: float or array
     
-    # array containing centroids coordinates measured along eta
-    eta = np.zeros(KMAX,dtype=float)
-    # array containing control volumes interface coordinates measured along eta
-    eta_dual = np.zeros(KMAX+1,dtype=float)
-    # array containing centroids coordinates measured along z
-    z = np.zeros(KMAX,dtype=float)
-    # array containing control volumes interface coordinates measured along z
-    z_dual = np.zeros(KMAX+1,dtype=float)
-    # array containing distances between centroids (used to compute gradient)
-    space_delta = np.zeros(KMAX+1,dtype=float)
-    # array containing control volume size
-    control_volume = np.zeros(KMAX,dtype=float)
+    return:
     
+    grids: one list [KMAX, eta, eta_dual, space_delta, z, z_dual, control_volume] for each 
+        member of the broadcast (dz_min, b), as returned by build_grid_exponential
+    type grids: list
     
-    tmp = 0
-    for i in range(0,KMAX):
-        z[i] = dz[KMAX-1-i]/2+tmp
-        z_dual[i] = tmp
-        tmp = tmp+dz[KMAX-1-i]
-        eta[i] = -z_max + z[i]
-        eta_dual[i] = -z_max + z_dual[i]
+    '''
+    z_max = -data_grid['eta'][1]
+    dz_min, b = np.broadcast_arrays(np.atleast_1d(np.asarray(dz_min, dtype=float)),
+                                    np.atleast_1d(np.asarray(b, dtype=float)))
+    
+    return [_column_geometry(dz, z_max) for dz in _exponential_thickness(z_max, dz_min.ravel(), b.ravel())]
 
 
-    z_dual[KMAX] = z_max
-    eta_dual[KMAX] = 0.0       
+def _exponential_thickness(z_max, dz_min, b):
+    '''
+    Thickness of the control volumes, ordered from the soil surface downward, of the 
+    exponential grids with first layer dz_min[i] and growth rate b[i].
+    
+    The number of complete cells follows from the geometric series 
+    dz_min*((1+b)**n - 1)/b <= z_max, the last cell takes the remainder of the column.
+    '''
+    if np.any(dz_min <= 0):
+        raise ValueError("dz_min must be positive")
+    if np.any(b < 0):
+        raise ValueError("b must be in the range [0, 1[")
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        n = np.where(b > 0,
+                     np.log1p(z_max * b / dz_min) / np.log1p(b),
+                     z_max / dz_min)
+    
+    # the closed form may be off by one cell because of rounding, the cumulative sum
+    # of the thicknesses decides (as the sequential sum in the original loop did)
+    width = int(np.floor(n.max())) + 2
+    while True:
+        tmp_dz = dz_min[:, None] * (1 + b[:, None]) ** np.arange(width)
+        dz_sum = np.cumsum(tmp_dz, axis=1)
+        if np.all(dz_sum[:, -1] > z_max):
+            break
+        width = 2 * width
+
+    n_full = np.count_nonzero(dz_sum <= z_max, axis=1)
+
+    thickness = []
+    for i in range(n_full.size):
+        remainder = z_max - (dz_sum[i, n_full[i]-1] if n_full[i] > 0 else 0.0)
+        if remainder > 1E-12:
+            thickness.append(np.append(tmp_dz[i, :n_full[i]], remainder))
+        else:
+            thickness.append(tmp_dz[i, :n_full[i]].copy())
+    
+    return thickness
 
 
-    for i in range(0,KMAX+1):
+def _column_geometry(dz, z_max):
+    '''
+    Coordinates of centroids and interfaces of a soil column of depth z_max, 
+    given the thickness of its control volumes ordered from the soil surface downward.
+    '''
+    KMAX = dz.size
+    dz = dz[::-1]
 
-        if i==0:
+    # array containing control volumes interface coordinates measured along z
+    z_dual = np.zeros(KMAX+1, dtype=float)
+    np.cumsum(dz, out=z_dual[1:])
+    # array containing centroids coordinates measured along z
+    z = dz/2 + z_dual[:-1]
+    z_dual[KMAX] = z_max
 
-            space_delta[i] = np.abs(eta_dual[i]-eta[i])
+    # coordinates measured along eta
+    eta = -z_max + z
+    eta_dual = -z_max + z_dual
+    eta_dual[KMAX] = 0.0
 
-        elif i==np.size(eta_dual)-1:
+    space_delta, control_volume = _dual_spacing(eta, eta_dual)
+        
+    return [KMAX, eta, eta_dual, space_delta, z, z_dual, control_volume]
 
-            space_delta[i] = np.abs(eta_dual[i]-eta[i-1])
 
-        else:
+def _dual_spacing(eta, eta_dual):
+    '''
+    Distances between adjacent centroids (space_delta) and size of the control volumes,
+    given the coordinates of centroids and interfaces.
+    '''
+    # array containing distances between centroids (used to compute gradient)
+    space_delta = np.zeros(eta_dual.size, dtype=float)
+    space_delta[0] = np.abs(eta_dual[0]-eta[0])
+    space_delta[1:-1] = np.abs(np.diff(eta))
+    space_delta[-1] = np.abs(eta_dual[-1]-eta[-1])
 
-            space_delta[i] = np.abs(eta[i-1]-eta[i]) 
+    # array containing control volume size
+    control_volume = np.abs(np.diff(eta_dual))
 
-    for i in range(0,len(eta_dual)-1):
-        control_volume[i] = np.abs(eta_dual[i]-eta_dual[i+1])    
-        
-    return [KMAX, eta, eta_dual, space_delta, z, z_dual, control_volume]
+    return space_delta, control_volume
 
 
 def set_initial_condition(data, eta, interp_model):
@@ -330,6 +380,83 @@ def set_initial_condition(data, eta, interp_model):
     return ic
 
 
+def set_initial_condition_ensemble(data, eta, interp_model):
+    '''
+    This function interpolates an ensemble of temperature initial conditions (e.g. perturbed profiles
+    or profiles of different boreholes) on the same grid. 
+    When all members share the same eta points, or the interpolation is linear, all the members are 
+    evaluated in one vectorized call; otherwise scipy.interpolate.interp1d is used member by member.
+    
+    
+    :param data: pairs of (eta, T0) of each member, either a list of pandas dataframes or one dataframe 
+        with a column member
+    :type data: list or pandas dataframe
+    
+    :param eta: vertical coordinate of control volume centroids. It is positive upward with 
+        origin set at soil surface.
+    :type eta: list
+    
+    :param interp_model: specifies the kind of interpolation as a string. 
+        https://docs.scipy.org/doc/scipy/reference/generated/scipy.interpolate.interp1d.html#scipy.interpolate.interp1d
+    :type ic_type: str
+    
+    return:
+    
+    ic: initial conditions, shape (member, KMAX)
+    type ic: array
+        
+    '''
+    if isinstance(data, pd.DataFrame):
+        data = [d for _, d in data.groupby('member', sort=False)]
+    
+    eta = np.asarray(eta, dtype=float)
+    eta_points = [np.asarray(d['eta'], dtype=float) for d in data]
+    ic_points = [np.asarray(d['T0'], dtype=float) for d in data]
+    
+    shared = all(np.array_equal(e, eta_points[0]) for e in eta_points)
+    
+    if shared:
+        f = interp1d(eta_points[0], np.vstack(ic_points), kind=interp_model, axis=-1, assume_sorted=False)
+        return f(eta)
+    
+    elif interp_model == 'linear':
+        return _interp_linear_ensemble(eta_points, ic_points, eta)
+    
+    else:
+        return np.vstack([interp1d(e, t, kind=interp_model, assume_sorted=False)(eta) for e, t in zip(eta_points, ic_points)])
+
+
+def _interp_linear_ensemble(eta_points, ic_points, eta):
+    '''
+    Linear interpolation on eta of profiles with different points. The interval of each eta is
+    found with a binary search in the points of each member, then all the members are evaluated
+    at once on their points padded to the same number.
+    '''
+    if min(e.size for e in eta_points) < 2:
+        raise ValueError("Each member needs at least two (eta, T0) pairs.")
+    
+    n_points = max(e.size for e in eta_points)
+    xp = np.full((len(eta_points), n_points), np.inf)
+    fp = np.zeros((len(eta_points), n_points))
+    # index of the left point of the interval containing each eta
+    i = np.empty((len(eta_points), eta.size), dtype=int)
+    for m, (e, t) in enumerate(zip(eta_points, ic_points)):
+        order = np.argsort(e)
+        xp[m, :e.size] = e[order]
+        fp[m, :e.size] = t[order]
+        fp[m, e.size:] = t[order][-1]
+        if eta.size and (eta.min() < xp[m, 0] or eta.max() > xp[m, e.size-1]):
+            raise ValueError("A value in x_new is outside the interpolation range of a member.")
+        i[m] = np.searchsorted(xp[m, :e.size], eta, side='right') - 1
+    i = np.clip(i, 0, n_points - 2)
+    
+    rows = np.arange(len(eta_points))[:, None]
+    x0, x1 = xp[rows, i], xp[rows, i+1]
+    f0, f1 = fp[rows, i], fp[rows, i+1]
+    with np.errstate(invalid='ignore'):
+        w = np.where(np.isfinite(x1) & (x1 > x0), (eta - x0) / (x1 - x0), 0.0)
+    
+    return f0 + w * (f1 - f0)
 
 
 def set_parameters(data_grid, data_parameter, KMAX, eta):
@@ -353,161 +480,158 @@ def set_parameters(data_grid, data_parameter, KMAX, eta):
     
     return:
     
-    rheology_ID:
-    type: array
-    
-    parameters_ID:
-    type: array
-    
-    regrid_ID:
-    type: array
-        
-    soil_particles_density:
-    type:array
-    
-    thermal_conductivity_soil_particles:
-    type:array
-    
-    specific_thermal_capacity_soil_particles:
-    type:array
-    
-    theta_s:
-    type:array
-    
-    theta_r:
-    type:array
-    
-    melting_temperature:
-    type:array
-    
-    par_1:
-    type:array
-    
-    par_2:
-    type:array
-    
-    par_3:
-    type:array
-    
-    par_4:
-    type:array
+    parameters: mapping from the name of the grid file variable to its values. 
+        rheologyID and parameterID are given for each control volume, 
+        the other variables for each parameter set (-999.0 where not defined):
+            rheologyID, parameterID, soilParticlesDensity, thermalConductivitySoilParticles,
+            specificThermalCapacitySoilParticles, thetaS, thetaR, meltingTemperature, 
+            par1, par2, par3, par4
+    type parameters: dict
     '''
+    is_layer = (data_grid['Type'] == 'L').to_numpy()
+    coord_layer = data_grid['eta'].to_numpy(dtype=float)[is_layer]
+    layer_rheology_ID = data_grid['rheologyID'].to_numpy(dtype=float)[is_layer]
+    layer_parameter_ID = data_grid['parameterID'].to_numpy(dtype=float)[is_layer]
+    
+    # coord_layer is ordered from the surface downward. A control volume belongs to
+    # layer i if coord_layer[i+1] < eta < coord_layer[i]; control volumes lying on an 
+    # interface or outside the column keep the label 0
+    eta = np.asarray(eta, dtype=float)[:KMAX]
+    i = coord_layer.size - np.searchsorted(coord_layer[::-1], eta, side='left') - 1
+    inside = (i >= 0) & (i < coord_layer.size - 1)
+    inside[inside] = eta[inside] < coord_layer[i[inside]]
+    
     rheology_ID = np.zeros(KMAX, dtype=float)
     parameter_ID = np.zeros(KMAX, dtype=float)
+    rheology_ID[inside] = layer_rheology_ID[i[inside]]
+    parameter_ID[inside] = layer_parameter_ID[i[inside]]
     
-    soil_particles_density = np.zeros(data_parameter.shape[0], dtype=float)
-    thermal_conductivity_soil_particles = np.zeros(data_parameter.shape[0], dtype=float)
-    specific_heat_capacity_soil_particles = np.zeros(data_parameter.shape[0], dtype=float)
-    theta_s = np.zeros(data_parameter.shape[0], dtype=float)
-    theta_r = np.zeros(data_parameter.shape[0], dtype=float)
-    melting_temperature = np.zeros(data_parameter.shape[0], dtype=float)
-    par_1 = np.zeros(data_parameter.shape[0], dtype=float)
-    par_2 = np.zeros(data_parameter.shape[0], dtype=float)
-    par_3 = np.zeros(data_parameter.shape[0], dtype=float)
-    par_4 = np.zeros(data_parameter.shape[0], dtype=float)
-    
-    coord_layer = []
-    tmp_rheology_ID = []
-    tmp_parameter_ID = []
-    tmp_regrid_ID = []
-
-    for i in data_grid.index:
-
-        if data_grid['Type'][i] == 'L':
-            
-            coord_layer.append(data_grid['eta'][i])
-            tmp_rheology_ID.append(data_grid['rheologyID'][i])
-            tmp_parameter_ID.append(data_grid['parameterID'][i])
-           
-     
-    for i in range(np.size(coord_layer)-1,0,-1):
-        
-        for j in range(0,KMAX):
-            
-            if(eta[j]>coord_layer[i] and eta[j]<coord_layer[i-1] ):
-                
-                rheology_ID[j] = tmp_rheology_ID[i-1]
-                parameter_ID[j] = tmp_parameter_ID[i-1]
-        
-        
-    for i in range(0, data_parameter.iloc[:,0].size):
-        soil_particles_density[i] = data_parameter['spDensity'][i]
-        thermal_conductivity_soil_particles[i] = data_parameter['spConductivity'][i]
-        specific_heat_capacity_soil_particles[i] = data_parameter['spSpecificHeatCapacity'][i]
-        theta_s[i] = data_parameter['thetaS'][i]
-        theta_r[i] = data_parameter['thetaR'][i]
-        melting_temperature[i] = data_parameter['meltingT'][i]
-        par_1[i] = data_parameter['par1'][i]
-        par_2[i] = data_parameter['par2'][i]
-        par_3[i] = data_parameter['par3'][i]
-        par_4[i] = data_parameter['par4'][i]
-        
+    parameters = {'rheologyID': rheology_ID, 'parameterID': parameter_ID}
+    for name, column in _PARAMETER_COLUMNS.items():
         # nan must be changed to number
-        soil_particles_density[np.isnan(soil_particles_density)] = -999.0
-        thermal_conductivity_soil_particles[np.isnan(thermal_conductivity_soil_particles)] = -999.0
-        specific_heat_capacity_soil_particles[np.isnan(specific_heat_capacity_soil_particles)] = -999.0
-        theta_s[np.isnan(theta_s)] = -999.0
-        theta_r[np.isnan(theta_r)] = -999.0
-        melting_temperature[np.isnan(melting_temperature)] = -999.0
-        par_1[np.isnan(par_1)] = -999.0
-        par_2[np.isnan(par_2)] = -999.0
-        par_3[np.isnan(par_3)] = -999.0
-        par_4[np.isnan(par_4)] = -999.0
-
-    return [rheology_ID, parameter_ID, soil_particles_density, thermal_conductivity_soil_particles, specific_heat_capacity_soil_particles,
-         theta_s, theta_r, melting_temperature, par_1, par_2, par_3, par_4]
+        values = data_parameter[column].to_numpy(dtype=float, copy=True)
+        values[np.isnan(values)] = -999.0
+        parameters[name] = values
+
+    return parameters
+
+
+# grid file variable <- column of the parameter_input_file.csv
+_PARAMETER_COLUMNS = {
+    'soilParticlesDensity': 'spDensity',
+    'thermalConductivitySoilParticles': 'spConductivity',
+    'specificThermalCapacitySoilParticles': 'spSpecificHeatCapacity',
+    'thetaS': 'thetaS',
+    'thetaR': 'thetaR',
+    'meltingTemperature': 'meltingT',
+    'par1': 'par1',
+    'par2': 'par2',
+    'par3': 'par3',
+    'par4': 'par4',
+}
 
 def extract_grid_for_shallow_spinup(depth_shallow_column, eta, eta_dual, z, z_dual, space_delta, soil_volume, ic, excess_ice_volume, equation_state_ID, parameter_ID, regrid_ID, KMAX, 
 					  VECTOR_LENGTH):
+    '''
+    This function extracts the upper part of a grid, depth_shallow_column deep, used in the shallow step 
+    of the two-step spinup procedure. The arrays are padded with zeros to VECTOR_LENGTH.
+    
+    return:
+    
+    [idk, eta, eta_dual, z, z_dual, space_delta, soil_volume, excess_ice_volume, ic, equation_state_ID, parameter_ID, regrid_ID, KMAX]
+    of the shallow grid, idk is the index of its lower control volume in the deep grid.
+    '''
     ## find index lower control volume
-    idk = find_nearest(z[0:KMAX], z_dual[KMAX]-depth_shallow_column)[1]
-    
-    shallow_grid_eta = np.zeros(VECTOR_LENGTH)
-    shallow_grid_eta_dual = np.zeros(VECTOR_LENGTH)
-    shallow_grid_z = np.zeros(VECTOR_LENGTH)
-    shallow_grid_z_dual = np.zeros(VECTOR_LENGTH)
-    shallow_grid_space_delta = np.zeros(VECTOR_LENGTH)
-    shallow_grid_soil_volume = np.zeros(VECTOR_LENGTH)
-    shallow_grid_excess_ice_volume = np.zeros(VECTOR_LENGTH)
-    shallow_grid_ic = np.zeros(VECTOR_LENGTH)
-    shallow_grid_equation_state_ID = np.zeros(VECTOR_LENGTH)
-    shallow_grid_parameter_ID = np.zeros(VECTOR_LENGTH)
-    shallow_grid_regrid_ID = np.zeros(VECTOR_LENGTH)
-    
-    shallow_grid_z_dual[0] = z_dual[idk]
-    shallow_grid_z_dual[KMAX-idk] = z_dual[KMAX]
-    
-    shallow_grid_eta_dual[0] = eta_dual[idk]
-    shallow_grid_eta_dual[KMAX-idk] = eta_dual[KMAX]
-    
-    shallow_grid_space_delta[0] = z[idk] - shallow_grid_z_dual[0]
-    shallow_grid_space_delta[KMAX-idk] = space_delta[KMAX]
-    
-    for k in range(0,KMAX-idk):
-        shallow_grid_eta[k] = eta[idk+k]
-        shallow_grid_z[k] = z[idk+k]
-        shallow_grid_soil_volume[k] = soil_volume[idk+k]
-        shallow_grid_excess_ice_volume[k] = excess_ice_volume[idk+k]
-        shallow_grid_ic[k] = ic[idk+k]
-        shallow_grid_equation_state_ID[k] = equation_state_ID[idk+k]
-        shallow_grid_parameter_ID[k] = parameter_ID[idk+k]
-        shallow_grid_regrid_ID[k] = regrid_ID[idk+k]
-        
-        shallow_grid_z_dual[k+1] = z_dual[idk+k+1]
-        shallow_grid_eta_dual[k+1] = eta_dual[idk+k+1]
-        shallow_grid_space_delta[k+1] = space_delta[idk+k+1]
-        
+    idk = _shallow_index(z, z_dual, KMAX, depth_shallow_column)
+    
+    shallow_grid_eta = _padded(eta[idk:KMAX], VECTOR_LENGTH)
+    shallow_grid_eta_dual = _padded(eta_dual[idk:KMAX+1], VECTOR_LENGTH)
+    shallow_grid_z = _padded(z[idk:KMAX], VECTOR_LENGTH)
+    shallow_grid_z_dual = _padded(z_dual[idk:KMAX+1], VECTOR_LENGTH)
+    shallow_grid_space_delta = _padded(space_delta[idk:KMAX+1], VECTOR_LENGTH)
+    shallow_grid_soil_volume = _padded(soil_volume[idk:KMAX], VECTOR_LENGTH)
+    shallow_grid_excess_ice_volume = _padded(excess_ice_volume[idk:KMAX], VECTOR_LENGTH)
+    shallow_grid_ic = _padded(ic[idk:KMAX], VECTOR_LENGTH)
+    shallow_grid_equation_state_ID = _padded(equation_state_ID[idk:KMAX], VECTOR_LENGTH)
+    shallow_grid_parameter_ID = _padded(parameter_ID[idk:KMAX], VECTOR_LENGTH)
+    shallow_grid_regrid_ID = _padded(regrid_ID[idk:KMAX], VECTOR_LENGTH)
+    
+    shallow_grid_space_delta[0] = z[idk] - z_dual[idk]
         
     shallow_grid_KMAX = KMAX-idk
         
     return [idk, shallow_grid_eta, shallow_grid_eta_dual, shallow_grid_z, shallow_grid_z_dual, shallow_grid_space_delta, shallow_grid_soil_volume, shallow_grid_excess_ice_volume, shallow_grid_ic, shallow_grid_equation_state_ID, shallow_grid_parameter_ID, shallow_grid_regrid_ID, shallow_grid_KMAX]
 
 
+def extract_shallow_grid(data, depth_shallow_column):
+    '''
+    This function extracts the upper part of a grid, depth_shallow_column deep, used in the shallow step 
+    of the two-step spinup procedure. The depth variables of the shallow grid are views of the ones of the
+    deep grid (only spaceDelta, whose first value changes, is copied) and the parameters are shared.
+    
+    :param data: mapping from the name of the grid file variable to its values, as returned by build_grid_data
+    :type data: dict
+    
+    :param depth_shallow_column: depth of the shallow column
+    :type depth_shallow_column: float
+    
+    return:
+    
+    idk: index of the lower control volume of the shallow grid in the deep grid
+    type idk: int
+    
+    shallow_data: variables of the shallow grid, as data
+    type shallow_data: dict
+    '''
+    KMAX = int(data['KMAX'][0])
+    z = data['z']
+    z_dual = data['zDual']
+    
+    ## find index lower control volume
+    idk = _shallow_index(z, z_dual, KMAX, depth_shallow_column)
+    
+    dimensions = {name: dim for name, dim, _, _ in _GRID_VARIABLES}
+    shallow_data = dict(data)
+    for name, values in data.items():
+        if dimensions.get(name) == 'z':
+            shallow_data[name] = values[idk:KMAX]
+        elif dimensions.get(name) == 'z_dual':
+            shallow_data[name] = values[idk:KMAX+1]
+        elif dimensions.get(name) == ('member', 'z'):
+            shallow_data[name] = values[:, idk:KMAX]
+    
+    shallow_data['spaceDelta'] = data['spaceDelta'][idk:KMAX+1].copy()
+    shallow_data['spaceDelta'][0] = z[idk] - z_dual[idk]
+    shallow_data['KMAX'] = np.array([KMAX-idk])
+    
+    return idk, shallow_data
+
+
+def find_nearest(array, value):
+    ''' value of array nearest to value, and its index '''
+    array = np.asarray(array)
+    idx = int(np.abs(array - value).argmin())
+    return [array[idx], idx]
+
+
+def _shallow_index(z, z_dual, KMAX, depth_shallow_column):
+    ''' index of the deep grid control volume closest to the bottom of the shallow column '''
+    return find_nearest(z[0:KMAX], z_dual[KMAX]-depth_shallow_column)[1]
+
+
+def _padded(values, length):
+    ''' copy of values followed by zeros up to length '''
+    padded = np.zeros(length)
+    padded[:np.size(values)] = values
+    return padded
+
+
 def write_grid_netCDF(eta, eta_dual, z, z_dual, space_delta, soil_volume, ic, rheology_ID, parameter_ID, KMAX, soil_particles_density,              
                       thermal_conductivity_soil_particles, 
                       specific_heat_capacity_soil_particles, theta_s, theta_r, melting_temperature, par_1, par_2, par_3, par_4,
                       output_file_name, output_title, output_institution, output_summary, output_date,
-                      grid_input_file_name, parameter_input_file_name):
+                      grid_input_file_name, parameter_input_file_name, file_format='NETCDF4', zlib=False, complevel=4,
+                      shuffle=True, chunksize=None, compact_ints=False):
     '''
     Save all grid data in a NetCDF file
     
@@ -594,153 +718,154 @@ def write_grid_netCDF(eta, eta_dual, z, z_dual, space_delta, soil_volume, ic, rh
     :param input_file_name: 
     :type input_file_name: str
     
-    '''
+    :param file_format: format of the netCDF file, one of NETCDF4, NETCDF4_CLASSIC, NETCDF3_64BIT.
+    :type file_format: str
     
-    # the output array to write will be nx x ny
-    dim = np.size(eta);
-    dim1 = np.size(eta_dual);
-    dim_parameter = np.size(par_1)
-    dim_scalar = 1
+    :param zlib: compress the variables (NETCDF4 and NETCDF4_CLASSIC only).
+    :type zlib: bool
     
+    :param complevel: compression level, from 1 (fastest) to 9 (smallest).
+    :type complevel: int
     
-    # open a new netCDF file for writing.
-    ncfile = Dataset(output_file_name,'w') 
-    
-    # Create global attributes
-    ncfile.title = output_title + '\\n' + 'grid input file' + grid_input_file_name + 'parameter input file' + parameter_input_file_name
-    ncfile.institution =  output_institution
-    ncfile.summary = output_summary
-    #ncfile.acknowledgment = ""
-    ncfile.date_created = output_date
-    
-    # create the z dimensions.
-    ncfile.createDimension('z',dim)
-    ncfile.createDimension('z_dual',dim1)
-    ncfile.createDimension('parameter',dim_parameter)
-    ncfile.createDimension('scalar',dim_scalar)
-    
-    # create the variable
-    # first argument is name of variable, second is datatype, third is
-    # a tuple with the names of dimensions.
-    data_KMAX = ncfile.createVariable('KMAX','i4',('scalar'))
-    data_KMAX.unit = '-'
-    
-    data_eta = ncfile.createVariable('eta','f8',('z'))
-    data_eta.unit = 'm'
-    data_eta.long_name = '\u03b7 coordinate of volume centroids: zero is at soil surface and and positive upward'
-    
-    data_eta_dual = ncfile.createVariable('etaDual','f8',('z_dual'))
-    data_eta_dual.unit = 'm'
-    data_eta_dual.long_name = '\u03b7 coordinate of volume interfaces: zero is at soil surface and and positive upward. '
-    
-    data_z = ncfile.createVariable('z','f8',('z'))
-    data_z.unit = 'm'
-    data_z.long_name = 'z coordinate  of volume centroids: zero is at the bottom of the column and and positive upward'
-    
-    data_z_dual = ncfile.createVariable('zDual','f8',('z_dual'))
-    data_z_dual.unit = 'm'
-    data_z_dual.long_name = 'z coordinate of volume interfaces: zero is at soil surface and and positive upward.'
-    
-    data_ic = ncfile.createVariable('ic','f8',('z'))
-    data_ic.units = 'K'
-    data_ic.long_name = 'Temperature initial condition'
-        
-    data_space_delta = ncfile.createVariable('spaceDelta','f8',('z_dual'))
-    data_space_delta.unit = 'm'
-    data_space_delta.long_name = 'Distance between consecutive controids, is used to compute gradients'
+    :param shuffle: apply the HDF5 shuffle filter before compression.
+    :type shuffle: bool
     
-    data_soil_volume = ncfile.createVariable('volumeSoil','f8',('z'))
-    data_soil_volume.unit = 'm'
-    data_soil_volume.long_name = 'Volume of soil in each control volume'
+    :param chunksize: number of control volumes in each chunk of the depth variables (NETCDF4 and NETCDF4_CLASSIC only).
+        If None the library default is used.
+    :type chunksize: int
     
-    data_rheology_ID = ncfile.createVariable('rheologyID','f8',('z'))
-    data_rheology_ID.units = '-'
-    data_rheology_ID.long_name = 'label describing the rheology model'
+    :param compact_ints: store rheologyID, parameterID and KMAX with the smallest integer type that holds them 
+        instead of f8/i4. Check that the model reading the grid accepts integer labels. A variable with
+        non-integer values keeps its type.
+    :type compact_ints: bool
     
-    data_parameter_ID = ncfile.createVariable('parameterID','f8',('z'))
-    data_parameter_ID.units = '-'
-    data_parameter_ID.long_name = 'label identifying the set of parameters'
+    '''
+    data = {'KMAX': np.array([KMAX]), 'eta': eta, 'etaDual': eta_dual, 'z': z, 'zDual': z_dual, 'ic': ic, 
+            'spaceDelta': space_delta, 'volumeSoil': soil_volume, 'rheologyID': rheology_ID, 'parameterID': parameter_ID,
+            'soilParticlesDensity': soil_particles_density, 
+            'thermalConductivitySoilParticles': thermal_conductivity_soil_particles,
+            'specificThermalCapacitySoilParticles': specific_heat_capacity_soil_particles,
+            'thetaS': theta_s, 'thetaR': theta_r, 'meltingTemperature': melting_temperature, 
+            'par1': par_1, 'par2': par_2, 'par3': par_3, 'par4': par_4}
+    
+    global_attributes = _global_attributes(output_title, output_institution, output_summary, output_date,
+                                           grid_input_file_name, parameter_input_file_name)
+    
+    _write_grid_dataset(output_file_name, data, global_attributes, file_format=file_format, zlib=zlib, complevel=complevel,
+                        shuffle=shuffle, chunksize=chunksize, compact_ints=compact_ints)
+    print ('\n\n***SUCCESS writing!  '+ output_file_name)
 
-    data_soil_particles_density = ncfile.createVariable('soilParticlesDensity','f8',('parameter'))
-    data_soil_particles_density.units = 'kg/m3'
-    data_soil_particles_density.long_name = 'density of soil particles'
-    
-    data_thermal_conductivity_soil_particles = ncfile.createVariable('thermalConductivitySoilParticles','f8',('parameter'))
-    data_thermal_conductivity_soil_particles.units = 'W/m2'
-    data_thermal_conductivity_soil_particles.long_name = 'thermal conductivity of soil particles'
     
-    data_specific_heat_capacity_soil_particles = ncfile.createVariable('specificThermalCapacitySoilParticles','f8',('parameter'))
-    data_specific_heat_capacity_soil_particles.units = 'J/kg m3'
-    data_specific_heat_capacity_soil_particles.long_name = 'specific thermal capacity of soil particles'
-    
-    data_theta_s = ncfile.createVariable('thetaS','f8',('parameter'))
-    data_theta_s.units = '-'
-    data_theta_s.long_name = 'adimensional water content at saturation'
-    
-    data_theta_r = ncfile.createVariable('thetaR','f8',('parameter'))
-    data_theta_r.units = '-'
-    data_theta_r.long_name = 'adimensional residual water content'
-    
-    data_melting_temperature = ncfile.createVariable('meltingTemperature','f8',('parameter'))
-    data_melting_temperature.units = 'K'
-    data_melting_temperature.long_name = 'melting temperature of soil water'
-    
-    data_par_1 = ncfile.createVariable('par1','f8',('parameter'))
-    data_par_1.units = '-'
-    data_par_1.long_name = 'SFCC parameter'
-    
-    data_par_2 = ncfile.createVariable('par2','f8',('parameter'))
-    data_par_2.units = '-'
-    data_par_2.long_name = 'SFCC parameter'
-    
-    data_par_3 = ncfile.createVariable('par3','f8',('parameter'))
-    data_par_3.units = '-'
-    data_par_3.long_name = 'SFCC parameter'
+    return
+
+
+def _global_attributes(output_title, output_institution, output_summary, output_date,
+                       grid_input_file_name, parameter_input_file_name):
+    return {
+        'title': output_title + '\\n' + 'grid input file' + grid_input_file_name + 'parameter input file' + parameter_input_file_name,
+        'institution': output_institution,
+        'summary': output_summary,
+        'date_created': output_date}
+
+
+# name, dimension, datatype and attributes of the variables of a grid file
+_GRID_VARIABLES = [
+    ('KMAX', 'scalar', 'i4', {'unit': '-'}),
+    ('eta', 'z', 'f8', {'unit': 'm', 'long_name': 'η coordinate of volume centroids: zero is at soil surface and and positive upward'}),
+    ('etaDual', 'z_dual', 'f8', {'unit': 'm', 'long_name': 'η coordinate of volume interfaces: zero is at soil surface and and positive upward. '}),
+    ('z', 'z', 'f8', {'unit': 'm', 'long_name': 'z coordinate  of volume centroids: zero is at the bottom of the column and and positive upward'}),
+    ('zDual', 'z_dual', 'f8', {'unit': 'm', 'long_name': 'z coordinate of volume interfaces: zero is at soil surface and and positive upward.'}),
+    ('ic', 'z', 'f8', {'units': 'K', 'long_name': 'Temperature initial condition'}),
+    ('icEnsemble', ('member', 'z'), 'f8', {'units': 'K', 'long_name': 'Ensemble of temperature initial conditions'}),
+    ('spaceDelta', 'z_dual', 'f8', {'unit': 'm', 'long_name': 'Distance between consecutive controids, is used to compute gradients'}),
+    ('volumeSoil', 'z', 'f8', {'unit': 'm', 'long_name': 'Volume of soil in each control volume'}),
+    ('rheologyID', 'z', 'f8', {'units': '-', 'long_name': 'label describing the rheology model'}),
+    ('parameterID', 'z', 'f8', {'units': '-', 'long_name': 'label identifying the set of parameters'}),
+    ('soilParticlesDensity', 'parameter', 'f8', {'units': 'kg/m3', 'long_name': 'density of soil particles'}),
+    ('thermalConductivitySoilParticles', 'parameter', 'f8', {'units': 'W/m2', 'long_name': 'thermal conductivity of soil particles'}),
+    ('specificThermalCapacitySoilParticles', 'parameter', 'f8', {'units': 'J/kg m3', 'long_name': 'specific thermal capacity of soil particles'}),
+    ('thetaS', 'parameter', 'f8', {'units': '-', 'long_name': 'adimensional water content at saturation'}),
+    ('thetaR', 'parameter', 'f8', {'units': '-', 'long_name': 'adimensional residual water content'}),
+    ('meltingTemperature', 'parameter', 'f8', {'units': 'K', 'long_name': 'melting temperature of soil water'}),
+    ('par1', 'parameter', 'f8', {'units': '-', 'long_name': 'SFCC parameter'}),
+    ('par2', 'parameter', 'f8', {'units': '-', 'long_name': 'SFCC parameter'}),
+    ('par3', 'parameter', 'f8', {'units': '-', 'long_name': 'SFCC parameter'}),
+    ('par4', 'parameter', 'f8', {'units': '-', 'long_name': 'SFCC parameter'}),
+]
+
+_COMPACT_INT_VARIABLES = ['KMAX', 'rheologyID', 'parameterID']
+
+_FILE_FORMATS = ['NETCDF4', 'NETCDF4_CLASSIC', 'NETCDF3_64BIT']
+
+
+def _write_grid_dataset(output_file_name, data, global_attributes, file_format='NETCDF4', zlib=False, complevel=4,
+                        shuffle=True, chunksize=None, compact_ints=False):
+    '''
+    Write the variables of a grid file, given as a mapping name -> array, each in a single slice.
+    Only the variables listed in _GRID_VARIABLES that are present in data are written.
+    '''
+    if file_format not in _FILE_FORMATS:
+        raise ValueError(f"Invalid file_format: {file_format}. Choose from {_FILE_FORMATS}")
     
-    data_par_4 = ncfile.createVariable('par4','f8',('parameter'))
-    data_par_4.units = '-'
-    data_par_4.long_name = 'SFCC parameter'
+    hdf5 = file_format.startswith('NETCDF4')
     
+    # open a new netCDF file for writing.
+    with Dataset(output_file_name, 'w', format=file_format) as ncfile:
     
-    ## write data to variable.
-
-    data_KMAX[0] = KMAX
-
-    for i in range(0,dim):
-        data_eta[i] = eta[i]
-        data_z[i] = z[i]
-        data_soil_volume[i] = soil_volume[i]
-        data_ic[i] = ic[i]
-        data_rheology_ID[i] = rheology_ID[i]
-        data_parameter_ID[i] = parameter_ID[i]
+        # Create global attributes
+        ncfile.setncatts(global_attributes)
         
-    for i in range(0,dim1):
-        data_eta_dual[i] = eta_dual[i]
-        data_z_dual[i] = z_dual[i]
-        data_space_delta[i] = space_delta[i]
+        # create the dimensions.
+        dimensions = {'z': np.size(data['eta']), 'z_dual': np.size(data['etaDual']), 
+                      'parameter': np.size(data['par1']), 'scalar': 1}
+        if 'icEnsemble' in data:
+            dimensions['member'] = np.shape(data['icEnsemble'])[0]
+        for name, size in dimensions.items():
+            ncfile.createDimension(name, size)
         
-    for i in range(0,dim_parameter):
-        data_soil_particles_density[i] = soil_particles_density[i]
-        data_thermal_conductivity_soil_particles[i] = thermal_conductivity_soil_particles[i]
-        data_specific_heat_capacity_soil_particles[i] = specific_heat_capacity_soil_particles[i]
-        data_theta_s[i] = theta_s[i]
-        data_theta_r[i] = theta_r[i]
-        data_melting_temperature[i] = melting_temperature[i]
-        data_par_1[i] = par_1[i]
-        data_par_2[i] = par_2[i]
-        data_par_3[i] = par_3[i]
-        data_par_4[i] = par_4[i]
-    
-    ## close the file.
-    ncfile.close()
-    print ('\n\n***SUCCESS writing!  '+ output_file_name)
-
+        for name, dim, datatype, attributes in _GRID_VARIABLES:
+            
+            if name not in data:
+                continue
+            values = np.asarray(data[name])
+            
+            if compact_ints and name in _COMPACT_INT_VARIABLES:
+                compact = _compact_int_dtype(values)
+                if compact is not None:
+                    datatype = compact
+                    values = values.astype(datatype)
+            
+            dims = dim if isinstance(dim, tuple) else (dim,)
+            
+            options = {}
+            if hdf5:
+                options.update(zlib=zlib, complevel=complevel, shuffle=shuffle)
+                if chunksize and dims[-1] in ('z', 'z_dual'):
+                    options.update(chunksizes=(1,)*(len(dims)-1) + (min(chunksize, dimensions[dims[-1]]),))
+            
+            variable = ncfile.createVariable(name, datatype, dims, **options)
+            variable.setncatts(attributes)
+            
+            ## write data to variable.
+            variable[:] = values
     
     return
 
 
+def _compact_int_dtype(values):
+    ''' smallest signed integer type (available in every netCDF format) holding values,
+    None if some values are not integers (nan or with a fractional part) '''
+    values = np.asarray(values)
+    if not np.all(values == np.round(values)):
+        return None
+    lo, hi = (values.min(), values.max()) if values.size else (0, 0)
+    for dtype in ('i1', 'i2', 'i4'):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return dtype
+    raise ValueError(f"Values out of range for a 32-bit integer: [{lo}, {hi}]")
+
 def main(args):
-    from datetime import datetime
 
     # Get args
 
@@ -752,18 +877,95 @@ def main(args):
 
     data_grid = pd.read_csv(grid_input_file_name)
     data_ic = pd.read_csv(ic_input_file_name)
-    data_parameter = pd.read_csv(parameter_input_file_name, comment='#')
-
-    ## parameters
-    dz_min = args.dz_min
-    b = args.b
-    grid_type = args.grid_type
-    interp_model = args.interp_model
-    output_title = args.output_title
-    output_institution = args.output_institution
-    output_summary = args.output_summary
+    data_parameter = read_parameter_table(parameter_input_file_name)
+
+    make_grid_from_tables(data_grid, data_ic, data_parameter, output_file_name,
+                          args.dz_min, args.b, args.grid_type, args.interp_model,
+                          args.output_title, args.output_institution, args.output_summary,
+                          grid_input_file_name, parameter_input_file_name,
+                          shallow_depth=getattr(args, 'shallow_depth', None),
+                          shallow_output_file_name=getattr(args, 'shallow_output_file_name', None),
+                          **_writer_options(args))
+
+
+def read_parameter_table(parameter_input_file_name):
+    ''' Read the parameter_input_file.csv '''
+    return pd.read_csv(parameter_input_file_name, comment='#')
+
+
+def make_grid_from_tables(data_grid, data_ic, data_parameter, output_file_name, dz_min, b, grid_type, interp_model,
+                          output_title='', output_institution='', output_summary='',
+                          grid_input_file_name='', parameter_input_file_name='',
+                          shallow_depth=None, shallow_output_file_name=None, **writer_options):
+    '''
+    Create a grid from the already parsed input tables and save it in a NetCDF file.
+    This is what main does after reading the input files.
+    
+    :param data_grid: pandas dataframe containg the grid_input_file.csv
+    :type data_grid: pandas dataframe
+    
+    :param data_ic: pandas dataframe containg pairs of (eta, T0)
+    :type data_ic: pandas dataframe
+    
+    :param data_parameter: pandas dataframe containg the parameter_input_file.csv
+    :type data_parameter: pandas dataframe
+    
+    :param output_file_name: 
+    :type output_file_name: str
+    
+    :param shallow_depth: if given, also save the grid of the upper shallow_depth meters of the column,
+        used in the shallow step of the two-step spinup procedure
+    :type shallow_depth: float
+    
+    :param shallow_output_file_name: file of the shallow grid, by default output_file_name with the suffix _shallow
+    :type shallow_output_file_name: str
+    
+    :param writer_options: file_format, zlib, complevel, shuffle, chunksize, compact_ints (see write_grid_netCDF)
+    '''
+    from datetime import datetime
+
     output_date = datetime.now().isoformat()
 
+    data = build_grid_data(data_grid, data_ic, data_parameter, dz_min, b, grid_type, interp_model)
+
+    # Write
+    global_attributes = _global_attributes(output_title, output_institution, output_summary, output_date,
+                                           grid_input_file_name, parameter_input_file_name)
+    _write_grid_dataset(output_file_name, data, global_attributes, **writer_options)
+    print ('\n\n***SUCCESS writing!  '+ output_file_name)
+
+    if shallow_depth is not None:
+        shallow_output_file_name = shallow_output_file_name or shallow_file_name(output_file_name)
+        _, shallow_data = extract_shallow_grid(data, shallow_depth)
+        _write_grid_dataset(shallow_output_file_name, shallow_data, global_attributes, **writer_options)
+        print ('\n\n***SUCCESS writing!  '+ shallow_output_file_name)
+
+
+def shallow_file_name(output_file_name):
+    ''' default name of the shallow grid file: grid.nc -> grid_shallow.nc '''
+    from pathlib import Path
+    output = Path(output_file_name)
+    return str(output.with_name(output.stem + '_shallow' + output.suffix))
+
+
+def build_grid_data(data_grid, data_ic, data_parameter, dz_min, b, grid_type, interp_model):
+    '''
+    Create the grid, its initial condition and parameters, without writing them.
+    
+    :param data_grid: pandas dataframe containg the grid_input_file.csv
+    :type data_grid: pandas dataframe
+    
+    :param data_ic: pandas dataframe containg pairs of (eta, T0)
+    :type data_ic: pandas dataframe
+    
+    :param data_parameter: pandas dataframe containg the parameter_input_file.csv
+    :type data_parameter: pandas dataframe
+    
+    return:
+    
+    data: mapping from the name of the grid file variable to its values
+    type data: dict
+    '''
     # Grid
     [KMAX, eta, eta_dual, space_delta, z, z_dual, control_volume] = grid1D(data_grid,dz_min,b,grid_type)
     
@@ -771,15 +973,20 @@ def main(args):
     ic = set_initial_condition(data_ic, eta, interp_model)
     
     # Parameters
-    [rheology_ID, parameter_ID, soil_particles_density, 
-     thermal_conductivity_soil_particles, specific_thermal_capacity_soil_particles,
-     theta_s, theta_r, melting_temperature, par_1, par_2, par_3, par_4] = set_parameters(data_grid, data_parameter, KMAX, eta)
-
-    # Write
-    write_grid_netCDF(eta, eta_dual, z, z_dual, space_delta, control_volume, ic, rheology_ID, parameter_ID, KMAX,
-                  soil_particles_density, thermal_conductivity_soil_particles, specific_thermal_capacity_soil_particles,
-                  theta_s, theta_r, melting_temperature, par_1, par_2, par_3, par_4,
-                  output_file_name, output_title, output_institution, output_summary, output_date, grid_input_file_name, parameter_input_file_name)
+    parameters = set_parameters(data_grid, data_parameter, KMAX, eta)
 
+    data = {'KMAX': np.array([KMAX]), 'eta': eta, 'etaDual': eta_dual, 'z': z, 'zDual': z_dual, 'ic': ic,
+            'spaceDelta': space_delta, 'volumeSoil': control_volume}
+    data.update(parameters)
+    
+    return data
 
 
+def _writer_options(args):
+    ''' netCDF writer options given on the command line (defaults for older args objects) '''
+    return dict(file_format=getattr(args, 'file_format', 'NETCDF4'),
+                zlib=getattr(args, 'zlib', False),
+                complevel=getattr(args, 'complevel', 4),
+                shuffle=getattr(args, 'shuffle', True),
+                chunksize=getattr(args, 'chunksize', None),
+                compact_ints=getattr(args, 'compact_ints', False))
\ No newline at end of file
@@ -1,25 +1,91 @@
+import warnings
+from collections import OrderedDict
+from contextlib import nullcontext
+
 import netCDF4 as nc
 import numpy as np
 import matplotlib.pyplot as plt
 
+from .dataset_pool import DatasetPool, checked_out
+from .grid_edit import reset_surface_height, set_surface_height
+from .grid_sidecar import read_sidecar, write_sidecar, load_variable
+from .validation import check_grid
+
 
 class Grid(object):
 
-    def __init__(self, nc_grid_file):
-        """ Representation of FreeThaw grid files """
+    def __init__(self, nc_grid_file, cache_size: int = 32, pool: DatasetPool = None, sidecar=None):
+        """ Representation of FreeThaw grid files 
+        
+        Variables are read from the file the first time they are requested and kept
+        in a cache of the cache_size most recently used ones (None for no limit).
+        Use preload() to read all of them at once.
+
+        The file stays open until close() (or the end of a with block). With a pool,
+        the file handle is taken from the shared DatasetPool instead.
+
+        With a sidecar directory, the resolved variables are also saved there as .npy files
+        the first time the grid is opened. As long as the grid file keeps the same path,
+        modification time and size, they are memory-mapped (read-only) instead of read
+        from the netCDF file, which is then only opened if needed (e.g. by attrs()).
+        """
         self.nc_grid_file = nc_grid_file
-        self.nc = nc.Dataset(nc_grid_file, 'r')
-        self.vi = self._valid_indices()
-        self._vars = {}
-        self._build_vars()
+        self._pool = pool
+        self._nc = None
+        self._closed = False
+        self._reset_cache(cache_size)
+
+        if sidecar is not None:
+            self._sidecar = read_sidecar(sidecar, nc_grid_file)
+        if self._sidecar is None:
+            self.nc  # fail early if the file cannot be opened
+            if sidecar is not None:
+                self._write_sidecar(sidecar)
+
+    def _reset_cache(self, cache_size):
+        self.cache_size = cache_size
+        self._vars = OrderedDict()
+        self._kinds = None
+        self._vi = None
+        self._pid = None
+        self._sidecar = None
 
     def __del__(self):
         # close nc on deletion
         try:
-            self.nc.close()
-        except AttributeError:
+            self.close()
+        except (AttributeError, RuntimeError):
             pass
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def nc(self) -> nc.Dataset:
+        if self._pool is not None:
+            return self._pool.get(self.nc_grid_file)
+        if self._closed:
+            raise RuntimeError(f"{self} is closed")
+        if self._nc is None:
+            self._nc = nc.Dataset(self.nc_grid_file, 'r')
+        return self._nc
+
+    def close(self):
+        """ Close the file. A file of a shared pool stays open for the other users of the pool. """
+        if getattr(self, '_nc', None) is not None:
+            self._nc.close()
+            self._nc = None
+        self._closed = True
+
+    def _checkout(self):
+        """ context of the dataset, not evicted from the pool until its end """
+        if self._pool is not None:
+            return self._pool.checkout(self.nc_grid_file)
+        return nullcontext(self.nc)
+
     def __repr__(self):
         type_ = type(self)
         module = type_.__module__
@@ -30,44 +96,102 @@ class Grid(object):
         return self.__repr__()
 
     def __getitem__(self, key):
-        return self._vars[key]
+        if key in self._vars:
+            self._vars.move_to_end(key)
+            return self._vars[key]
+
+        value = self._load(key)
+        self._vars[key] = value
+        if self.cache_size is not None:
+            while len(self._vars) > self.cache_size:
+                self._vars.popitem(last=False)
+        return value
+
+    def _load(self, key):
+        kind = self._variable_kinds().get(key)
+        if self._sidecar is not None and kind is not None:
+            return load_variable(self._sidecar, key)
+        elif kind == 'parameter':
+            return self._read(key)[self.pid]
+        elif kind == 'depth':
+            return self._read(key)[self.vi]
+        elif kind == 'constant':
+            return self._read_constant(key)
+        else:
+            raise KeyError(key)
 
+    @checked_out
+    def _read(self, name) -> np.ndarray:
+        return self.nc[name][:].data
+
+    @checked_out
+    def _read_constant(self, name):
+        return self.nc[name][:]
+
+    def _write_sidecar(self, directory):
+        kinds = self._variable_kinds()
+        values = {n: self._load(n) for n in kinds}
+        units = {n: self._units(n) for n in kinds}
+        try:
+            self._sidecar = write_sidecar(directory, self.nc_grid_file, values, kinds, units)
+        except OSError as e:
+            warnings.warn(f"Cannot write the sidecar cache of {self.nc_grid_file} in {directory}: {e}")
+
+    def preload(self):
+        """ Read all variables, and keep them in the cache """
+        if self.cache_size is not None:
+            self.cache_size = max(self.cache_size, len(self.vars))
+        for n in self.vars:
+            self[n]
+
+    def validate(self, rtol: float = 1e-9) -> list:
+        """ Check the geometry and the parameter indices of the grid (see validation.check_grid)
+
+        Returns the description of the problems found, empty if the grid is valid.
+        """
+        return check_grid({n: self._read(n) for n in self._file_variables()}, rtol)
+
+    @checked_out
+    def _file_variables(self) -> list:
+        return list(self.nc.variables)
+
+    @checked_out
     def attrs(self):
         for a in self.nc.ncattrs():
             print(f"{a}: {self.nc.getncattr(a)}")
 
     def _valid_indices(self):
-        return (self.nc['z'][:] != 0).data
+        return self._read('z') != 0
+
+    @property
+    def vi(self):
+        if self._vi is None:
+            self._vi = self._valid_indices()
+        return self._vi
     
     @property
     def pid(self):
-        return self.nc['parameterID'][self.vi].data.astype('int64')
+        if self._pid is None:
+            self._pid = self._read('parameterID')[self.vi].astype('int64')
+        return self._pid
     
     def view(self, param, y='z'):
         """ Plot a parameter against depth or eta """
         fig, ax = plt.subplots()
         
         if y == 'z':
-            ax.plot(self._vars[param], self._vars['z'])
-            try:
-                ax.set_ylabel(f"z [{self.nc['z'].units}]")
-            except AttributeError:
-                ax.set_ylabel(f"z [{self.nc['z'].unit}]")  # hopefuly this get standardized to 'units'
+            ax.plot(self[param], self['z'])
+            ax.set_ylabel(f"z [{self._units('z')}]")
 
         elif y == 'eta':
-            ax.plot(self._vars[param], -np.abs(self._vars['eta']))
-            try:
-                ax.set_ylabel(f"eta [{self.nc['eta'].units}]")
-            except AttributeError:
-                ax.set_ylabel(f"eta [{self.nc['eta'].unit}]")
+            ax.plot(self[param], -np.abs(self['eta']))
+            ax.set_ylabel(f"eta [{self._units('eta')}]")
 
         else:
             raise ValueError(f"Invalid y-axis: {y}")
         
-        try:
-            ax.set_xlabel(f"{param} [{self.nc[param].units}]")
-        except AttributeError:
-            ax.set_xlabel(f"{param}")
+        units = self._units(param)
+        ax.set_xlabel(f"{param} [{units}]" if units is not None else f"{param}")
         
         if param == 'ic':
             # create vertical line at 273.15k
@@ -75,49 +199,71 @@ class Grid(object):
         fig.show()
         return fig
 
+    def _units(self, name):
+        """ units of a variable, None if not defined """
+        if self._sidecar is not None and name in self._sidecar['units']:
+            return self._sidecar['units'][name]
+        with self._checkout() as ds:
+            for attr in ('units', 'unit'):  # hopefuly this get standardized to 'units'
+                try:
+                    return ds[name].getncattr(attr)
+                except AttributeError:
+                    pass
+        return None
+
     def view_all(self):
         pass
     
+    @checked_out
     def parameter_names(self):
         V = [v for v in self.nc.variables if self.nc[v].dimensions == ('parameter',)]
         return V
     
+    @checked_out
     def depth_names(self):
         V = [v for v in self.nc.variables if self.nc[v].dimensions in [('z',), ('k',)]]
         return V
     
+    @checked_out
     def constant_names(self):
         dims = [d for d, v in self.nc.dimensions.items() if v.size == 1]
         V = [v for v in self.nc.variables if len(self.nc[v].dimensions) == 1 and self.nc[v].dimensions[0] in dims]
         return V
     
-    def _build_vars(self):
-        for n in self.parameter_names():
-            self._vars[n] = self.nc[n][:].data[self.pid]
-
-        for z in self.depth_names():
-            self._vars[z] = self.nc[z][:].data[self.vi]
-
-        for z in self.constant_names():
-            self._vars[z] = self.nc[z][:]
+    def _variable_kinds(self) -> dict:
+        """ name -> 'parameter', 'depth' or 'constant' of the variables """
+        if self._kinds is None and self._sidecar is not None:
+            self._kinds = self._sidecar['kinds']
+        if self._kinds is None:
+            kinds = {}
+            for n in self.parameter_names():
+                kinds[n] = 'parameter'
+            for n in self.depth_names():
+                kinds[n] = 'depth'
+            for n in self.constant_names():
+                kinds[n] = 'constant'
+            self._kinds = kinds
+        return self._kinds
     
     @property
     def vars(self):
-        return list(self._vars.keys())
+        return list(self._variable_kinds().keys())
         
 
 def _set_surface_height(grid, height):
-    ''' Set the surface height of a grid to a given value'''
-    with nc.Dataset(grid, 'a') as f:
-        f['surfaceHeight'][:] = height
-    print(f'surfaceHeight set to {round(height, 2)} m')
+    ''' Set the surface height of a grid to a given value (see grid_edit.set_surface_height) '''
+    _raise_failed(set_surface_height([grid], height))
 
 
 def _reset_surface_height(grid):
     '''Set the surface height of a grid according to the current column height (z)'''
-    with nc.Dataset(grid, 'r') as f:
-        zmax = max(f['z'][:])
-    _set_surface_height(grid, zmax)
+    _raise_failed(reset_surface_height([grid]))
+
+
+def _raise_failed(report):
+    failed = report[report['status'] == 'failed']
+    if len(failed):
+        raise RuntimeError(f"{failed['file'].iloc[0]}: {failed['error'].iloc[0]}")
 
 
 if __name__ == "__main__":
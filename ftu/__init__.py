@@ -4,5 +4,17 @@ from .Grid import Grid
 from .plot_spinup import profile_evo, show_spinup
 from .isotherms import extract_alt_isotherm, extract_alt_isotherm_depth
 from .all_variables import AllVariables
+from .multi_variables import MultiVariables
+from .ensemble import reduce_ensemble
+from .export import export_columnar
+from .aggregation import aggregate, mean_annual_ground_temperature, annual_envelope, degree_days
+from .grid_batch import make_grids
+from .memory_grid import MemoryGrid, create_grid
+from .dataset_pool import DatasetPool
+from .grid_collection import GridCollection
+from .grid_edit import edit_grids, set_surface_height, reset_surface_height
+from .validation import validate_grids
 
-__all__ = ["OmsTable", "read_oms_table", "write_oms", "FreeThawSim", "Grid", "profile_evo", "show_spinup", "extract_alt_isotherm", "extract_alt_isotherm_depth", "AllVariables"]
+__all__ = ["OmsTable", "read_oms_table", "write_oms", "FreeThawSim", "Grid", "profile_evo", "show_spinup", "extract_alt_isotherm", "extract_alt_isotherm_depth", "AllVariables", "MultiVariables", "reduce_ensemble", "export_columnar", "aggregate", "mean_annual_ground_temperature", "annual_envelope", "degree_days",
+           "make_grids", "MemoryGrid", "create_grid", "DatasetPool", "GridCollection",
+           "edit_grids", "set_surface_height", "reset_surface_height", "validate_grids"]
@@ -0,0 +1,230 @@
+"""
+Temporal aggregation of (time, k) ground temperatures (or any other variable).
+
+The time steps are mapped to integer period codes (days, months or years since 1970, in the
+calendar of the dates: datetime64, or cftime dates for the other calendars), and
+the statistics of each period are computed for all the nodes at once with ufunc.reduceat
+over the runs of equal codes. The data are taken block by block (e.g. from iter_blocks), so
+century-long hourly files are aggregated without reading them whole; a period split between
+two blocks is merged. The time steps must be in order.
+
+Statistics, each a (period, k) array:
+
+    mean, min, max, count : of the valid (not NaN nor masked) values
+    fdd, tdd : freezing and thawing degree-days, the time integrals of the values below and
+               above 0 °C [°C day], with the time step of the data
+"""
+from datetime import timedelta
+
+import numpy as np
+
+
+FREQUENCIES = ('D', 'M', 'Y')
+
+STATISTICS = ('mean', 'min', 'max', 'count', 'fdd', 'tdd')
+
+# how the partial sums of a period in two blocks are combined
+_MERGE = {'sum': np.add, 'count': np.add, 'min': np.fmin, 'max': np.fmax, 'freezing': np.add, 'thawing': np.add}
+
+
+def period_codes(times, freq: str) -> np.ndarray:
+    """ Integer period of each time: days ('D'), months ('M') or years ('Y') since 1970 """
+    if freq not in FREQUENCIES:
+        raise ValueError(f"Invalid freq: {freq}. Choose from {list(FREQUENCIES)}")
+    times = np.asarray(times)
+    if times.dtype != object:
+        return times.astype('datetime64[ns]').astype(f'datetime64[{freq}]').astype('int64')
+    if freq == 'Y':
+        return np.array([t.year - 1970 for t in times], dtype='int64')
+    if freq == 'M':
+        return np.array([12 * (t.year - 1970) + t.month - 1 for t in times], dtype='int64')
+    origin = _date(times[0], 1970, 1, 1) if times.size else None
+    return np.array([(t - origin).days for t in times], dtype='int64')
+
+
+def period_starts(codes: np.ndarray, freq: str, like=None) -> np.ndarray:
+    """ First date of the periods codes: datetime64[freq], or dates of the type and calendar of
+    the date like (cftime or datetime) """
+    if like is None:
+        return np.asarray(codes).astype(f'datetime64[{freq}]')
+    if freq == 'Y':
+        starts = [_date(like, 1970 + c, 1, 1) for c in codes]
+    elif freq == 'M':
+        starts = [_date(like, 1970 + c // 12, c % 12 + 1, 1) for c in codes]
+    else:
+        origin = _date(like, 1970, 1, 1)
+        starts = [origin + timedelta(days=int(c)) for c in codes]
+    out = np.empty(len(starts), dtype=object)
+    out[:] = starts
+    return out
+
+
+def _date(like, year: int, month: int, day: int):
+    """ midnight of a day, as a date of the type (and calendar) of like """
+    return like.replace(year=int(year), month=int(month), day=int(day), hour=0, minute=0, second=0, microsecond=0)
+
+
+def _step_days(times) -> float:
+    """ median time step [day] """
+    times = np.asarray(times)
+    if times.dtype != object:
+        return float(np.median(np.diff(times.astype('datetime64[ns]'))) / np.timedelta64(1, 'D'))
+    return float(np.median([d.total_seconds() for d in np.diff(times)]) / 86400)
+
+
+class Aggregator:
+
+    def __init__(self, freq: str = 'M', step: float = None, kelvin: bool = None):
+        """ Statistics per period of blocks of (time, k) values
+
+        Parameters
+        ----------
+        freq : str, optional
+            'D' (daily), 'M' (monthly, default) or 'Y' (annual)
+        step : float, optional
+            time step of the data [day] for the degree-days, by default the median step of the
+            first block with more than one time step
+        kelvin : bool, optional
+            values are in K (0 °C is 273.15), by default guessed from the first block as in
+            isotherms.ensure_units_celcius (a maximum above 100)
+        """
+        period_codes([], freq)
+        self.freq = freq
+        self.step = step
+        self.kelvin = kelvin
+        self._like = None  # a date, for dates that are not datetime64
+        self._codes = []
+        self._parts = []
+
+    def add(self, times, values):
+        """ Add a block of time steps: times (time,) and values (time, k) or (time,) """
+        codes = period_codes(times, self.freq)
+        if codes.size == 0:
+            return
+        if self._like is None and np.asarray(times).dtype == object:
+            self._like = np.asarray(times)[0]
+        v = np.ma.filled(np.ma.asarray(values, dtype=float), np.nan)
+        v = v.reshape(len(codes), -1)
+        ok = np.isfinite(v)
+
+        if self.step is None and codes.size > 1:
+            self.step = _step_days(times)
+        if self.kelvin is None and ok.any():
+            self.kelvin = bool(np.nanmax(v) > 100)
+        celsius = v - 273.15 if self.kelvin else v
+
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        part = {'sum': np.add.reduceat(np.where(ok, v, 0), starts, axis=0),
+                'count': np.add.reduceat(ok.astype('int64'), starts, axis=0),
+                'min': np.fmin.reduceat(v, starts, axis=0),
+                'max': np.fmax.reduceat(v, starts, axis=0),
+                'freezing': np.add.reduceat(np.where(ok, np.minimum(celsius, 0), 0), starts, axis=0),
+                'thawing': np.add.reduceat(np.where(ok, np.maximum(celsius, 0), 0), starts, axis=0)}
+        codes = codes[starts]
+
+        # merge the first period of the block with the last one of the previous block
+        if self._codes and self._codes[-1][-1] == codes[0]:
+            width = max(self._parts[-1]['sum'].shape[1], part['sum'].shape[1])
+            last = self._parts[-1] = {key: _pad(key, a, width) for key, a in self._parts[-1].items()}
+            first = {key: _pad(key, a[:1], width) for key, a in part.items()}
+            for key, merge in _MERGE.items():
+                last[key][-1] = merge(last[key][-1], first[key][0])
+            codes = codes[1:]
+            part = {key: a[1:] for key, a in part.items()}
+
+        if codes.size:
+            self._codes.append(codes)
+            self._parts.append(part)
+
+    def result(self):
+        """ Periods and statistics
+
+        Returns
+        -------
+        tuple
+            (periods, stats): the start of each period (see period_starts) and a dict of
+            (period, k) arrays (see the module), NaN where a node has no valid value
+        """
+        if not self._codes:
+            return period_starts(np.array([], dtype='int64'), self.freq), {name: np.empty((0, 0)) for name in STATISTICS}
+
+        codes = np.concatenate(self._codes)
+        width = max(part['sum'].shape[1] for part in self._parts)
+        merged = {key: np.concatenate([_pad(key, part[key], width) for part in self._parts]) for key in _MERGE}
+
+        count = merged['count']
+        step = np.nan if self.step is None else self.step
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stats = {'mean': np.where(count > 0, merged['sum'] / count, np.nan),
+                     'min': merged['min'],
+                     'max': merged['max'],
+                     'count': count,
+                     'fdd': np.where(count > 0, -merged['freezing'] * step, np.nan),
+                     'tdd': np.where(count > 0, merged['thawing'] * step, np.nan)}
+        return period_starts(codes, self.freq, self._like), stats
+
+
+def _pad(key: str, a: np.ndarray, width: int) -> np.ndarray:
+    """ (period, n) array of statistic key to (period, width), with the nodes at the end empty """
+    if a.shape[1] == width:
+        return a
+    fill = np.nan if key in ('min', 'max') else 0
+    return np.concatenate([a, np.full((a.shape[0], width - a.shape[1]), fill, dtype=a.dtype)], axis=1)
+
+
+def aggregate_array(times, values, freq: str = 'M', **options):
+    """ Statistics per period of in-memory values (time, k), e.g. the inputs of
+    extract_alt_isotherm. options are those of Aggregator. Returns as Aggregator.result. """
+    agg = Aggregator(freq, **options)
+    agg.add(times, values)
+    return agg.result()
+
+
+def aggregate(source, variable: str = 'T', freq: str = 'M', block_size: int = 8760, start: int = 0,
+              stop: int = None, **options):
+    """ Statistics per period of a (time, k) or (time,) variable, read block by block
+
+    Parameters
+    ----------
+    source : AllVariables or MultiVariables
+        output
+    variable : str, optional
+        variable, by default 'T'
+    freq : str, optional
+        'D', 'M' (default) or 'Y'
+    block_size : int, optional
+        number of time steps read at once, by default 8760
+    start, stop : int, optional
+        range of time steps, by default all of them
+    options :
+        step, kelvin (see Aggregator)
+
+    Returns
+    -------
+    tuple
+        (periods, stats), see Aggregator.result. Nodes are the valid nodes of the output, in order.
+    """
+    agg = Aggregator(freq, **options)
+    for t, values in source.iter_blocks([variable], block_size, start, stop):
+        agg.add(t, values[variable])
+    return agg.result()
+
+
+def mean_annual_ground_temperature(source, variable: str = 'T', **options):
+    """ MAGT: (years, (year, k) mean) of each node, see aggregate for the options """
+    years, stats = aggregate(source, variable, 'Y', **options)
+    return years, stats['mean']
+
+
+def annual_envelope(source, variable: str = 'T', **options):
+    """ Annual temperature envelope: (years, (year, k) minimum, (year, k) maximum) of each node,
+    see aggregate for the options """
+    years, stats = aggregate(source, variable, 'Y', **options)
+    return years, stats['min'], stats['max']
+
+
+def degree_days(source, variable: str = 'T', freq: str = 'Y', **options):
+    """ Freezing and thawing degree-days: (periods, (period, k) fdd, (period, k) tdd) [°C day],
+    annual by default, see aggregate for the options """
+    periods, stats = aggregate(source, variable, freq, **options)
+    return periods, stats['fdd'], stats['tdd']
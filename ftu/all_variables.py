@@ -1,45 +1,325 @@
+from contextlib import nullcontext
+
 import netCDF4 as nc
 import numpy as np
 
+from .dataset_pool import DatasetPool, checked_out
+from .time_axis import decode_time, time_slice
+
 
 class AllVariables:
 
-    def __init__(self, file):
+    def __init__(self, file, pool: DatasetPool = None, ragged: str = 'masked'):
+        """ Output file of FreeThaw with all variables
+
+        The file stays open until close() (or the end of a with block). With a pool,
+        the file handle is taken from the shared DatasetPool instead.
+
+        (time, k) variables are returned at the valid nodes only (height neither 0 nor NaN).
+        When the number of valid nodes changes in time (e.g. layers lost with excess ice),
+        ragged selects what is returned: 'masked' (default), a (time, max count) masked array
+        with the valid values first in each row; 'list', one array per time step; or 'raise'.
+        """
+        if ragged not in ('masked', 'list', 'raise'):
+            raise ValueError(f"Invalid ragged: {ragged}")
         self.file = file
-        self.ds = nc.Dataset(file)
-        self.ix = _valid_indices_2d(self.ds['height'][:])
+        self._pool = pool
+        self.ragged = ragged
+        self._ds = None if pool is not None else nc.Dataset(file)
+        self._ix = None
+        self._time = None
+        self._time_values = None
+        self._bounds = None  # ((start, stop), height_bounds) of the last rows
+
+    def __del__(self):
+        try:
+            self.close()
+        except (AttributeError, RuntimeError):
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def ds(self) -> nc.Dataset:
+        if self._pool is not None:
+            return self._pool.get(self.file)
+        if self._ds is None:
+            raise RuntimeError(f"{self.file} is closed")
+        return self._ds
+
+    def close(self):
+        """ Close the file. A file of a shared pool stays open for the other users of the pool. """
+        if getattr(self, '_ds', None) is not None:
+            self._ds.close()
+            self._ds = None
+
+    def _checkout(self):
+        """ context of the dataset, not evicted from the pool until its end """
+        if self._pool is not None:
+            return self._pool.checkout(self.file)
+        return nullcontext(self.ds)
+
+    @property
+    @checked_out
+    def ix(self) -> np.ndarray:
+        """ (time, k) valid nodes, read from height the first time they are needed """
+        if self._ix is None:
+            self._ix = _valid_indices_2d(self.ds['height'][:])
+        return self._ix
+
+    @checked_out
+    def height_bounds(self, rows: slice = slice(None), block_size: int = 8760) -> tuple:
+        """ (k,) lowest and highest height of each node and (time,) surface height over the
+        time steps rows, NaN where a node is never valid
+
+        height is read block by block of time steps; the bounds of the last rows are cached.
+        """
+        rows = slice(*rows.indices(self.ds.dimensions['time'].size))
+        key = (rows.start, rows.stop)
+        if self._bounds is not None and self._bounds[0] == key:
+            return self._bounds[1]
 
+        n_k = self.ds.dimensions['k'].size
+        low, high = np.full(n_k, np.inf), np.full(n_k, -np.inf)
+        surface = []
+        for i in range(rows.start, max(rows.start, rows.stop), block_size):
+            block = slice(i, min(i + block_size, rows.stop))
+            height = self.ds['height'][block]
+            valid = _valid_indices_2d(height)
+            h = np.where(valid, np.ma.getdata(height).astype(float), np.nan)
+            low = np.fmin(low, np.min(np.where(valid, h, np.inf), axis=0))
+            high = np.fmax(high, np.max(np.where(valid, h, -np.inf), axis=0))
+            surface.append(self._surface_height(h, block))
+
+        used = np.isfinite(low)
+        bounds = (np.where(used, low, np.nan), np.where(used, high, np.nan),
+                  np.concatenate(surface) if surface else np.empty(0))
+        self._bounds = (key, bounds)
+        return bounds
+
+    @checked_out
     def __getitem__(self, key):
         raw = self.ds[key]
         var = self.__returnvar(raw)
         return var
 
-    def get(self, var, atdepth=None, atheight=None):
-        """ Return value of variable at desired depth or height """
-        if atdepth:
-            return _get_var_at_depth(self[var], self['height'], atdepth)
-        elif atheight:
-            return _get_var_at_height(self[var], self['height'], atheight)
+    @checked_out
+    def get(self, var, atdepth=None, atheight=None, start=None, end=None):
+        """ Return value of variable at desired depth or height
+
+        Parameters
+        ----------
+        var : str
+            (time, k) variable
+        atdepth : float or list, optional
+            depths below the soil surface [m], positive downward. The surface is the
+            surface_height (or surfaceHeight) variable of the file if there is one, otherwise
+            the upper bound of the top cell at each time step (see _top_of_column).
+        atheight : float or list, optional
+            heights [m], in the coordinates of the height variable
+        start, end : optional
+            dates, as for time_index, to read only a window of time steps; by default all of them
+
+        Returns
+        -------
+        np.ndarray
+            linearly interpolated between the valid nodes enclosing each depth or height, NaN outside
+            of the column: (time,) for a single depth or height, (time, n) for a list of them
+        """
+        rows = slice(None) if start is None and end is None else self.time_index(start, end)
+        return self._get_rows(var, atdepth, atheight, rows)
+
+    @checked_out
+    def _get_rows(self, var, atdepth=None, atheight=None, rows: slice = slice(None)):
+        """ get() for the time steps rows """
+        if rows == slice(None):
+            if atdepth is None and atheight is None:
+                return self[var]
+            valid = self.ix
+        else:
+            valid = _valid_indices_2d(self.ds['height'][rows])
+            if atdepth is None and atheight is None:
+                return _subsample_valid(self.ds[var], valid, self.ragged, rows)
+
+        height = _subsample_valid(self.ds['height'], valid, 'masked', rows)
+        values = _subsample_valid(self.ds[var], valid, 'masked', rows)
+        if atdepth is not None:
+            return _get_var_at_depth(values, height, atdepth, self._surface_height(height, rows))
         else:
-            return self[var]
+            return _get_var_at_height(values, height, atheight)
+
+    def _surface_height(self, height, rows: slice = slice(None)) -> np.ndarray:
+        """ (time,) height of the soil surface at the time steps rows (those of height) """
+        for name in ('surface_height', 'surfaceHeight'):
+            if name in self.ds.variables and _dim_is_time(self.ds[name]):
+                return np.ma.getdata(self.ds[name][rows]).astype(float)
+        return _top_of_column(height)
         
     @property
-    def time(self):
-        """ Time values """
+    @checked_out
+    def time(self) -> np.ndarray:
+        """ Time values, as datetime64[ns], or cftime dates for calendars it cannot represent
+        (see time_axis.decode_time). Decoded once and cached. """
+        if self._time is None:
+            self._time = self._dates(slice(None))
+        return self._time
+
+    def _dates(self, rows: slice) -> np.ndarray:
+        if self._time is not None:
+            return self._time[rows]
+        timevar = self.ds['time']
+        return decode_time(timevar[rows], timevar.units, getattr(timevar, 'calendar', 'standard'))
+
+    @checked_out
+    def time_index(self, start=None, end=None) -> slice:
+        """ Time steps from start (included) to end (excluded), e.g. time_index('2010-01-01', '2011-01-01').
+        None for an open end. Use it to limit reads, e.g. iter_blocks(..., start=s.start, stop=s.stop).
+
+        The dates are compared with the numeric time values in the calendar of the file, so
+        this works for any calendar (dates may be strings, datetimes or cftime dates).
+        """
         timevar = self.ds['time']
-        times = nc.num2date(timevar[:], timevar.units, 'standard',
-                            only_use_python_datetimes=True, 
-                            only_use_cftime_datetimes=False)
-        return times
+        if self._time_values is None:
+            self._time_values = np.ma.getdata(timevar[:])
+        return time_slice(self._time_values, timevar.units, getattr(timevar, 'calendar', 'standard'), start, end)
+
+    @checked_out
+    def read(self, variables: list, start=None, end=None, depth: tuple = None, height: tuple = None):
+        """ Variables in a window of dates and a range of depths or heights, e.g. the top 3 m
+        from 2000 to 2020: read(['T'], '2000-01-01', '2021-01-01', depth=(0, 3))
+
+        Only the hyperslab of the time steps and nodes (k) that can be in the range is read;
+        the nodes range is found from height_bounds of these time steps.
+
+        Parameters
+        ----------
+        variables : list
+            names of the variables
+        start, end : optional
+            dates, as for time_index; None for an open end
+        depth : tuple, optional
+            (top, bottom) depths below the soil surface [m], positive downward (see get);
+            None for an open end
+        height : tuple, optional
+            (bottom, top) heights [m], in the coordinates of the height variable
+
+        Returns
+        -------
+        tuple
+            (time, values): the times of the window and a dict of the variables. (time, k)
+            variables are (time, n) masked arrays of the n consecutive nodes read, masked where a
+            node is not valid or not in the range at that time step; (k,) variables are those n nodes.
+        """
+        return self._read_rows(variables, self.time_index(start, end), depth, height)
+
+    @checked_out
+    def _read_rows(self, variables: list, rows: slice, depth: tuple = None, height: tuple = None,
+                   cols: slice = None):
+        """ read() for the time steps rows; cols, the nodes read, by default those of _columns """
+        if depth is not None and height is not None:
+            raise ValueError("Select either depth or height")
+        rows = slice(*rows.indices(self.ds.dimensions['time'].size))
+        if cols is None:
+            cols = self._columns(rows, depth, height)
+
+        h = self.ds['height'][rows, cols]
+        keep = _valid_indices_2d(h)
+        h = np.ma.getdata(h).astype(float)
+        if height is not None:
+            lo, hi = _range(height)
+            keep &= (h >= lo) & (h <= hi)
+        elif depth is not None:
+            lo, hi = _range(depth)
+            d = self.height_bounds(rows)[2][:, None] - h
+            keep &= (d >= lo) & (d <= hi)
+
+        values = {}
+        for name in variables:
+            var = self.ds[name]
+            if _dim_is_time_k(var):
+                values[name] = np.ma.array(np.ma.getdata(var[rows, cols]), mask=~keep)
+            elif _dim_is_k(var):
+                values[name] = var[cols]
+            elif _dim_is_time(var):
+                values[name] = var[rows]
+            else:
+                raise ValueError(f"Variable {name} does not have a valid dimension")
+        return self._dates(rows), values
+
+    @checked_out
+    def _columns(self, rows: slice, depth: tuple = None, height: tuple = None) -> slice:
+        """ consecutive nodes (k) that can be in the range of depths or heights at the time steps
+        rows (a slice with start and stop), all of them without a range """
+        if depth is None and height is None:
+            return slice(0, self.ds.dimensions['k'].size)
+        low, high, surface = self.height_bounds(rows)
+        lo, hi = _range(depth if height is None else height)
+        if depth is not None:
+            lo, hi = np.nanmin(surface, initial=np.inf) - hi, np.nanmax(surface, initial=-np.inf) - lo
+        k = np.flatnonzero((high >= lo) & (low <= hi))
+        return slice(int(k[0]), int(k[-1]) + 1) if k.size else slice(0, 0)
+
+    def iter_blocks(self, variables: list, block_size: int = 8760, start: int = 0, stop: int = None):
+        """ Iterate over the variables in blocks of time steps, without reading the whole file
+
+        Each block is read as a hyperslab, and the valid nodes of a block are taken from the
+        height of that block only. (time, k) variables are returned as by self[...] for the
+        time steps of the block (with ragged, their number of columns may change between blocks).
+
+        Parameters
+        ----------
+        variables : list
+            names of the variables
+        block_size : int, optional
+            number of time steps per block, by default 8760 (a year of hourly output)
+        start, stop : int, optional
+            range of time steps, by default all of them
+
+        Yields
+        ------
+        tuple
+            (time, values): the times of the block and a dict of the variables
+        """
+        if block_size < 1:
+            raise ValueError("block_size must be at least 1")
+        with self._checkout():
+            yield from self._iter_blocks(variables, block_size, start, stop)
+
+    def _iter_blocks(self, variables: list, block_size: int, start: int, stop: int):
+        n = self.ds.dimensions['time'].size
+        stop = n if stop is None else min(stop, n)
+
+        for i in range(start, stop, block_size):
+            rows = slice(i, min(i + block_size, stop))
+            valid = None
+            values = {}
+            for name in variables:
+                var = self.ds[name]
+                if _dim_is_time_k(var):
+                    if valid is None:
+                        valid = _valid_indices_2d(self.ds['height'][rows])
+                    values[name] = _subsample_valid(var, valid, self.ragged, rows)
+                elif _dim_is_k(var):
+                    values[name] = var[:]
+                elif _dim_is_time(var):
+                    values[name] = var[rows]
+                else:
+                    raise ValueError(f"Variable {name} does not have a valid dimension")
+            yield self._dates(rows), values
 
     @property
+    @checked_out
     def vars(self) -> list:
         """ List of variables in file """
         return list(self.ds.variables)
     
     def __returnvar(self, var: nc.Variable) -> np.ndarray:
         if _dim_is_time_k(var):
-            return _subsample_valid(var, self.ix)
+            return _subsample_valid(var, self.ix, self.ragged)
         elif _dim_is_k(var):
             return var[:]
         elif _dim_is_time(var):
@@ -60,42 +340,105 @@ def _dim_is_time(var: nc.Variable) -> bool:
     return var.dimensions == ('time',)
      
 
-def _valid_indices_1d(arr: np.ndarray) -> np.ndarray:
-    """ 1 time slice array (k,)"""
-    isn = np.isnan(arr)
-    is0 = arr == 0
-    valid = ~(isn | is0)
-    return valid
+def _range(bounds) -> tuple:
+    """ (low, high) of a pair of values in any order; None for an open end """
+    a = -np.inf if bounds[0] is None else float(bounds[0])
+    b = np.inf if bounds[1] is None else float(bounds[1])
+    return (a, b) if a <= b else (b, a)
+
+
+def _top_of_column(height) -> np.ndarray:
+    """ (time,) upper bound of the top cell of (time, k) node heights (masked or NaN where invalid):
+    half the spacing of the two top valid nodes above the top one, the top node itself if it is
+    the only valid one, NaN without valid node """
+    h = np.sort(np.ma.filled(np.ma.masked_invalid(np.ma.asarray(height, dtype=float)), -np.inf), axis=1)
+    top = h[:, -1] if h.shape[1] else np.full(h.shape[0], -np.inf)
+    below = h[:, -2] if h.shape[1] > 1 else np.full(h.shape[0], -np.inf)
+    with np.errstate(invalid='ignore'):
+        surface = np.where(np.isfinite(below), top + (top - below) / 2, top)
+    return np.where(np.isfinite(surface), surface, np.nan)
 
 
 def _valid_indices_2d(arr: np.ndarray) -> np.ndarray:
-    """ 2d array (time,k)"""
-    valid = np.apply_along_axis(_valid_indices_1d, 1, arr)
+    """ 2d array (time,k); masked values are not valid """
+    data = np.ma.getdata(arr)
+    valid = np.isfinite(data) & (data != 0) & ~np.ma.getmaskarray(arr)
     return valid
 
 
-def _subsample_valid(arr: np.ndarray, valid: np.ndarray) -> np.ndarray:
-    """ 2d array (time,k,)"""
-    k=np.apply_along_axis(np.sum, 1, valid)
-    i=len(k)
-    j=max(k)
-    
-    if not np.all(k == j):
+def _subsample_valid(arr, valid: np.ndarray, ragged: str = 'raise', rows: slice = slice(None)):
+    """ 2d array (time,k,) at the valid points, for the time steps rows of arr (valid is for these rows)
+
+    If every time slice has the same valid points and they are contiguous, only that slice
+    of arr is read (a view if arr is an array). With the same number of valid points, the
+    result is a (time, count) array. Otherwise, see AllVariables for ragged.
+    """
+    if not valid.any():
+        return np.empty((valid.shape[0], 0), dtype=arr.dtype)
+
+    counts = np.count_nonzero(valid, axis=1)
+
+    if np.all(valid == valid[:1]):
+        cols = np.flatnonzero(valid[0])
+        if cols.size and cols[-1] - cols[0] + 1 == cols.size:
+            return np.ma.getdata(arr[rows, cols[0]:cols[-1] + 1])
+        return np.ma.getdata(arr[rows, cols])
+
+    data = np.ma.getdata(arr[rows])
+    if np.all(counts == counts[0]):
+        return data[valid].reshape(valid.shape[0], counts[0])
+
+    if ragged == 'raise':
         raise ValueError("Not all time slices have the same number of valid points")
-    
-    subsample = np.empty((i,j))
-    
-    for i, v in enumerate(valid):
-        subsample[i,:] = arr[i,:][v]
-    
+    elif ragged == 'list':
+        return np.split(data[valid], np.cumsum(counts)[:-1])
+
+    # padded: valid values first in each row, then masked
+    steps, _ = np.nonzero(valid)
+    cols = (np.cumsum(valid, axis=1) - 1)[valid]
+    subsample = np.ma.masked_all((valid.shape[0], counts.max()), dtype=data.dtype)
+    subsample[steps, cols] = data[valid]
     return subsample
 
 
-def _get_var_at_height(var: np.ndarray, height: np.ndarray, h: float) -> np.ndarray:
-    """ 2d array (time,)"""
-    return None
+def _get_var_at_height(var: np.ndarray, height: np.ndarray, h) -> np.ndarray:
+    """ 2d arrays (time,k) of the valid points, first in each row (the rest masked or NaN);
+    h: heights (n,) or (time, n). Returns (time,) for a single height, (time, n) otherwise """
+    single = np.ndim(h) == 0
+    h = np.atleast_1d(np.asarray(h, dtype=float))
+    h = np.broadcast_to(h, (var.shape[0], h.shape[-1]))
+
+    H = np.ma.filled(np.ma.masked_invalid(np.ma.asarray(height, dtype=float)), np.nan)
+    V = np.ma.filled(np.ma.asarray(var, dtype=float), np.nan)
+    n = np.count_nonzero(np.isfinite(H), axis=1)
+
+    # heights must increase along each row; columns ordered from the surface downward are reversed
+    first = np.flatnonzero(n > 1)
+    if first.size and H[first[0], 1] < H[first[0], 0]:
+        order = np.where(np.arange(H.shape[1]) < n[:, None], n[:, None] - 1 - np.arange(H.shape[1]), np.arange(H.shape[1]))
+        H, V = np.take_along_axis(H, order, axis=1), np.take_along_axis(V, order, axis=1)
+    H = np.where(np.isfinite(H), H, np.inf)
+
+    rows = np.arange(H.shape[0])[:, None]
+    out = np.full(h.shape, np.nan)
+    for j in range(h.shape[1]):
+        target = h[:, j:j + 1]
+        lo = np.clip(np.count_nonzero(H <= target, axis=1) - 1, 0, np.maximum(n - 2, 0))[:, None]
+        hi = np.minimum(lo + 1, H.shape[1] - 1)
+        h0, h1 = H[rows, lo], H[rows, hi]
+        v0, v1 = V[rows, lo], V[rows, hi]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            w = np.where(h1 > h0, (target - h0) / (h1 - h0), 0.0)
+        inside = (target >= H[:, :1]) & (target <= H[rows, np.maximum(n - 1, 0)[:, None]]) & (n[:, None] > 0)
+        out[:, j] = np.where(inside, v0 + w * (v1 - v0), np.nan)[:, 0]
+
+    return out[:, 0] if single else out
+
 
-def _get_var_at_depth(var: np.ndarray, depth: np.ndarray, d: float) -> np.ndarray:
-    """ 2d array (time,)"""
-    return None
+def _get_var_at_depth(var: np.ndarray, height: np.ndarray, d, surface: np.ndarray) -> np.ndarray:
+    """ 2d arrays (time,k) as for _get_var_at_height; d: depths below surface (time,). """
+    single = np.ndim(d) == 0
+    h = np.asarray(surface, dtype=float)[:, None] - np.atleast_1d(np.asarray(d, dtype=float))[None, :]
+    out = _get_var_at_height(var, height, h)
+    return out[:, 0] if single else out
 
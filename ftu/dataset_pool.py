@@ -0,0 +1,128 @@
+import functools
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+import netCDF4 as nc
+
+
+class DatasetPool:
+
+    def __init__(self, maxsize: int = 128):
+        """ Pool of open netCDF datasets shared by Grid and AllVariables objects
+
+        At most maxsize files are kept open; opening another one closes the least
+        recently used that is not checked out. A dataset closed this way is opened again
+        the next time it is requested, so the objects using the pool do not notice the eviction.
+
+        A dataset read over several calls (or while other threads use the pool) must be
+        taken with checkout(), which keeps it open until the end of the with block; the pool
+        then holds more than maxsize files if all of them are checked out. Datasets taken
+        with get() can be closed by any later get() or checkout() of another file.
+
+        Parameters
+        ----------
+        maxsize : int, optional
+            maximum number of open files, by default 128
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+        self.maxsize = maxsize
+        self._datasets = OrderedDict()
+        self._users = {}  # key -> number of checkouts
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        type_ = type(self)
+        return f"{type_.__module__}.{type_.__qualname__} ({len(self)}/{self.maxsize} open)"
+
+    def __len__(self):
+        return len(self._datasets)
+
+    def __contains__(self, file):
+        return (self._key(file), 'r') in self._datasets
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close_all()
+
+    @staticmethod
+    def _key(file) -> str:
+        return str(Path(file).resolve())
+
+    def get(self, file, mode: str = 'r') -> nc.Dataset:
+        """ Open dataset of file, opening it if needed """
+        with self._lock:
+            return self._open(file, mode)[1]
+
+    @contextmanager
+    def checkout(self, file, mode: str = 'r'):
+        """ Open dataset of file, not closed by the pool (evicted) until the end of the with block
+
+        >>> with pool.checkout(file) as ds:
+        ...     T = ds['T'][:]
+        """
+        with self._lock:
+            key, ds = self._open(file, mode)
+            self._users[key] = self._users.get(key, 0) + 1
+        try:
+            yield ds
+        finally:
+            with self._lock:
+                self._users[key] -= 1
+                if self._users[key] == 0:
+                    del self._users[key]
+                self._evict()
+
+    def _open(self, file, mode: str) -> tuple:
+        key = (self._key(file), mode)
+        ds = self._datasets.get(key)
+        if ds is not None and ds.isopen():
+            self._datasets.move_to_end(key)
+            return key, ds
+
+        ds = nc.Dataset(file, mode)
+        self._datasets[key] = ds
+        self._evict(keep=key)
+        return key, ds
+
+    def _evict(self, keep=None):
+        """ close the least recently used datasets that are not checked out (nor keep), down to maxsize """
+        unused = [k for k in self._datasets if k not in self._users and k != keep]
+        for key in unused[:max(0, len(self._datasets) - self.maxsize)]:
+            _close(self._datasets.pop(key))
+
+    def close(self, file):
+        """ Close the datasets of file, even if checked out """
+        path = self._key(file)
+        with self._lock:
+            for key in [k for k in self._datasets if k[0] == path]:
+                _close(self._datasets.pop(key))
+
+    def close_all(self):
+        """ Close all datasets, even if checked out """
+        with self._lock:
+            while self._datasets:
+                _, ds = self._datasets.popitem()
+                _close(ds)
+
+
+def _close(ds: nc.Dataset):
+    try:
+        if ds.isopen():
+            ds.close()
+    except RuntimeError:
+        pass
+
+
+def checked_out(method):
+    """ Decorator of the methods of an object with a _checkout() context manager (AllVariables,
+    Grid), so that its dataset is not evicted from the pool during the call """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._checkout():
+            return method(self, *args, **kwargs)
+    return wrapper
@@ -0,0 +1,255 @@
+"""
+Reduce the output files of an ensemble of simulations, in a pool of processes.
+
+A reduction is a function of an open AllVariables returning rows of the result table,
+as a pd.DataFrame (or a dict or list of dicts) with some of the columns year, depth, statistic
+and value, or a single number (the value). Functions must be defined at module level to
+be used with more than one job; use functools.partial to set their options.
+
+The results are appended to a .csv table as the files are done, so that an interrupted
+run can be resumed: files whose reductions are already in the table are skipped.
+"""
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .all_variables import AllVariables, _top_of_column
+from .isotherms import _years, depth_to_height, ensure_units_celcius, get_continuous_alt
+from .parallel import error_message, run_per_item
+from .time_axis import time_in_days
+
+
+VALUE_COLUMNS = ['year', 'depth', 'statistic', 'value']
+
+COLUMNS = ['file', 'reduction'] + VALUE_COLUMNS + ['status', 'error']
+
+
+def mean_temperature(av: AllVariables, variable: str = 'T', block_size: int = 8760) -> pd.DataFrame:
+    """ Mean of variable at each valid node over the whole file, with the mean depth of the node """
+    k = av.ds.dimensions['k'].size
+    total, depth, count = np.zeros(k), np.zeros(k), np.zeros(k)
+    for _, values, d in _blocks(av, variable, block_size):
+        n = values.shape[1]
+        ok = np.isfinite(values)
+        total[:n] += np.where(ok, values, 0).sum(axis=0)
+        depth[:n] += np.where(ok, d, 0).sum(axis=0)
+        count[:n] += ok.sum(axis=0)
+    used = count > 0
+    return pd.DataFrame({'depth': depth[used] / count[used], 'statistic': 'mean', 'value': total[used] / count[used]})
+
+
+def annual_extremes(av: AllVariables, variable: str = 'T', block_size: int = 8760) -> pd.DataFrame:
+    """ Annual minimum and maximum of variable at each valid node, with the mean depth of the node """
+    k = av.ds.dimensions['k'].size
+    years = {}
+    for t, values, d in _blocks(av, variable, block_size):
+        year = _years(t)
+        starts = np.flatnonzero(np.r_[True, year[1:] != year[:-1]])
+        n = values.shape[1]
+        ok = np.isfinite(values)
+        lows = np.fmin.reduceat(values, starts, axis=0)
+        highs = np.fmax.reduceat(values, starts, axis=0)
+        depths = np.add.reduceat(np.where(ok, d, 0), starts, axis=0)
+        counts = np.add.reduceat(ok.astype(int), starts, axis=0)
+        for y, low, high, dsum, c in zip(year[starts], lows, highs, depths, counts):
+            acc = years.setdefault(int(y), [np.full(k, np.nan), np.full(k, np.nan), np.zeros(k), np.zeros(k)])
+            acc[0][:n] = np.fmin(acc[0][:n], low)
+            acc[1][:n] = np.fmax(acc[1][:n], high)
+            acc[2][:n] += dsum
+            acc[3][:n] += c
+
+    frames = []
+    for y, (low, high, dsum, c) in sorted(years.items()):
+        used = c > 0
+        depth = dsum[used] / c[used]
+        frames.append(pd.DataFrame({'year': y, 'depth': np.r_[depth, depth],
+                                    'statistic': ['min'] * len(depth) + ['max'] * len(depth),
+                                    'value': np.r_[low[used], high[used]]}))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=VALUE_COLUMNS)
+
+
+def active_layer_thickness(av: AllVariables, depths=None, isotherms: str = 'isotherms', variable: str = 'T',
+                           window: float = 365) -> pd.DataFrame:
+    """ Annual active layer thickness (the largest ALT of each year), as extract_alt_isotherm_depth
+
+    The file is read one year at a time (AllVariables.get with a window of dates), keeping
+    only the isotherms of the previous window days for the rolling minimum. As in
+    extract_alt_isotherm_depth, the isotherm of the last year is not computed, so its ALT
+    comes from the end of the previous year only.
+
+    Parameters
+    ----------
+    av : AllVariables
+        output file
+    depths : array-like, optional
+        depths below the surface [m] at which variable is interpolated, by default those of
+        the valid nodes at the first time step
+    isotherms : str, optional
+        (time, n) variable of the isotherm heights, by default 'isotherms'. A file without it
+        has no ALT (empty result).
+    variable : str, optional
+        temperature variable, by default 'T'
+    window : float, optional
+        length of the rolling minimum of the isotherm [day], by default 365 (as "365D" in
+        extract_alt_isotherm_depth)
+    """
+    if isotherms not in av.ds.variables:
+        return pd.DataFrame(columns=['year', 'statistic', 'value'])
+    if depths is None:
+        height = np.ma.getdata(av.ds['height'][0]).astype(float)
+        height = height[np.isfinite(height) & (height != 0)]
+        depths = np.sort(av.height_bounds(slice(0, 1))[2][0] - height)
+    depths = np.asarray(depths, dtype=float)
+
+    dates = av.time
+    timevar = av.ds['time']
+    days = time_in_days(timevar[:], timevar.units)
+    years = _years(dates)
+    last_days, last_isotherm = np.empty(0), np.empty(0)
+    rows = []
+    for year in np.unique(years):
+        i, j = np.searchsorted(years, year, 'left'), np.searchsorted(years, year, 'right')
+        hs = av.height_bounds(slice(i, j))[2]
+        isotherm = np.full(j - i, np.nan)
+        if year != years[-1]:
+            T = ensure_units_celcius(av.get(variable, atdepth=depths, start=dates[i], end=dates[j]))
+            iso = np.ma.asarray(av.ds[isotherms][i:j])
+            try:
+                isotherm = np.ma.filled(np.ma.asarray(get_continuous_alt(T, depth_to_height(depths, hs)[-1, :], iso, hs),
+                                                      dtype=float), np.nan)
+            except NotImplementedError:
+                pass
+        isotherm[isotherm == 0] = np.nan
+
+        # rolling minimum over the window days up to each time step, with the end of the previous year
+        keep = last_days > days[i] - window
+        series = pd.Series(np.r_[last_isotherm[keep], isotherm],
+                           index=pd.to_timedelta(np.r_[last_days[keep], days[i:j]], unit='D'))
+        lowest = series.rolling(f"{window}D", min_periods=1).min().to_numpy()[keep.sum():]
+        alt = hs - lowest
+        rows.append({'year': int(year), 'statistic': 'alt', 'value': np.nanmax(alt) if np.isfinite(alt).any() else np.nan})
+        last_days, last_isotherm = np.r_[last_days[keep], days[i:j]], np.r_[last_isotherm[keep], isotherm]
+    return pd.DataFrame(rows, columns=['year', 'statistic', 'value'])
+
+
+REDUCTIONS = {'mean_temperature': mean_temperature, 'annual_extremes': annual_extremes,
+              'active_layer_thickness': active_layer_thickness}
+
+
+def reduce_ensemble(files, reductions: dict = None, output=None, jobs: int = 1, resume: bool = True) -> pd.DataFrame:
+    """ Apply reductions to many output files
+
+    Parameters
+    ----------
+    files : list
+        paths of the output files
+    reductions : dict, optional
+        name -> reduction (see the module), by default REDUCTIONS (mean temperature, annual
+        extremes and ALT). Set options with e.g. partial(active_layer_thickness, depths=[...]).
+        A reduction without result is recorded as one row without values, so that it is not run again.
+    output : str or Path, optional
+        .csv table the rows are appended to as soon as each file is done, by default none
+    jobs : int, optional
+        number of worker processes, by default 1 (no pool)
+    resume : bool, optional
+        skip the files and reductions already done in output, by default True; False
+        overwrites output
+
+    Returns
+    -------
+    pd.DataFrame
+        tidy table with the columns file, reduction, year, depth, statistic, value, status
+        ('ok' or 'failed') and error, including the rows already in output. A failed file
+        or reduction does not stop the others, and is run again on resume.
+    """
+    reductions = dict(REDUCTIONS if reductions is None else reductions)
+    files = [str(f) for f in files]
+
+    previous = pd.DataFrame(columns=COLUMNS)
+    if output is not None:
+        output = Path(output)
+        if resume and output.exists():
+            previous = pd.read_csv(output)
+            previous = previous[previous['status'] == 'ok']
+            previous.to_csv(output, index=False)
+        else:
+            pd.DataFrame(columns=COLUMNS).to_csv(output, index=False)
+
+    done = set(zip(previous['file'].astype(str), previous['reduction'].astype(str)))
+    tasks = []
+    for f in files:
+        todo = {name: r for name, r in reductions.items() if (f, name) not in done}
+        if todo:
+            tasks.append((f, todo))
+
+    frames = run_per_item(_reduce_task, tasks, jobs=jobs, callback=lambda rows: _append(rows, output))
+    results = pd.concat([previous] + frames, ignore_index=True)
+    order = {f: i for i, f in enumerate(files)}
+    results = results.sort_values('file', key=lambda c: c.map(order), kind='stable')
+    return results.reset_index(drop=True)
+
+
+def _reduce_task(task: tuple) -> pd.DataFrame:
+    return _reduce_file(*task)
+
+
+def _reduce_file(file: str, reductions: dict) -> pd.DataFrame:
+    frames = []
+    try:
+        with AllVariables(file) as av:
+            for name, reduction in reductions.items():
+                try:
+                    rows = _rows(reduction(av))
+                    rows.insert(0, 'reduction', name)
+                    rows['status'], rows['error'] = 'ok', ''
+                except Exception as e:
+                    rows = pd.DataFrame({'reduction': [name], 'status': 'failed', 'error': error_message(e)})
+                frames.append(rows)
+    except Exception as e:
+        frames = [pd.DataFrame({'reduction': list(reductions), 'status': 'failed', 'error': error_message(e)})]
+
+    result = pd.concat(frames, ignore_index=True)
+    result.insert(0, 'file', file)
+    return result.reindex(columns=COLUMNS)
+
+
+def _rows(result) -> pd.DataFrame:
+    """ result of a reduction as a table of VALUE_COLUMNS """
+    if isinstance(result, pd.DataFrame):
+        rows = result.reset_index(drop=True)
+    elif isinstance(result, dict) and all(np.ndim(v) == 0 for v in result.values()):
+        rows = pd.DataFrame([result])
+    elif isinstance(result, (list, dict)):
+        rows = pd.DataFrame(result)
+    else:
+        rows = pd.DataFrame({'value': [float(result)]})
+    extra = [c for c in rows.columns if c not in VALUE_COLUMNS]
+    if extra:
+        raise ValueError(f"Unexpected columns {extra}, expected some of {VALUE_COLUMNS}")
+    if rows.empty:
+        # one row without values records that the reduction was done
+        rows = pd.DataFrame({'value': [np.nan]})
+    return rows.reindex(columns=VALUE_COLUMNS)
+
+
+def _append(rows: pd.DataFrame, output) -> pd.DataFrame:
+    if output is not None:
+        rows.to_csv(output, mode='a', header=False, index=False)
+    return rows
+
+
+def _blocks(av: AllVariables, variable: str, block_size: int):
+    """ (time, values, depths) in blocks of time steps; values and depths are (time, k) float
+    arrays of the valid nodes, NaN where there is no node """
+    surface = next((name for name in ('surface_height', 'surfaceHeight')
+                    if name in av.ds.variables and av.ds[name].dimensions == ('time',)), None)
+    names = [variable, 'height'] + ([surface] if surface else [])
+    for t, values in av.iter_blocks(names, block_size):
+        v = np.ma.filled(np.ma.asarray(values[variable], dtype=float), np.nan)
+        h = np.ma.filled(np.ma.asarray(values['height'], dtype=float), np.nan)
+        if surface:
+            top = np.ma.filled(np.ma.asarray(values[surface], dtype=float), np.nan)
+        else:
+            top = _top_of_column(h)
+        yield t, v, top[:, None] - h
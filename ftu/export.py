@@ -0,0 +1,167 @@
+"""
+Export of AllVariables (or MultiVariables) output to columnar files (Parquet or Arrow IPC).
+
+The variables are read and written block by block of time steps (see iter_blocks), so that
+the whole (time, k) arrays are never in memory. Only the valid nodes are written, and the
+time axis is written as timestamps. Requires pyarrow.
+
+Layouts:
+
+    long : one row per time step and valid node, with the columns time, node (0 for the
+           first valid node, and so on) and one column per variable; (time,) variables are
+           repeated for every node
+    wide : one row per time step, with the columns time, the (time,) variables and
+           <variable>_<node> for the (time, k) variables; missing nodes are null
+"""
+import numpy as np
+
+
+LAYOUTS = ('long', 'wide')
+
+FILE_FORMATS = ('parquet', 'arrow')
+
+
+def export_columnar(av, output, variables: list, layout: str = 'long', file_format: str = 'parquet',
+                    compression: str = 'zstd', block_size: int = 8760, start: int = 0, stop: int = None) -> int:
+    """ Write time-dependent variables to a columnar file
+
+    Parameters
+    ----------
+    av : AllVariables or MultiVariables
+        output, with ragged 'masked' or 'raise'
+    output : str or Path
+        file to write
+    variables : list
+        (time, k) and (time,) variables, e.g. ['T', 'height']
+    layout : str, optional
+        'long' (default) or 'wide', see the module
+    file_format : str, optional
+        'parquet' (default) or 'arrow' (Arrow IPC file, also read as Feather v2)
+    compression : str, optional
+        codec, by default 'zstd'; None for no compression. Arrow files support 'zstd' and 'lz4'.
+    block_size : int, optional
+        number of time steps read and written at once, by default 8760
+    start, stop : int, optional
+        range of time steps, by default all of them (see time_index to get them from dates)
+
+    Returns
+    -------
+    int
+        number of rows written. Without time steps in the range, the file has the columns but no rows.
+    """
+    if layout not in LAYOUTS:
+        raise ValueError(f"Invalid layout: {layout}. Choose from {LAYOUTS}")
+    if file_format not in FILE_FORMATS:
+        raise ValueError(f"Invalid file_format: {file_format}. Choose from {FILE_FORMATS}")
+    if av.ragged == 'list':
+        raise ValueError("ragged 'list' output cannot be exported, use 'masked'")
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise ImportError("export_columnar requires pyarrow") from e
+
+    width = None
+    writer = None
+    rows = 0
+    try:
+        for t, values in _blocks(av, variables, block_size, start, stop):
+            columns = _split(t, values)
+            if layout == 'long':
+                batch = _long_batch(pa, t, *columns)
+            else:
+                if width is None:
+                    width = _max_width(av)
+                batch = _wide_batch(pa, t, *columns, width)
+
+            if writer is None:
+                writer = _open_writer(pa, output, batch.schema, file_format, compression)
+            if file_format == 'parquet':
+                writer.write_table(pa.Table.from_batches([batch]))
+            else:
+                writer.write_batch(batch)
+            rows += batch.num_rows
+    finally:
+        if writer is not None:
+            writer.close()
+
+    return rows
+
+
+def _blocks(av, variables: list, block_size: int, start: int, stop: int):
+    """ iter_blocks, or one empty block (with the dtypes of the variables) if there is no time step """
+    empty = True
+    for block in av.iter_blocks(variables, block_size, start, stop):
+        empty = False
+        yield block
+    if empty:
+        yield np.array([], dtype='datetime64[ns]'), {name: _variable(av, name)[:0] for name in variables}
+
+
+def _variable(av, name: str):
+    """ netCDF variable of AllVariables or of the first segment of MultiVariables that has it """
+    try:
+        return av.ds[name]
+    except AttributeError:  # MultiVariables
+        return av._var(name)
+
+
+def _split(t: np.ndarray, values: dict):
+    """ (time,) and (time, k) variables of a block, as masked arrays """
+    series, fields = {}, {}
+    for name, v in values.items():
+        v = np.ma.asarray(v)
+        if v.ndim == 2 and v.shape[0] == len(t):
+            fields[name] = v
+        elif v.ndim == 1 and v.shape[0] == len(t):
+            series[name] = v
+        else:
+            raise ValueError(f"Variable {name} does not depend on time")
+    return series, fields
+
+
+def _max_width(av) -> int:
+    """ number of node columns of the wide layout, the same for every block """
+    try:
+        return av.ds.dimensions['k'].size
+    except AttributeError:  # MultiVariables: the largest grid of its segments
+        return max(seg.ds.dimensions['k'].size for seg in av.segments)
+
+
+def _array(pa, v: np.ma.MaskedArray):
+    mask = np.ma.getmaskarray(v)
+    return pa.array(np.ma.getdata(v), mask=mask if mask.any() else None)
+
+
+def _long_batch(pa, t: np.ndarray, series: dict, fields: dict):
+    if fields:
+        valid = ~np.ma.getmaskarray(next(iter(fields.values())))
+        rows, nodes = np.nonzero(valid)
+    else:
+        rows, nodes = np.arange(len(t)), np.zeros(len(t), dtype=int)
+
+    columns = {'time': pa.array(t[rows]), 'node': pa.array(nodes.astype('int32'))}
+    for name, v in series.items():
+        columns[name] = _array(pa, v[rows])
+    for name, v in fields.items():
+        columns[name] = _array(pa, v[rows, nodes])
+    return pa.RecordBatch.from_arrays(list(columns.values()), names=list(columns))
+
+
+def _wide_batch(pa, t: np.ndarray, series: dict, fields: dict, width: int):
+    columns = {'time': pa.array(t)}
+    for name, v in series.items():
+        columns[name] = _array(pa, v)
+    for name, v in fields.items():
+        padded = np.ma.masked_all((v.shape[0], width), dtype=v.dtype)
+        padded[:, :v.shape[1]] = v
+        for i in range(width):
+            columns[f"{name}_{i}"] = _array(pa, padded[:, i])
+    return pa.RecordBatch.from_arrays(list(columns.values()), names=list(columns))
+
+
+def _open_writer(pa, output, schema, file_format: str, compression: str):
+    if file_format == 'parquet':
+        import pyarrow.parquet as pq
+        return pq.ParquetWriter(str(output), schema, compression=compression or 'none')
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    return pa.ipc.new_file(str(output), schema, options=options)
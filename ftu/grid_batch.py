@@ -0,0 +1,160 @@
+"""
+Create the grids of many sites from a manifest, in a pool of processes.
+
+The manifest is a .csv or .json table with one row per site:
+
+    site, grid_input, ic_input, parameter_input, output[, dz_min, b, grid_type, interp_model,
+    output_title, output_institution, output_summary]
+
+Relative paths are resolved with respect to the manifest directory. Grid options that are
+missing (or empty) in the manifest take the default values given to make_grids.
+"""
+import json
+from pathlib import Path
+
+import pandas as pd
+
+from .FreThaw1D_gridcreator import make_grid_from_tables, read_parameter_table
+from .grid_cache import GridCache, grid_title
+from .parallel import error_message, run_per_item
+
+
+FILE_COLUMNS = ['grid_input', 'ic_input', 'parameter_input', 'output']
+
+OPTION_COLUMNS = ['dz_min', 'b', 'grid_type', 'interp_model', 'output_title', 'output_institution', 'output_summary']
+
+DEFAULTS = {'dz_min': 0.005, 'b': 0.1, 'grid_type': 'exponential', 'interp_model': 'linear',
+            'output_title': '', 'output_institution': '', 'output_summary': ''}
+
+# parameter tables parsed once by the parent process and shared with the workers
+_PARAMETER_TABLES = {}
+
+
+def read_manifest(manifest) -> pd.DataFrame:
+    """ Read a .csv or .json manifest of sites
+
+    Parameters
+    ----------
+    manifest : str or Path
+        Path to the manifest. A .json manifest is either a list of site records
+        or an object with the list under the key "sites".
+
+    Returns
+    -------
+    pd.DataFrame
+        one row per site with absolute file paths
+    """
+    manifest = Path(manifest)
+
+    if manifest.suffix.lower() == '.json':
+        with open(manifest) as f:
+            records = json.load(f)
+        if isinstance(records, dict):
+            records = records['sites']
+        sites = pd.DataFrame.from_records(records)
+    else:
+        sites = pd.read_csv(manifest, comment='#', skipinitialspace=True)
+
+    missing = [c for c in FILE_COLUMNS if c not in sites.columns]
+    if missing:
+        raise ValueError(f"Manifest {manifest} is missing the columns {missing}")
+
+    if 'site' not in sites.columns:
+        sites['site'] = [Path(o).stem for o in sites['output']]
+
+    for c in FILE_COLUMNS:
+        sites[c] = [str(manifest.parent / p) for p in sites[c]]
+
+    return sites
+
+
+def make_grids(manifest, jobs: int = 1, defaults: dict = None, cache: GridCache = None, **writer_options) -> pd.DataFrame:
+    """ Create the grids of all the sites of a manifest
+
+    Parameters
+    ----------
+    manifest : str, Path or pd.DataFrame
+        manifest file, or a table as returned by read_manifest
+    jobs : int, optional
+        number of worker processes, by default 1 (no pool)
+    defaults : dict, optional
+        grid options for the sites that do not define them, by default DEFAULTS
+    cache : GridCache, optional
+        take the grids whose inputs did not change from this cache, by default no cache
+    writer_options :
+        file_format, zlib, complevel, shuffle, chunksize, compact_ints (see write_grid_netCDF)
+
+    Returns
+    -------
+    pd.DataFrame
+        one row per site with the columns site, output, status ('ok', 'cached' or 'failed') and error.
+        A failed site does not stop the others.
+    """
+    sites = manifest if isinstance(manifest, pd.DataFrame) else read_manifest(manifest)
+    options = dict(DEFAULTS, **(defaults or {}))
+
+    tasks = []
+    for _, row in sites.iterrows():
+        task = {c: row[c] for c in ['site'] + FILE_COLUMNS}
+        for c in OPTION_COLUMNS:
+            value = row.get(c)
+            task[c] = options[c] if (value is None or pd.isna(value) or value == '') else value
+        tasks.append(task)
+
+    tables = _read_parameter_tables(sites['parameter_input'].unique())
+
+    results = run_per_item(_make_site_grid, tasks, (writer_options, cache), jobs,
+                           initializer=_init_worker, initargs=(tables,))
+
+    if cache is not None:
+        cache.evict()
+
+    return pd.DataFrame(results, columns=['site', 'output', 'status', 'error'])
+
+
+def _read_parameter_tables(files) -> dict:
+    """ parse each parameter file once; a file that cannot be read is reported by the sites using it """
+    tables = {}
+    for f in files:
+        try:
+            tables[f] = read_parameter_table(f)
+        except Exception as e:
+            tables[f] = e
+    return tables
+
+
+def _init_worker(tables: dict):
+    _PARAMETER_TABLES.clear()
+    _PARAMETER_TABLES.update(tables)
+
+
+def _make_site_grid(task: dict, writer_options: dict, cache: GridCache = None) -> dict:
+    result = {'site': task['site'], 'output': task['output'], 'status': 'ok', 'error': ''}
+    try:
+        if cache is not None:
+            key = cache.key(task['grid_input'], task['ic_input'], task['parameter_input'],
+                            task['dz_min'], task['b'], task['grid_type'], task['interp_model'],
+                            output_title=str(task['output_title']), output_institution=str(task['output_institution']),
+                            output_summary=str(task['output_summary']), **writer_options)
+            title = grid_title(str(task['output_title']), task['grid_input'], task['parameter_input'])
+            if cache.fetch(key, task['output'], {'title': title}):
+                result['status'] = 'cached'
+                return result
+
+        data_parameter = _PARAMETER_TABLES[task['parameter_input']]
+        if isinstance(data_parameter, Exception):
+            raise data_parameter
+
+        make_grid_from_tables(pd.read_csv(task['grid_input']), pd.read_csv(task['ic_input']), data_parameter,
+                              task['output'], float(task['dz_min']), float(task['b']), task['grid_type'], task['interp_model'],
+                              str(task['output_title']), str(task['output_institution']), str(task['output_summary']),
+                              task['grid_input'], task['parameter_input'], **writer_options)
+
+        if cache is not None:
+            cache.store(key, task['output'])
+
+    except Exception as e:
+        result['status'] = 'failed'
+        result['error'] = error_message(e)
+
+    return result
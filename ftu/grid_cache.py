@@ -0,0 +1,208 @@
+"""
+Content-addressed cache of grid files.
+
+A grid is identified by the contents of its grid, initial condition and parameter
+input files together with the grid options. When the same inputs are requested again
+the cached netCDF file is copied (or linked) to the output instead of being rebuilt.
+The key also holds the ftu version and a hash of the grid creator code, so that grids built
+by an older builder are not reused. The date_created attribute of a cached grid is the one of
+the first build; its title (which names the input files) is rewritten for each output.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Optional
+
+import netCDF4 as nc
+import pandas as pd
+
+from . import FreThaw1D_gridcreator
+from .FreThaw1D_gridcreator import main, shallow_file_name, _global_attributes, _writer_options
+from .VERSION import __version__
+
+
+def builder_version() -> str:
+    """ ftu version and hash of the grid creator code, part of every key """
+    with open(FreThaw1D_gridcreator.__file__, 'rb') as f:
+        return f"{__version__}:{hashlib.sha256(f.read()).hexdigest()}"
+
+
+def grid_title(output_title: str, grid_input_file_name, parameter_input_file_name) -> str:
+    """ title attribute of a grid built from these input files, as written by the grid creator """
+    return _global_attributes(output_title, '', '', '', str(grid_input_file_name), str(parameter_input_file_name))['title']
+
+
+class GridCache:
+
+    def __init__(self, directory, max_size: Optional[int] = None, max_age: Optional[float] = None, link: str = 'copy'):
+        """ Cache of grid files
+
+        Parameters
+        ----------
+        directory : str or Path
+            directory holding the cached grids (created if missing)
+        max_size : int, optional
+            maximum total size of the cache in bytes, by default unbounded
+        max_age : float, optional
+            entries not used for more than max_age seconds are evicted, by default never
+        link : str, optional
+            how a cached grid is given to the output: 'copy' (default), 'hardlink' or 'symlink'.
+            With links, later changes to the output file also change the cached grid.
+        """
+        if link not in ('copy', 'hardlink', 'symlink'):
+            raise ValueError(f"Invalid link: {link}")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self.max_age = max_age
+        self.link = link
+
+    def __repr__(self):
+        type_ = type(self)
+        return f"{type_.__module__}.{type_.__qualname__} ({self.directory})"
+
+    def key(self, grid_input_file_name, ic_input_file_name, parameter_input_file_name,
+            dz_min, b, grid_type, interp_model, **options) -> str:
+        """ Hash of the input file contents, of the grid options and of the builder (see builder_version) """
+        h = hashlib.sha256()
+        h.update(builder_version().encode())
+        for f in (grid_input_file_name, ic_input_file_name, parameter_input_file_name):
+            with open(f, 'rb') as fp:
+                content = fp.read()
+            h.update(len(content).to_bytes(8, 'little'))
+            h.update(content)
+        settings = dict(options, dz_min=float(dz_min), b=float(b), grid_type=grid_type, interp_model=interp_model)
+        h.update(json.dumps(settings, sort_keys=True, default=str).encode())
+        return h.hexdigest()
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.nc"
+
+    def fetch(self, key: str, output_file_name, attributes: dict = None) -> bool:
+        """ Put the cached grid at output_file_name. Return False if the grid is not in the cache
+
+        attributes are global attributes of the output (e.g. its title, see grid_title). When they
+        differ from those of the cached grid, the output is a copy with these attributes, even
+        with links, so that the cached grid keeps its own.
+        """
+        cached = self.path(key)
+        if not cached.exists():
+            return False
+
+        os.utime(cached)  # last use
+        output = Path(output_file_name)
+        tmp = output.with_name(f".{output.name}.{os.getpid()}.tmp")
+
+        changed = {}
+        if attributes:
+            with nc.Dataset(cached) as ds:
+                changed = {name: value for name, value in attributes.items()
+                           if name not in ds.ncattrs() or ds.getncattr(name) != value}
+
+        if self.link == 'hardlink' and not changed:
+            os.link(cached, tmp)
+        elif self.link == 'symlink' and not changed:
+            os.symlink(cached.resolve(), tmp)
+        else:
+            shutil.copyfile(cached, tmp)
+        try:
+            if changed:
+                with nc.Dataset(tmp, 'a') as ds:
+                    ds.setncatts(changed)
+            os.replace(tmp, output)
+        except BaseException:
+            tmp.unlink(missing_ok=True)
+            raise
+
+        return True
+
+    def store(self, key: str, file) -> Path:
+        """ Add a grid file to the cache """
+        cached = self.path(key)
+        tmp = cached.with_name(f".{cached.name}.{os.getpid()}.tmp")
+        shutil.copyfile(file, tmp)
+        os.replace(tmp, cached)
+        return cached
+
+    def entries(self) -> pd.DataFrame:
+        """ Cached grids, from the most to the least recently used """
+        now = time.time()
+        rows = []
+        for f in self.directory.glob("*.nc"):
+            try:
+                st = f.stat()
+            except FileNotFoundError:  # evicted by another process
+                continue
+            rows.append({'key': f.stem, 'size': st.st_size,
+                         'last_used': pd.Timestamp(st.st_mtime, unit='s'),
+                         'age': now - st.st_mtime})
+        entries = pd.DataFrame(rows, columns=['key', 'size', 'last_used', 'age'])
+        return entries.sort_values('age', ignore_index=True)
+
+    @property
+    def size(self) -> int:
+        """ Total size of the cache in bytes """
+        return int(self.entries()['size'].sum())
+
+    def evict(self, max_size: Optional[int] = None, max_age: Optional[float] = None) -> list:
+        """ Remove the entries older than max_age, then the least recently used ones until
+        the cache is not larger than max_size. Defaults to the limits of the cache.
+        Returns the removed keys.
+        """
+        max_size = self.max_size if max_size is None else max_size
+        max_age = self.max_age if max_age is None else max_age
+        entries = self.entries()
+
+        remove = pd.Series(False, index=entries.index)
+        if max_age is not None:
+            remove |= entries['age'] > max_age
+        if max_size is not None:
+            remove |= entries['size'].where(~remove, 0).cumsum() > max_size
+
+        removed = []
+        for key in entries.loc[remove, 'key']:
+            try:
+                self.path(key).unlink()
+                removed.append(key)
+            except FileNotFoundError:
+                pass
+        return removed
+
+    def clear(self) -> list:
+        """ Remove all the entries """
+        removed = []
+        for key in self.entries()['key']:
+            try:
+                self.path(key).unlink()
+                removed.append(key)
+            except FileNotFoundError:
+                pass
+        return removed
+
+
+def cached_main(args, cache: GridCache) -> bool:
+    """ Same as FreThaw1D_gridcreator.main, but the grid is taken from the cache
+    when its inputs did not change. Returns True if the grid was found in the cache.
+    """
+    key = cache.key(args.grid_input_file_name, args.ic_input_file_name, args.parameter_input_file_name,
+                    args.dz_min, args.b, args.grid_type, args.interp_model,
+                    output_title=args.output_title, output_institution=args.output_institution,
+                    output_summary=args.output_summary, **_writer_options(args))
+
+    title = grid_title(args.output_title, args.grid_input_file_name, args.parameter_input_file_name)
+    if cache.fetch(key, args.output_file_name, {'title': title}):
+        print(f"Grid taken from cache {cache.directory}: {args.output_file_name}")
+        shallow_depth = getattr(args, 'shallow_depth', None)
+        if shallow_depth is not None:
+            from .memory_grid import MemoryGrid
+            shallow_output_file_name = getattr(args, 'shallow_output_file_name', None) or shallow_file_name(args.output_file_name)
+            MemoryGrid.from_file(args.output_file_name).shallow(shallow_depth).save(shallow_output_file_name, **_writer_options(args))
+        return True
+
+    main(args)
+    cache.store(key, args.output_file_name)
+    cache.evict()
+    return False
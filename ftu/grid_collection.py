@@ -0,0 +1,162 @@
+import glob
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from pathlib import Path
+
+import numpy as np
+
+from .Grid import Grid
+
+
+class GridCollection:
+
+    def __init__(self, files, variables: list = None, max_workers: int = 8, errors: str = 'raise'):
+        """ Variables of many grid files stacked in (site, k) arrays
+
+        Parameters
+        ----------
+        files : str, Path or list
+            directory (all its .nc files), glob pattern, or list of grid files
+        variables : list, optional
+            variables to load, by default all of them. z and eta are always loaded.
+        max_workers : int, optional
+            number of processes reading the files, by default 8; 1 reads them in this process.
+            Processes rather than threads, because the netCDF/HDF5 library is not thread-safe.
+        errors : str, optional
+            'raise' (default) or 'skip' files that cannot be read; skipped files are listed in self.errors
+
+        Notes
+        -----
+        Depth variables and parameters (expanded per control volume with parameterID) are padded
+        at the end of each row up to the longest grid; the padding is masked. Variables with a
+        single value per file (e.g. KMAX) are returned as (site,) arrays. Without any grid (no
+        files, or all skipped), every variable is an empty (0, 0) array.
+        """
+        if errors not in ('raise', 'skip'):
+            raise ValueError(f"Invalid errors: {errors}")
+
+        candidates = _find_files(files)
+        if variables is not None:
+            variables = list(dict.fromkeys(['z', 'eta'] + list(variables)))
+
+        if max_workers == 1 or len(candidates) < 2:
+            loaded = [_load_grid(f, variables) for f in candidates]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as pool:
+                loaded = list(pool.map(_load_grid, candidates, repeat(variables),
+                                       chunksize=max(1, len(candidates) // (4 * max_workers))))
+
+        self.files = []
+        self.errors = {}
+        site_vars = []
+        for f, (values, error) in zip(candidates, loaded):
+            if error is not None:
+                if errors == 'raise':
+                    raise RuntimeError(f"Cannot read {f}: {error}") from error
+                self.errors[f] = error
+                continue
+            self.files.append(f)
+            site_vars.append(values)
+
+        names = list(dict.fromkeys(n for values in site_vars for n in values))
+        self._vars = {n: _stack([values.get(n) for values in site_vars]) for n in names}
+        self.lengths = np.array([len(values['z']) for values in site_vars], dtype=int)
+
+    def __repr__(self):
+        type_ = type(self)
+        return f"{type_.__module__}.{type_.__qualname__} ({len(self)} grids)"
+
+    def __len__(self):
+        return len(self.files)
+
+    def __getitem__(self, key) -> np.ma.MaskedArray:
+        if not self.files:  # nothing to stack: every variable is empty
+            return np.ma.masked_array(np.empty((0, 0)))
+        return self._vars[key]
+
+    @property
+    def vars(self) -> list:
+        return list(self._vars.keys())
+
+    @property
+    def mask(self) -> np.ndarray:
+        """ (site, k) True where a control volume exists """
+        return np.arange(self['z'].shape[1]) < self.lengths[:, None]
+
+    @property
+    def depth(self) -> np.ma.MaskedArray:
+        """ (site, k) depth of the control volume centroids below the soil surface """
+        return -self['eta']
+
+    def crosses(self, value: float = 273.15, var: str = 'ic', max_depth: float = None, min_depth: float = None) -> np.ndarray:
+        """ Sites where var crosses value between two adjacent control volumes
+
+        Parameters
+        ----------
+        value : float, optional
+            crossing value, by default 273.15
+        var : str, optional
+            variable, by default 'ic'
+        max_depth, min_depth : float, optional
+            only consider control volumes in this depth range [m], by default the whole column
+
+        Returns
+        -------
+        np.ndarray
+            (site,) boolean
+
+        Examples
+        --------
+        sites whose initial condition crosses 0 °C above 20 m depth:
+
+        >>> gc.select(gc.crosses(273.15, 'ic', max_depth=20))
+        """
+        v = self[var]
+        use = ~np.ma.getmaskarray(v)
+        depth = self.depth.filled(np.nan)
+        if max_depth is not None:
+            use &= depth <= max_depth
+        if min_depth is not None:
+            use &= depth >= min_depth
+
+        d = v.filled(np.nan) - value
+        pair = use[:, :-1] & use[:, 1:]
+        crossing = (np.fmin(d[:, :-1], d[:, 1:]) <= 0) & (np.fmax(d[:, :-1], d[:, 1:]) >= 0)
+        return np.any(pair & crossing, axis=1)
+
+    def select(self, which) -> list:
+        """ Files of the sites given by a (site,) boolean array or by indices """
+        return list(np.asarray(self.files, dtype=object)[which])
+
+
+def _find_files(files) -> list:
+    if isinstance(files, (str, Path)):
+        path = Path(files)
+        if path.is_dir():
+            return sorted(str(f) for f in path.glob("*.nc"))
+        return sorted(glob.glob(str(files)))
+    return [str(f) for f in files]
+
+
+def _load_grid(file, variables):
+    try:
+        with Grid(file, cache_size=None) as g:
+            names = g.vars if variables is None else variables
+            return {n: np.ma.getdata(g[n]) for n in names}, None
+    except Exception as e:
+        return None, e
+
+
+def _stack(arrays: list) -> np.ma.MaskedArray:
+    """ (site, n) array of the per-site 1d arrays, masked where a site has less than n values """
+    arrays = [np.atleast_1d(np.asarray(a)) if a is not None else np.array([]) for a in arrays]
+    lengths = np.array([a.size for a in arrays])
+    dtype = np.result_type(*[a.dtype for a in arrays if a.size]) if lengths.any() else float
+
+    if np.all(lengths == 1):
+        return np.ma.masked_array(np.concatenate(arrays).astype(dtype))
+
+    valid = np.arange(lengths.max()) < lengths[:, None]
+    stacked = np.zeros(valid.shape, dtype=dtype)
+    stacked[valid] = np.concatenate([a.ravel() for a in arrays])
+    return np.ma.masked_array(stacked, mask=~valid)
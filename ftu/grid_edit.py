@@ -0,0 +1,115 @@
+"""
+Edit variables of many netCDF files (grids or spinup outputs) in a pool of processes.
+
+An edit maps variable names to their new values. A value is either an array (or a number)
+broadcast to the variable, or a function of the open netCDF4.Dataset returning it, for
+values that depend on the file itself (e.g. column_top for the surface height). Functions
+must be defined at module level to be used with more than one job.
+"""
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import netCDF4 as nc
+import numpy as np
+import pandas as pd
+
+from .parallel import error_message, run_per_item
+
+
+REPORT_COLUMNS = ['file', 'variable', 'old', 'new', 'status', 'error']
+
+
+def column_top(ds: nc.Dataset) -> float:
+    """ Height of the top of the soil column, the largest z """
+    return float(np.max(ds['z'][:]))
+
+
+def edit_grids(files, changes: dict, jobs: int = 1, backup: bool = False, atomic: bool = False,
+               dry_run: bool = False) -> pd.DataFrame:
+    """ Set variables in many files
+
+    Parameters
+    ----------
+    files : list
+        paths of the files to edit
+    changes : dict
+        variable name -> new value, or function of the open dataset returning the new value
+    jobs : int, optional
+        number of worker processes, by default 1 (no pool)
+    backup : bool, optional
+        keep a copy of each original file as <file>.bak, by default False. An existing .bak is
+        kept as it is, so that it stays the original file over repeated edits.
+    atomic : bool, optional
+        edit a copy of each file and rename it over the original, so that an interrupted run never
+        leaves a partly written file, by default False (edit in place)
+    dry_run : bool, optional
+        only report the changes, without writing anything, by default False
+
+    Returns
+    -------
+    pd.DataFrame
+        one row per file and variable with the columns file, variable, old, new, status
+        ('ok', 'dry-run' or 'failed') and error. A failed file does not stop the others.
+    """
+    files = [str(f) for f in files]
+    options = {'backup': backup, 'atomic': atomic, 'dry_run': dry_run}
+
+    results = run_per_item(_edit_file, files, (changes, options), jobs)
+    return pd.DataFrame([row for rows in results for row in rows], columns=REPORT_COLUMNS)
+
+
+def set_surface_height(files, height: float, **options) -> pd.DataFrame:
+    """ Set surfaceHeight of many files to height. See edit_grids for the options. """
+    return edit_grids(files, {'surfaceHeight': height}, **options)
+
+
+def reset_surface_height(files, **options) -> pd.DataFrame:
+    """ Set surfaceHeight of many files to the current column height (the largest z).
+    See edit_grids for the options. """
+    return edit_grids(files, {'surfaceHeight': column_top}, **options)
+
+
+def _edit_file(file: str, changes: dict, options: dict) -> list:
+    rows = [{'file': file, 'variable': name, 'old': None, 'new': None, 'status': 'ok', 'error': ''}
+            for name in changes]
+    target = file
+    try:
+        if options['backup'] and not options['dry_run'] and not os.path.exists(file + '.bak'):
+            shutil.copy2(file, file + '.bak')
+
+        if options['atomic'] and not options['dry_run']:
+            fd, target = tempfile.mkstemp(suffix='.nc', prefix=f".{Path(file).name}.", dir=Path(file).parent)
+            os.close(fd)
+            shutil.copy2(file, target)
+
+        with nc.Dataset(target, 'r' if options['dry_run'] else 'a') as ds:
+            for row, (name, value) in zip(rows, changes.items()):
+                if name not in ds.variables:
+                    raise KeyError(f"variable {name} not found")
+                old = ds[name][:]
+                new = np.broadcast_to(value(ds) if callable(value) else value, old.shape)
+                row['old'], row['new'] = _summary(old), _summary(new)
+                if options['dry_run']:
+                    row['status'] = 'dry-run'
+                else:
+                    ds[name][:] = new
+
+        if target != file:
+            os.replace(target, file)
+
+    except Exception as e:
+        for row in rows:
+            row['status'] = 'failed'
+            row['error'] = error_message(e)
+        if target != file and os.path.exists(target):
+            os.remove(target)
+
+    return rows
+
+
+def _summary(value):
+    """ a number for single values, the array otherwise """
+    value = np.array(np.ma.getdata(value))
+    return value.item() if value.size == 1 else value
@@ -0,0 +1,100 @@
+"""
+Sidecar cache of the resolved variables of grid files.
+
+A bundle is a directory of .npy files, one per variable as returned by Grid[...]
+(parameters expanded per control volume, padding removed; the mask of a masked constant
+in a second <name>.mask.npy file), and a meta.json holding the
+path, modification time and size of the grid file, the kind and the units of each variable.
+Reopening an unchanged grid memory-maps the .npy files instead of decoding the netCDF file.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+
+FORMAT_VERSION = 1
+
+
+def sidecar_path(directory, nc_grid_file) -> Path:
+    """ bundle directory of a grid file """
+    path = str(Path(nc_grid_file).resolve())
+    return Path(directory) / hashlib.sha256(path.encode()).hexdigest()[:24]
+
+
+def _signature(nc_grid_file) -> dict:
+    stat = os.stat(nc_grid_file)
+    return {'path': str(Path(nc_grid_file).resolve()), 'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size,
+            'version': FORMAT_VERSION}
+
+
+def read_sidecar(directory, nc_grid_file):
+    """ meta data of the bundle of a grid file, None if there is none or the file changed since """
+    bundle = sidecar_path(directory, nc_grid_file)
+    try:
+        with open(bundle / 'meta.json') as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get('signature') != _signature(nc_grid_file):
+        return None
+    meta['path'] = bundle
+    return meta
+
+
+def load_variable(meta: dict, name) -> np.ndarray:
+    """ variable of a bundle, memory-mapped (read-only), of the same type as Grid reads from
+    the netCDF file: an array for parameters and depths, a masked array for constants """
+    data = np.asarray(np.load(meta['path'] / f"{name}.npy", mmap_mode='r'))
+    if meta['kinds'].get(name) != 'constant':
+        return data
+    mask = meta['path'] / f"{name}.mask.npy"
+    return np.ma.masked_array(data, mask=np.load(mask) if mask.exists() else np.ma.nomask)
+
+
+def write_sidecar(directory, nc_grid_file, values: dict, kinds: dict, units: dict) -> dict:
+    """ Write the bundle of a grid file, replacing an older one
+
+    Parameters
+    ----------
+    directory : str or Path
+        directory of the bundles (created if missing)
+    nc_grid_file : str or Path
+        the grid file
+    values : dict
+        resolved variables, name -> array
+    kinds : dict
+        name -> 'parameter', 'depth' or 'constant'
+    units : dict
+        name -> units (or None)
+
+    Returns
+    -------
+    dict
+        meta data of the bundle, as returned by read_sidecar
+    """
+    bundle = sidecar_path(directory, nc_grid_file)
+    bundle.parent.mkdir(parents=True, exist_ok=True)
+    meta = {'signature': _signature(nc_grid_file), 'kinds': kinds, 'units': units}
+
+    tmp = Path(tempfile.mkdtemp(prefix=f".{bundle.name}.", dir=bundle.parent))
+    try:
+        for name, value in values.items():
+            np.save(tmp / f"{name}.npy", np.asarray(np.ma.getdata(value)))
+            if np.ma.is_masked(value):
+                np.save(tmp / f"{name}.mask.npy", np.ma.getmaskarray(value))
+        with open(tmp / 'meta.json', 'w') as f:
+            json.dump(meta, f)
+        if bundle.exists():
+            shutil.rmtree(bundle)
+        os.replace(tmp, bundle)
+    finally:
+        if tmp.exists():
+            shutil.rmtree(tmp)
+
+    meta['path'] = bundle
+    return meta
@@ -165,9 +165,10 @@ def extract_alt_isotherm(T, t, iso, z, hs):
     res[:] = np.nan
     
     # split into yearly bins
+    years = _years(t)
     for n in range(len(t) // 365):
         try:
-            print(f"[{n}] year {t[365*n].year}")
+            print(f"[{n}] year {years[365*n]}")
             res[n*365:(n+1)*365] = get_continuous_alt(T[n*365:(n+1)*365], z, iso[n*365:(n+1)*365], hs[n*365:(n+1)*365])
         except NotImplementedError as e:
             res[n*365:(n+1)*365] = np.nan
@@ -206,9 +207,9 @@ def extract_alt_isotherm_depth(T, t, iso, depth, hs):
     
     z = depth_to_height(depth, hs)
     # split into yearly bins
-    ti = pd.DatetimeIndex(t)
-    for Y in range(t[0].year, t[-1].year):
-        ix = (ti.year == Y)
+    years = _years(t)
+    for Y in range(years[0], years[-1]):
+        ix = (years == Y)
         try:
             print(f"{Y}")
             res[ix] = get_continuous_alt(T[ix], z[ix, :][-1, :], iso[ix], hs[ix])
@@ -225,6 +226,14 @@ def extract_alt_isotherm_depth(T, t, iso, depth, hs):
     return res[['alt']]
 
 
+def _years(t) -> np.ndarray:
+    ''' year of each timestamp: datetime64 (as AllVariables.time), datetime or cftime objects '''
+    t = np.asarray(t)
+    if np.issubdtype(t.dtype, np.datetime64):
+        return t.astype('datetime64[Y]').astype(int) + 1970
+    return np.array([d.year for d in t], dtype=int)
+
+
 def depth_to_height(d: np.ndarray, hs: np.ndarray):
     """ 
     Parameters
@@ -0,0 +1,171 @@
+from datetime import datetime
+
+import netCDF4 as nc
+import numpy as np
+import pandas as pd
+
+from .Grid import Grid
+from .FreThaw1D_gridcreator import build_grid_data, extract_shallow_grid, _global_attributes, _write_grid_dataset, _GRID_VARIABLES
+
+
+class MemoryGrid(Grid):
+
+    def __init__(self, data: dict, attributes: dict = None):
+        """ Grid held in memory, with the same accessors as ftu.Grid
+
+        Parameters
+        ----------
+        data : dict
+            mapping from the grid file variable names to their values, as returned
+            by FreThaw1D_gridcreator.build_grid_data
+        attributes : dict, optional
+            global attributes written by save()
+        """
+        self.nc_grid_file = None
+        self._data = data
+        self._attributes = dict(attributes or {})
+        self._dims = {name: dim for name, dim, _, _ in _GRID_VARIABLES}
+        self._meta = {name: attrs for name, _, _, attrs in _GRID_VARIABLES}
+        self._reset_cache(None)
+
+    def __repr__(self):
+        type_ = type(self)
+        return f"{type_.__module__}.{type_.__qualname__} (KMAX={int(self._data['KMAX'][0])})"
+
+    @classmethod
+    def from_file(cls, nc_grid_file) -> "MemoryGrid":
+        """ Read all the variables of a grid file into memory """
+        with nc.Dataset(nc_grid_file, 'r') as f:
+            f.set_auto_mask(False)
+            data = {name: f[name][:] for name, _, _, _ in _GRID_VARIABLES if name in f.variables}
+            attributes = {a: f.getncattr(a) for a in f.ncattrs()}
+        return cls(data, attributes)
+
+    @property
+    def data(self) -> dict:
+        """ Variables as they are written in a grid file """
+        return self._data
+
+    def attrs(self):
+        for a, v in self._attributes.items():
+            print(f"{a}: {v}")
+
+    def _read(self, name) -> np.ndarray:
+        return np.asarray(self._data[name])
+
+    def _read_constant(self, name):
+        return np.asarray(self._data[name])
+
+    def _file_variables(self) -> list:
+        return list(self._data)
+
+    def _units(self, name):
+        attrs = self._meta.get(name, {})
+        return attrs.get('units', attrs.get('unit'))
+
+    def _names(self, dim):
+        return [n for n in self._data if self._dims.get(n) == dim]
+
+    def parameter_names(self):
+        return self._names('parameter')
+
+    def depth_names(self):
+        return self._names('z')
+
+    def constant_names(self):
+        return self._names('scalar')
+
+    def shallow(self, depth_shallow_column: float) -> "MemoryGrid":
+        """ Grid of the upper depth_shallow_column meters, used in the shallow step of the two-step
+        spinup procedure. Its arrays are views of the ones of this grid. """
+        _, shallow_data = extract_shallow_grid(self._data, depth_shallow_column)
+        return type(self)(shallow_data, self._attributes)
+
+    def with_ic(self, ic) -> "MemoryGrid":
+        """ Same grid with another initial condition; the other arrays are shared """
+        data = dict(self._data)
+        data['ic'] = np.asarray(ic, dtype=float)
+        return type(self)(data, self._attributes)
+
+    def save_ensemble(self, output_file_name, ic, per_member: bool = False, **writer_options):
+        """ Write the grid with an ensemble of initial conditions
+
+        Parameters
+        ----------
+        output_file_name : str
+            path of the grid file. With per_member, a format string with the field {member},
+            e.g. 'grid_{member:03d}.nc'
+        ic : np.ndarray
+            initial conditions (member, KMAX), e.g. from set_initial_condition_ensemble
+        per_member : bool, optional
+            write one grid file per member instead of a single file, by default False.
+            The single file keeps the initial condition of this grid in 'ic' and stores the ensemble
+            in 'icEnsemble' with dimensions (member, z)
+        writer_options :
+            file_format, zlib, complevel, shuffle, chunksize, compact_ints (see write_grid_netCDF)
+
+        Returns
+        -------
+        list
+            the files written
+        """
+        ic = np.atleast_2d(np.asarray(ic, dtype=float))
+        if ic.shape[1] != np.size(self._data['eta']):
+            raise ValueError(f"ic has {ic.shape[1]} values per member, the grid has {np.size(self._data['eta'])}")
+
+        if per_member:
+            files = []
+            for member, member_ic in enumerate(ic):
+                files.append(self.with_ic(member_ic).save(output_file_name.format(member=member), **writer_options))
+            return files
+
+        data = dict(self._data, icEnsemble=ic)
+        _write_grid_dataset(output_file_name, data, self._attributes, **writer_options)
+        return [output_file_name]
+
+    def save(self, output_file_name, **writer_options):
+        """ Write the grid to a netCDF file
+
+        Parameters
+        ----------
+        output_file_name : str
+            path of the grid file
+        writer_options :
+            file_format, zlib, complevel, shuffle, chunksize, compact_ints (see write_grid_netCDF)
+        """
+        _write_grid_dataset(output_file_name, self._data, self._attributes, **writer_options)
+        return output_file_name
+
+
+def create_grid(data_grid, data_ic, data_parameter, dz_min: float = 0.005, b: float = 0.1,
+                grid_type: str = 'exponential', interp_model: str = 'linear',
+                output_title: str = '', output_institution: str = '', output_summary: str = '') -> MemoryGrid:
+    """ Create a grid in memory, without reading or writing any file
+
+    Parameters
+    ----------
+    data_grid : pd.DataFrame
+        layers of the grid, as in the grid_input_file.csv (or anything pd.DataFrame accepts, e.g. a dict of arrays)
+    data_ic : pd.DataFrame
+        pairs of (eta, T0) of the initial condition
+    data_parameter : pd.DataFrame
+        parameter sets, as in the parameter_input_file.csv
+    dz_min : float, optional
+        thickness of the first layer (exponential grid), by default 0.005
+    b : float, optional
+        growth rate (exponential grid), by default 0.1
+    grid_type : str, optional
+        'exponential' or 'classical', by default 'exponential'
+    interp_model : str, optional
+        kind of interpolation of the initial condition, by default 'linear'
+
+    Returns
+    -------
+    MemoryGrid
+        the grid; use MemoryGrid.save to write it
+    """
+    data_grid, data_ic, data_parameter = (pd.DataFrame(d) for d in (data_grid, data_ic, data_parameter))
+    data = build_grid_data(data_grid, data_ic, data_parameter, dz_min, b, grid_type, interp_model)
+    attributes = _global_attributes(output_title, output_institution, output_summary,
+                                    datetime.now().isoformat(), '', '')
+    return MemoryGrid(data, attributes)
@@ -0,0 +1,264 @@
+import numpy as np
+import pandas as pd
+
+from .all_variables import AllVariables, _dim_is_time, _dim_is_time_k
+from .dataset_pool import DatasetPool
+from .time_axis import date_number, decode_time
+
+
+class MultiVariables:
+
+    def __init__(self, files: list, pool: DatasetPool = None, ragged: str = 'masked'):
+        """ Output files of one FreeThaw run (e.g. shallow spinup, _deep_spinup.nc and the
+        transient segments) viewed as one AllVariables concatenated along time
+
+        The files are opened only when they are read, through a DatasetPool (by default
+        a private one, closed by close()). Reads are split over the segments, so that a time
+        window touches only the files that overlap it; nothing is read when the view is made.
+
+        Parameters
+        ----------
+        files : list
+            output files, in time order
+        pool : DatasetPool, optional
+            shared pool of open files, by default a private one
+        ragged : str, optional
+            see AllVariables, by default 'masked'. It also applies when the number of valid
+            nodes differs between segments (e.g. the shallow spinup grid and the full grid).
+        """
+        if ragged not in ('masked', 'list', 'raise'):
+            raise ValueError(f"Invalid ragged: {ragged}")
+        if len(files) == 0:
+            raise ValueError("No files")
+        self.files = [str(f) for f in files]
+        self.ragged = ragged
+        self._own_pool = pool is None
+        self._pool = DatasetPool(maxsize=16) if pool is None else pool
+        self.segments = [AllVariables(f, pool=self._pool, ragged=ragged) for f in self.files]
+        self._sizes = [None] * len(self.segments)
+        self._ends_cache = [None] * len(self.segments)
+        self._time = None
+
+    def __repr__(self):
+        type_ = type(self)
+        return f"{type_.__module__}.{type_.__qualname__} ({len(self.segments)} segments)"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        """ Close the files. Files of a shared pool stay open for the other users of the pool. """
+        if self._own_pool:
+            self._pool.close_all()
+
+    def _size(self, s: int) -> int:
+        """ number of time steps of segment s, opening it the first time """
+        if self._sizes[s] is None:
+            self._sizes[s] = self.segments[s].ds.dimensions['time'].size
+        return self._sizes[s]
+
+    @property
+    def offsets(self) -> np.ndarray:
+        """ (segment + 1,) first time step of each segment, then the total number of time steps.
+        Opens every segment. """
+        sizes = [self._size(s) for s in range(len(self.segments))]
+        return np.concatenate([[0], np.cumsum(sizes)]).astype(int)
+
+    def _ends(self, s: int):
+        """ first and last numeric time values of segment s (None if it is empty), its units
+        and calendar; read once, from two values of the time axis """
+        if self._ends_cache[s] is None:
+            n = self._size(s)
+            timevar = self.segments[s].ds['time']
+            ends = np.ma.getdata(timevar[[0, n - 1]]) if n > 0 else None
+            self._ends_cache[s] = (ends, timevar.units, getattr(timevar, 'calendar', 'standard'))
+        return self._ends_cache[s]
+
+    @property
+    def bounds(self) -> np.ndarray:
+        """ (segment, 2) first and last date of each segment (NaT for an empty one), as for
+        AllVariables.time. Opens every segment. """
+        bounds = []
+        for s in range(len(self.segments)):
+            ends, units, calendar = self._ends(s)
+            bounds.append(list(decode_time(ends, units, calendar)) if ends is not None else [np.datetime64('NaT')] * 2)
+        return np.array(bounds)
+
+    @property
+    def vars(self) -> list:
+        """ List of variables in the files """
+        return list(dict.fromkeys(v for seg in self.segments for v in seg.vars))
+
+    @property
+    def time(self) -> np.ndarray:
+        """ Time values of all segments, as AllVariables.time. Decoded once and cached. """
+        if self._time is None:
+            self._time = np.concatenate([seg.time for seg in self.segments])
+        return self._time
+
+    def time_index(self, start=None, end=None) -> slice:
+        """ Time steps from start (included) to end (excluded), see AllVariables.time_index.
+
+        The first and last time values of the segments are read in order until end is reached;
+        only the time axes of the segments that overlap the window are read whole. The
+        segments before the window are opened for their number of time steps, those after not.
+        """
+        offset = 0
+        i = j = None
+        empty = None  # where the window would be, if it has no time step
+        for s, seg in enumerate(self.segments):
+            ends, units, calendar = self._ends(s)
+            stop = None if end is None else date_number(end, units, calendar)
+            if ends is not None:
+                if stop is not None and ends[0] >= stop:
+                    break
+                if start is None or ends[1] >= date_number(start, units, calendar):
+                    local = seg.time_index(start, end)
+                    if local.stop > local.start:
+                        i = offset + local.start if i is None else i
+                        j = offset + local.stop
+                    elif empty is None:
+                        empty = offset + local.start
+            offset += self._size(s)
+            if ends is not None and stop is not None and ends[1] >= stop:
+                break  # the next segments start after end
+        if i is None:
+            i = j = empty if empty is not None else offset if start is not None else 0
+        return slice(int(i), int(j))
+
+    def _overlapping(self, start: int, stop: int):
+        """ (segment, local start, local stop) of the segments with time steps in [start, stop) """
+        offset = 0
+        for s, seg in enumerate(self.segments):
+            if offset >= stop:
+                break
+            n = self._size(s)
+            i, j = max(start, offset), min(stop, offset + n)
+            if i < j:
+                yield seg, int(i - offset), int(j - offset)
+            offset += n
+
+    def iter_blocks(self, variables: list, block_size: int = 8760, start: int = 0, stop: int = None):
+        """ Iterate over the variables in blocks of time steps, as AllVariables.iter_blocks
+
+        start and stop are time steps of the whole run; blocks do not span two segments,
+        so the last block of a segment may be shorter than block_size. Segments after stop
+        are not opened.
+        """
+        stop = np.inf if stop is None else stop
+        for seg, i, j in self._overlapping(start, stop):
+            yield from seg.iter_blocks(variables, block_size, i, j)
+
+    def read(self, variables: list, start=None, end=None, depth: tuple = None, height: tuple = None):
+        """ Variables in a window of dates, reading only the segments that overlap it
+
+        Parameters
+        ----------
+        variables : list
+            names of the variables
+        start, end : optional
+            dates, as for time_index; None for an open end
+        depth, height : tuple, optional
+            range of depths or heights, see AllVariables.read
+
+        Returns
+        -------
+        tuple
+            (time, values): the times of the window and a dict of the variables. With a depth or
+            height range, (time, k) variables are as for AllVariables.read, with the same nodes read
+            from every segment, so that a column is the same node throughout.
+
+        Raises
+        ------
+        ValueError
+            for a depth or height range over segments with different numbers of nodes (e.g. the
+            shallow spinup grid and the full grid), whose columns cannot be matched
+        """
+        rows = self.time_index(start, end)
+        return self._read(variables, rows.start, rows.stop, depth, height)
+
+    def _read(self, variables: list, start: int, stop: int, depth: tuple = None, height: tuple = None):
+        whole = depth is None and height is None
+        overlapping = list(self._overlapping(start, stop))
+        cols = None if whole or not overlapping else self._common_columns(overlapping, depth, height)
+        times, parts = [], {name: [] for name in variables}
+        for seg, i, j in overlapping:
+            if whole:
+                blocks = seg.iter_blocks(variables, j - i, i, j)
+            else:
+                blocks = [seg._read_rows(variables, slice(i, j), depth, height, cols)]
+            for t, values in blocks:
+                times.append(t)
+                for name in variables:
+                    parts[name].append(values[name])
+        if not times:
+            # empty window: no time steps, with the nodes of the first segment
+            return self.segments[0]._read_rows(variables, slice(0, 0), depth, height)
+
+        values = {}
+        for name in variables:
+            if _dim_is_time_k(self._var(name)) or _dim_is_time(self._var(name)):
+                values[name] = _concatenate(parts[name], self.ragged if whole else 'masked')
+            else:
+                values[name] = parts[name][0]
+        return np.concatenate(times), values
+
+    @staticmethod
+    def _common_columns(overlapping: list, depth: tuple = None, height: tuple = None) -> slice:
+        """ nodes (k) to read from every overlapping segment for a range of depths or heights """
+        if len({seg.ds.dimensions['k'].size for seg, _, _ in overlapping}) > 1:
+            raise ValueError("The segments have different numbers of nodes; read the depth or height "
+                             "range of each of them separately")
+        cols = [seg._columns(slice(i, j), depth, height) for seg, i, j in overlapping]
+        cols = [c for c in cols if c.stop > c.start]
+        return slice(min(c.start for c in cols), max(c.stop for c in cols)) if cols else slice(0, 0)
+
+    def _var(self, name):
+        for seg in self.segments:
+            if name in seg.ds.variables:
+                return seg.ds[name]
+        raise KeyError(name)
+
+    def __getitem__(self, key):
+        """ Time-dependent variables of all segments; (k,) variables of the first segment """
+        var = self._var(key)
+        if not (_dim_is_time_k(var) or _dim_is_time(var)):
+            return self.segments[0][key]
+        return self._read([key], 0, np.inf)[1][key]
+
+    def get(self, var, atdepth=None, atheight=None, start=None, end=None):
+        """ Return value of variable at desired depth or height, see AllVariables.get. With start
+        or end, only the segments that overlap the window are read. """
+        rows = slice(0, np.inf) if start is None and end is None else self.time_index(start, end)
+        if atdepth is None and atheight is None:
+            return self._read([var], rows.start, rows.stop)[1][var]
+        parts = [seg._get_rows(var, atdepth, atheight, slice(i, j)) for seg, i, j in self._overlapping(rows.start, rows.stop)]
+        if not parts:
+            at = atdepth if atdepth is not None else atheight
+            return np.empty((0,) if np.ndim(at) == 0 else (0, np.size(at)))
+        return np.concatenate(parts)
+
+
+def _concatenate(parts: list, ragged: str = 'masked'):
+    """ Concatenate along time the values of the segments, as returned by AllVariables """
+    if all(not isinstance(p, list) for p in parts) and len({np.shape(p)[1:] for p in parts}) == 1:
+        if any(isinstance(p, np.ma.MaskedArray) for p in parts):
+            return np.ma.concatenate(parts)
+        return np.concatenate(parts)
+
+    if ragged == 'raise':
+        raise ValueError("Not all time slices have the same number of valid points")
+    elif ragged == 'list':
+        return [row for p in parts for row in p]
+
+    # padded: every segment to the widest one, with the padding masked
+    width = max(p.shape[1] for p in parts)
+    out = np.ma.masked_all((sum(p.shape[0] for p in parts), width), dtype=np.result_type(*parts))
+    i = 0
+    for p in parts:
+        out[i:i + p.shape[0], :p.shape[1]] = p
+        i += p.shape[0]
+    return out
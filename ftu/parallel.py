@@ -0,0 +1,58 @@
+"""
+Run a function over many files (or other items), in this process or in a pool of processes.
+
+The function must be defined at module level to be used with more than one job, and should
+catch its own errors (see error_message) so that a failed item does not stop the others.
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def run_per_item(func, items, args: tuple = (), jobs: int = 1, initializer=None, initargs: tuple = (),
+                 callback=None) -> list:
+    """ func(item, *args) for every item
+
+    Parameters
+    ----------
+    func : callable
+        function of an item and args
+    items : list
+        items, e.g. file paths
+    args : tuple, optional
+        other arguments of func, the same for every item
+    jobs : int, optional
+        number of worker processes, by default 1 (no pool)
+    initializer, initargs : optional
+        function run with initargs once in every process before the items (also with 1 job)
+    callback : callable, optional
+        called with each result as soon as it is done (in the order the items finish)
+
+    Returns
+    -------
+    list
+        the results, in the order of items
+    """
+    items = list(items)
+
+    if jobs == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        results = []
+        for item in items:
+            results.append(func(item, *args))
+            if callback is not None:
+                callback(results[-1])
+        return results
+
+    results = [None] * len(items)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=initializer, initargs=initargs) as pool:
+        futures = {pool.submit(func, item, *args): i for i, item in enumerate(items)}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            if callback is not None:
+                callback(results[futures[future]])
+    return results
+
+
+def error_message(e: Exception) -> str:
+    """ one-line description of an error, for the reports """
+    return f"{type(e).__name__}: {e}"
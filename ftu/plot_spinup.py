@@ -3,6 +3,7 @@ import numpy as np
 import matplotlib.pyplot as plt
 from matplotlib import cm
 from ._version import __version__
+from .time_axis import decode_time
 
 def show_spinup(shallow_spinup:str, metadata=True):
     """Plot the spinup of a shallow model run
@@ -16,8 +17,7 @@ def show_spinup(shallow_spinup:str, metadata=True):
     """
     with nc.Dataset(shallow_spinup) as nss:
         var_t = nss['time']
-        time = nc.num2date(var_t[:], var_t.units, 'standard', 
-                        only_use_cftime_datetimes=False, only_use_python_datetimes=True)
+        time = decode_time(var_t[:], var_t.units, getattr(var_t, 'calendar', 'standard'))
         temp = nss['mean_temperature_in_ground'][:] - 273.15
         h = nss['height'][:]
 
@@ -54,7 +54,7 @@ def show_spinup(shallow_spinup:str, metadata=True):
     TPE = temp[::len(time)//n,][:10,]
     for i in range(n):
         if i in [0, n-1]:
-            PE.plot(TPE[i,:], h, color=clist[i], alpha=0.5, label=f"{tPE[i].strftime('%Y-%m-%d')}")
+            PE.plot(TPE[i,:], h, color=clist[i], alpha=0.5, label=f"{_date_label(tPE[i])}")
             PE.tick_params(axis='x', labelrotation=90)
         else:
             PE.plot(TPE[i,:], h, color=clist[i], alpha=0.5)
@@ -67,7 +67,7 @@ def show_spinup(shallow_spinup:str, metadata=True):
     TPEp = temp[lastP:,][::len(time[lastP:])//n,][:n,]
     for i in range(n):
         if i in [0, n-1]:
-            PEp.plot(TPEp[i,:], h, color=clist[i], alpha=0.5, label=f"{tPE[i].strftime('%Y-%m-%d')}")
+            PEp.plot(TPEp[i,:], h, color=clist[i], alpha=0.5, label=f"{_date_label(tPEp[i])}")
         else:
             PEp.plot(TPEp[i,:], h, color=clist[i], alpha=0.5)
     PEp.legend()
@@ -77,6 +77,13 @@ def show_spinup(shallow_spinup:str, metadata=True):
     return fig
 
 
+def _date_label(t) -> str:
+    """ YYYY-mm-dd of a datetime64 or datetime-like date """
+    if isinstance(t, np.datetime64):
+        return np.datetime_as_string(t, unit='D')
+    return t.strftime('%Y-%m-%d')
+
+
 def profile_evo(depths, times, values, P:int=100, n:int=10):
     """ Plot evolution of temperature profiles over time
     
@@ -0,0 +1,27 @@
+""" Argument handling shared by the command line scripts """
+import glob
+
+
+def expand_patterns(patterns: list) -> list:
+    """ files of a list of paths and glob patterns, in order (the matches of a pattern sorted) """
+    files = []
+    for pattern in patterns:
+        files.extend(sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern])
+    return files
+
+
+def cache_limits(max_size_mb: float = None, max_age_days: float = None) -> dict:
+    """ max_size [bytes] and max_age [s] of a GridCache from the command line units """
+    max_size = None if max_size_mb is None else int(max_size_mb * 1e6)
+    max_age = None if max_age_days is None else max_age_days * 86400
+    return dict(max_size=max_size, max_age=max_age)
+
+
+def add_writer_options(parser):
+    """ arguments of the netCDF writer options of the grid files (see write_grid_netCDF) """
+    parser.add_argument('--format', choices=["NETCDF4", "NETCDF4_CLASSIC", "NETCDF3_64BIT"], default='NETCDF4', dest="file_format")
+    parser.add_argument('--zlib', action='store_true', dest='zlib')
+    parser.add_argument('--complevel', dest='complevel', default=4, type=int)
+    parser.add_argument('--no-shuffle', action='store_false', dest='shuffle', help="compress without the HDF5 shuffle filter")
+    parser.add_argument('--chunksize', dest='chunksize', default=None, type=int)
+    parser.add_argument('--compact-ints', action='store_true', dest='compact_ints')
@@ -0,0 +1,58 @@
+from ftu.grid_edit import edit_grids, column_top
+from ftu.scripts._common import expand_patterns
+
+
+def main():
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Set variables (e.g. surfaceHeight) of many grid or spinup files")
+
+    parser.add_argument('files', type=str, nargs='+', help="files or glob patterns")
+    parser.add_argument('--reset-surface-height', action='store_true', dest='reset_surface_height',
+                        help="set surfaceHeight to the current column height (the largest z)")
+    parser.add_argument('--surface-height', dest='surface_height', default=None, type=float)
+    parser.add_argument('--set', dest='set', default=[], action='append', metavar='VARIABLE=VALUE',
+                        help="set all the values of a variable; can be repeated")
+    parser.add_argument('-j', '--jobs', dest='jobs', default=1, type=int)
+    parser.add_argument('--backup', action='store_true', dest='backup', help="keep the original files as <file>.bak")
+    parser.add_argument('--atomic', action='store_true', dest='atomic', help="edit a copy and rename it over the original")
+    parser.add_argument('--dry-run', action='store_true', dest='dry_run')
+    parser.add_argument('-r', '--report', dest='report', default=None, type=str, help="write the report to this .csv file")
+
+    args = parser.parse_args()
+
+    changes = {}
+    if args.reset_surface_height and args.surface_height is not None:
+        parser.error("--reset-surface-height and --surface-height are exclusive")
+    if args.reset_surface_height:
+        changes['surfaceHeight'] = column_top
+    if args.surface_height is not None:
+        changes['surfaceHeight'] = args.surface_height
+    for item in args.set:
+        name, sep, value = item.partition('=')
+        if not sep:
+            parser.error(f"Invalid --set {item}, expected VARIABLE=VALUE")
+        changes[name] = float(value)
+    if not changes:
+        parser.error("nothing to change")
+
+    files = expand_patterns(args.files)
+
+    report = edit_grids(files, changes, jobs=args.jobs, backup=args.backup, atomic=args.atomic, dry_run=args.dry_run)
+
+    if args.report:
+        report.to_csv(args.report, index=False)
+
+    failed = report[report['status'] == 'failed']
+    for _, row in failed.drop_duplicates('file').iterrows():
+        print(f"FAILED {row['file']}: {row['error']}")
+    if args.dry_run:
+        print(report[['file', 'variable', 'old', 'new']].to_string(index=False))
+    print(f"{len(files) - failed['file'].nunique()} of {len(files)} files {'checked' if args.dry_run else 'edited'}")
+
+    sys.exit(1 if len(failed) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+from ftu.grid_cache import GridCache
+from ftu.scripts._common import cache_limits
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Inspect or clean a cache of grid files")
+
+    parser.add_argument('cache_dir', type=str)
+    parser.add_argument('action', choices=["list", "evict", "clear"], nargs='?', default='list')
+    parser.add_argument('--max-size', dest='max_size', default=None, type=float, help="[MB]")
+    parser.add_argument('--max-age', dest='max_age', default=None, type=float, help="[days]")
+
+    args = parser.parse_args()
+
+    cache = GridCache(args.cache_dir)
+
+    if args.action == 'list':
+        entries = cache.entries()
+        print(entries.to_string(index=False))
+        print(f"{len(entries)} grids, {entries['size'].sum() / 1e6:.1f} MB")
+
+    elif args.action == 'evict':
+        removed = cache.evict(**cache_limits(args.max_size, args.max_age))
+        print(f"{len(removed)} grids removed")
+
+    elif args.action == 'clear':
+        removed = cache.clear()
+        print(f"{len(removed)} grids removed")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
 from ftu.FreThaw1D_gridcreator import main as make_grid
+from ftu.grid_cache import GridCache, cached_main
+from ftu.scripts._common import add_writer_options, cache_limits
 
 
 def main():
@@ -18,6 +20,12 @@ def main():
     parser.add_argument('-G', '--Grid-Input', dest="grid_input_file_name")
     parser.add_argument('-P', '--Parameter-Input', dest="parameter_input_file_name")
     parser.add_argument("-O", '--Output', type=str, dest="output_file_name")
+    add_writer_options(parser)
+    parser.add_argument('--shallow-depth', dest='shallow_depth', default=None, type=float, help="also write the grid of the upper SHALLOW_DEPTH m (shallow spinup)")
+    parser.add_argument('--shallow-output', dest='shallow_output_file_name', default=None, type=str)
+    parser.add_argument('--cache-dir', dest='cache_dir', default=None, type=str, help="reuse grids built from the same inputs")
+    parser.add_argument('--cache-max-size', dest='cache_max_size', default=None, type=float, help="[MB]")
+    parser.add_argument('--cache-max-age', dest='cache_max_age', default=None, type=float, help="[days]")
 
     args = parser.parse_args()
     
@@ -25,7 +33,11 @@ def main():
         parser.print_help()
         sys.exit(0)
     
-    make_grid(args)
+    if args.cache_dir:
+        cache = GridCache(args.cache_dir, **cache_limits(args.cache_max_size, args.cache_max_age))
+        cached_main(args, cache)
+    else:
+        make_grid(args)
 
 
 if __name__ == "__main__":
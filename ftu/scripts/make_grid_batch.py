@@ -0,0 +1,52 @@
+from ftu.FreThaw1D_gridcreator import _writer_options
+from ftu.grid_batch import make_grids
+from ftu.grid_cache import GridCache
+from ftu.scripts._common import add_writer_options, cache_limits
+
+
+def main():
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Create the grids of all the sites listed in a manifest (.csv or .json)")
+
+    parser.add_argument('manifest', type=str)
+    parser.add_argument('-j', '--jobs', dest='jobs', default=1, type=int)
+    parser.add_argument('-r', '--report', dest='report', default=None, type=str, help="write the per-site report to this .csv file")
+    parser.add_argument('-d', '--dz-min', dest="dz_min", default=0.005, type=float)
+    parser.add_argument('-b', dest='b', default=0.1, type=float)
+    parser.add_argument('-i', '--interp-model', dest='interp_model', default='linear', type=str)
+    parser.add_argument('-g', '--grid-type', choices=["exponential", "classical"], default='exponential', dest="grid_type")
+    parser.add_argument('-s', '--output-summary', dest='output_summary',type=str, default='')
+    parser.add_argument('-t', '--output-title', dest='output_title',type=str, default='')
+    parser.add_argument('-n', '--output-institution', dest='output_institution',type=str, default='')
+    add_writer_options(parser)
+    parser.add_argument('--cache-dir', dest='cache_dir', default=None, type=str, help="reuse grids built from the same inputs")
+    parser.add_argument('--cache-max-size', dest='cache_max_size', default=None, type=float, help="[MB]")
+    parser.add_argument('--cache-max-age', dest='cache_max_age', default=None, type=float, help="[days]")
+
+    args = parser.parse_args()
+
+    defaults = {k: getattr(args, k) for k in ['dz_min', 'b', 'grid_type', 'interp_model',
+                                              'output_title', 'output_institution', 'output_summary']}
+
+    cache = None
+    if args.cache_dir:
+        cache = GridCache(args.cache_dir, **cache_limits(args.cache_max_size, args.cache_max_age))
+
+    report = make_grids(args.manifest, jobs=args.jobs, defaults=defaults, cache=cache,
+                        **_writer_options(args))
+
+    if args.report:
+        report.to_csv(args.report, index=False)
+
+    failed = report[report['status'] == 'failed']
+    for _, row in failed.iterrows():
+        print(f"FAILED {row['site']}: {row['error']}")
+    print(f"{len(report) - len(failed)} of {len(report)} grids created ({sum(report['status'] == 'cached')} from cache)")
+
+    sys.exit(1 if len(failed) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+from ftu.validation import validate_grids
+from ftu.scripts._common import expand_patterns
+
+
+def main():
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Check grid files before submitting simulations")
+
+    parser.add_argument('files', type=str, nargs='+', help="grid files or glob patterns")
+    parser.add_argument('-j', '--jobs', dest='jobs', default=1, type=int)
+    parser.add_argument('--rtol', dest='rtol', default=1e-9, type=float, help="tolerance of the geometric checks, relative to the column depth")
+    parser.add_argument('-r', '--report', dest='report', default=None, type=str, help="write the report to this .csv file")
+
+    args = parser.parse_args()
+
+    files = expand_patterns(args.files)
+
+    report = validate_grids(files, jobs=args.jobs, rtol=args.rtol)
+
+    if args.report:
+        report.to_csv(args.report, index=False)
+
+    bad = report[report['status'] != 'ok']
+    for _, row in bad.iterrows():
+        print(f"{row['status'].upper()} {row['file']}: {row['problems']}")
+    print(f"{len(report) - len(bad)} of {len(report)} grids are valid")
+
+    sys.exit(1 if len(bad) else 0)
+
+
+if __name__ == "__main__":
+    main()
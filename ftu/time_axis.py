@@ -0,0 +1,119 @@
+"""
+Decoding of netCDF time axes to datetime64[ns] arrays.
+
+For the standard calendars the dates are computed arithmetically from the units string
+("<unit> since <date>"), instead of building one Python datetime per time step with
+netCDF4.num2date. Other calendars, and dates that datetime64[ns] cannot represent, fall
+back to num2date.
+"""
+import re
+from datetime import datetime
+
+import netCDF4 as nc
+import numpy as np
+import pandas as pd
+
+
+_NS_PER_UNIT = {}
+for _names, _ns in ((('nanoseconds', 'nanosecond', 'ns'), 1),
+                    (('microseconds', 'microsecond', 'us'), 10**3),
+                    (('milliseconds', 'millisecond', 'ms'), 10**6),
+                    (('seconds', 'second', 'secs', 'sec', 's'), 10**9),
+                    (('minutes', 'minute', 'mins', 'min'), 60 * 10**9),
+                    (('hours', 'hour', 'hrs', 'hr', 'h'), 3600 * 10**9),
+                    (('days', 'day', 'd'), 86400 * 10**9)):
+    _NS_PER_UNIT.update(dict.fromkeys(_names, _ns))
+
+_CALENDARS = ('standard', 'gregorian', 'proleptic_gregorian')
+
+# years that datetime64[ns] can represent (conversion outside of them silently overflows);
+# the standard (mixed Julian/Gregorian) calendar is proleptic gregorian over all of them
+_NS_YEARS = (1678, 2261)
+
+_UNITS = re.compile(r'^\s*(\w+)\s+since\s+(.+?)\s*$', re.IGNORECASE)
+
+
+def parse_time_units(units: str):
+    """ nanoseconds per time step and reference date of units "<unit> since <date>",
+    None if they cannot be represented with datetime64[ns] """
+    match = _UNITS.match(units)
+    if match is None or match.group(1).lower() not in _NS_PER_UNIT:
+        return None
+    try:
+        reference = pd.Timestamp(match.group(2).replace(' UTC', '').replace(' GMT', ''))
+    except (ValueError, OverflowError):
+        return None
+    if reference.tzinfo is not None:
+        reference = reference.tz_convert(None)
+    if not _NS_YEARS[0] <= reference.year <= _NS_YEARS[1]:
+        return None
+    return _NS_PER_UNIT[match.group(1).lower()], reference.to_datetime64().astype('datetime64[ns]')
+
+
+def time_in_days(values, units: str) -> np.ndarray:
+    """ Numeric time values in days since the reference date of units, in any calendar """
+    match = _UNITS.match(units)
+    if match is None or match.group(1).lower() not in _NS_PER_UNIT:
+        raise ValueError(f"Unsupported time units: {units}")
+    return np.ma.getdata(values).astype(float) * (_NS_PER_UNIT[match.group(1).lower()] / _NS_PER_UNIT['days'])
+
+
+def decode_time(values, units: str, calendar: str = 'standard') -> np.ndarray:
+    """ Dates of numeric time values
+
+    Parameters
+    ----------
+    values : array-like
+        time values, masked values become NaT
+    units : str
+        units attribute of the time variable, e.g. "hours since 2000-01-01 00:00"
+    calendar : str, optional
+        calendar attribute of the time variable, by default 'standard'
+
+    Returns
+    -------
+    np.ndarray
+        datetime64[ns] dates; if they cannot be represented so (e.g. noleap calendar),
+        the dates of netCDF4.num2date (cftime objects)
+    """
+    parsed = parse_time_units(units) if calendar.lower() in _CALENDARS else None
+    if parsed is not None:
+        ns, reference = parsed
+        mask = np.ma.getmaskarray(values)
+        v = np.ma.getdata(values).astype(float)
+        ref = int(reference.astype('int64'))
+        offsets = v[~mask] * ns
+        if np.all((offsets > 0.999 * (-2**63 - ref)) & (offsets < 0.999 * (2**63 - ref))):
+            v = np.where(mask, 0, v)
+            offsets = v.astype('int64') * ns if np.all(v == np.round(v)) else np.round(v * ns).astype('int64')
+            times = reference + offsets.astype('timedelta64[ns]')
+            times[mask] = np.datetime64('NaT')
+            return times
+
+    times = np.asarray(nc.num2date(values, units, calendar, only_use_cftime_datetimes=False))
+    if all(isinstance(t, datetime) and _NS_YEARS[0] <= t.year <= _NS_YEARS[1] for t in times.ravel()):
+        return times.astype('datetime64[ns]')
+    return times
+
+
+def date_number(date, units: str, calendar: str = 'standard') -> float:
+    """ Numeric time value of a date (str, datetime, datetime64 or cftime date) in units
+    "<unit> since <date>" of the calendar, as netCDF4.date2num """
+    if not hasattr(date, 'calendar'):  # cftime dates are passed as they are
+        date = pd.Timestamp(date)
+        if date.tzinfo is not None:
+            date = date.tz_convert(None)
+        date = date.to_pydatetime()
+    return float(nc.date2num(date, units, calendar))
+
+
+def time_slice(values, units: str, calendar: str = 'standard', start=None, end=None) -> slice:
+    """ Time steps of sorted numeric time values in [start, end); None for an open end
+
+    start and end are converted to numbers of the time axis (see date_number), so that
+    any calendar can be searched without decoding the time values.
+    """
+    v = np.ma.getdata(values)
+    i = 0 if start is None else int(np.searchsorted(v, date_number(start, units, calendar), side='left'))
+    j = len(v) if end is None else int(np.searchsorted(v, date_number(end, units, calendar), side='left'))
+    return slice(i, max(i, j))
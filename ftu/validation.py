@@ -0,0 +1,159 @@
+"""
+Consistency checks of grid files, to run before submitting simulations.
+
+A malformed grid (e.g. a parameterID without a parameter set, or interfaces that
+do not bracket the centroids) only shows up deep inside a FreeThaw1D run, often as an
+ArrayIndexOutOfBoundsException. check_grid finds these problems from the grid arrays alone.
+"""
+import netCDF4 as nc
+import numpy as np
+import pandas as pd
+
+from .parallel import error_message, run_per_item
+
+
+REQUIRED = ['KMAX', 'eta', 'etaDual', 'z', 'zDual', 'spaceDelta', 'volumeSoil', 'parameterID']
+
+REPORT_COLUMNS = ['file', 'status', 'problems']
+
+# number of offending control volumes listed in a message
+_SHOWN = 5
+
+
+def check_grid(data: dict, rtol: float = 1e-9) -> list:
+    """ Check the geometry and the parameter indices of a grid
+
+    Parameters
+    ----------
+    data : dict
+        variables of the grid file, as written; values after the first KMAX (KMAX + 1 for
+        the interfaces) are padding and are not checked
+    rtol : float, optional
+        tolerance of the geometric checks, relative to the column depth, by default 1e-9
+
+    Returns
+    -------
+    list
+        description of the problems found, empty if the grid is valid
+    """
+    missing = [n for n in REQUIRED if n not in data]
+    if missing:
+        return [f"missing variables {missing}"]
+
+    v = {n: np.ravel(np.ma.getdata(data[n])) for n in REQUIRED}
+    KMAX = int(v['KMAX'][0])
+
+    problems = []
+    sizes = {n: KMAX for n in ('eta', 'z', 'volumeSoil', 'parameterID')}
+    sizes.update({n: KMAX + 1 for n in ('etaDual', 'zDual', 'spaceDelta')})
+    short = [f"{n} ({v[n].size})" for n, s in sizes.items() if v[n].size < s]
+    if short:
+        # the other checks need arrays of matching sizes
+        return [f"sizes do not match KMAX={KMAX}: {', '.join(short)}"]
+
+    # arrays padded to a common length (e.g. the shallow grid) are checked up to KMAX only
+    v.update({n: v[n][:s] for n, s in sizes.items()})
+    eta, eta_dual, z, z_dual = (np.asarray(v[n], dtype=float) for n in ('eta', 'etaDual', 'z', 'zDual'))
+    space_delta = np.asarray(v['spaceDelta'], dtype=float)
+    volume = np.asarray(v['volumeSoil'], dtype=float)
+
+    for name in ('eta', 'etaDual', 'z', 'zDual', 'spaceDelta', 'volumeSoil'):
+        bad = ~np.isfinite(np.asarray(v[name], dtype=float))
+        if bad.any():
+            problems.append(_message(f"{name} is not finite", bad))
+    if problems:
+        return problems
+
+    atol = rtol * max(abs(eta_dual[-1] - eta_dual[0]), 1.0)
+
+    for name, x in (('z', z), ('zDual', z_dual), ('eta', eta), ('etaDual', eta_dual)):
+        bad = np.diff(x) <= 0
+        if bad.any():
+            problems.append(_message(f"{name} is not strictly increasing", bad))
+
+    bad = (z <= z_dual[:-1]) | (z >= z_dual[1:])
+    if bad.any():
+        problems.append(_message("centroids z are not between their interfaces zDual", bad))
+
+    offset = z[0] - eta[0]
+    if not (np.allclose(z - eta, offset, rtol=0, atol=atol) and np.allclose(z_dual - eta_dual, offset, rtol=0, atol=atol)):
+        problems.append("z and eta (or zDual and etaDual) are not shifted by the same offset")
+
+    expected = np.empty(KMAX + 1)
+    expected[0] = np.abs(eta_dual[0] - eta[0])
+    expected[1:-1] = np.abs(np.diff(eta))
+    expected[-1] = np.abs(eta_dual[-1] - eta[-1])
+    bad = ~np.isclose(space_delta, expected, rtol=0, atol=atol)
+    if bad.any():
+        problems.append(_message("spaceDelta does not match the distances between centroids and interfaces", bad))
+
+    bad = ~np.isclose(volume, np.abs(np.diff(eta_dual)), rtol=0, atol=atol)
+    if bad.any():
+        problems.append(_message("volumeSoil does not match the distances between interfaces", bad))
+
+    depth = eta_dual[-1] - eta_dual[0]
+    if not np.isclose(volume.sum(), depth, rtol=0, atol=atol * KMAX):
+        problems.append(f"volumeSoil sums to {volume.sum():.9g}, the column is {depth:.9g} deep")
+
+    pid = np.asarray(v['parameterID'], dtype=float)
+    n_parameters = _parameter_count(data)
+    bad = (pid != np.round(pid)) | (pid < 0)
+    if n_parameters is not None:
+        bad |= pid >= n_parameters
+    if bad.any():
+        problems.append(_message(f"parameterID is not an index of the {n_parameters} parameter sets", bad))
+
+    return problems
+
+
+def validate_grids(files, jobs: int = 1, rtol: float = 1e-9) -> pd.DataFrame:
+    """ Check many grid files (see check_grid)
+
+    Parameters
+    ----------
+    files : list
+        paths of the grid files
+    jobs : int, optional
+        number of worker processes, by default 1 (no pool)
+    rtol : float, optional
+        tolerance of the geometric checks, relative to the column depth, by default 1e-9
+
+    Returns
+    -------
+    pd.DataFrame
+        one row per file with the columns file, status ('ok', 'invalid' or 'failed', when the file
+        cannot be read) and problems
+    """
+    files = [str(f) for f in files]
+
+    results = run_per_item(_validate_file, files, (rtol,), jobs)
+    return pd.DataFrame(results, columns=REPORT_COLUMNS)
+
+
+def _validate_file(file: str, rtol: float) -> dict:
+    result = {'file': file, 'status': 'ok', 'problems': ''}
+    try:
+        with nc.Dataset(file, 'r') as ds:
+            data = {n: ds[n][:] for n in ds.variables}
+        problems = check_grid(data, rtol)
+        if problems:
+            result['status'] = 'invalid'
+            result['problems'] = '; '.join(problems)
+    except Exception as e:
+        result['status'] = 'failed'
+        result['problems'] = error_message(e)
+    return result
+
+
+def _parameter_count(data: dict):
+    """ number of parameter sets, from the parameter variables """
+    for name in ('thetaS', 'thetaR', 'soilParticlesDensity', 'meltingTemperature'):
+        if name in data:
+            return np.size(data[name])
+    return None
+
+
+def _message(text: str, bad: np.ndarray) -> str:
+    k = np.flatnonzero(bad)
+    shown = ', '.join(str(i) for i in k[:_SHOWN])
+    return f"{text} (k={shown}{', ...' if k.size > _SHOWN else ''}; {k.size} values)"
@@ -0,0 +1,68 @@
+import argparse
+from pathlib import Path
+
+import netCDF4 as nc
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def write_output(path, n_time=48, n_k=6, units='hours since 2000-01-01 00:00', calendar=None, start=0):
+    """ Small FreeThaw-like output file: height (time, k) with the last node invalid (0),
+    T (time, k) in K and the time axis """
+    with nc.Dataset(path, 'w') as ds:
+        ds.createDimension('time', None)
+        ds.createDimension('k', n_k)
+        t = ds.createVariable('time', 'f8', ('time',))
+        t.units = units
+        if calendar is not None:
+            t.calendar = calendar
+        t[:] = np.arange(start, start + n_time)
+        h = np.tile(np.linspace(0, -(n_k - 2), n_k - 1), (n_time, 1))
+        height = ds.createVariable('height', 'f8', ('time', 'k'))
+        height[:] = np.c_[h + 0.5, np.zeros(n_time)]
+        T = ds.createVariable('T', 'f8', ('time', 'k'))
+        T[:] = 273.15 + np.sin(np.arange(n_time) / 24 * 2 * np.pi)[:, None] + np.arange(n_k)[None, :]
+    return path
+
+
+@pytest.fixture
+def output_file(tmp_path):
+    return write_output(tmp_path / 'output.nc')
+
+
+def grid_tables(kmax=40):
+    """ (layers, initial condition, parameters) input tables of a 10 m classical grid
+    with 4 layers and about kmax control volumes """
+    eta = np.array([0.0, -1.0, -3.0, -6.0, -10.0])
+    K = np.append(np.diff(np.linspace(0, kmax, eta.size)).astype(int), 0)
+    grid = pd.DataFrame({'Type': ['L'] * eta.size, 'eta': eta, 'K': K,
+                         'rheologyID': [1] * eta.size, 'parameterID': [0, 1, 2, 3, 0]})
+    ic = pd.DataFrame({'eta': [0.0, -2.0, -5.0, -10.0], 'T0': [270.0, 271.5, 272.5, 274.0]})
+    n = 4
+    parameter = pd.DataFrame({'spDensity': np.full(n, 2650.0), 'spConductivity': np.linspace(2, 3, n),
+                              'spSpecificHeatCapacity': np.full(n, 900.0), 'thetaS': np.linspace(0.3, 0.45, n),
+                              'thetaR': np.full(n, 0.05), 'meltingT': np.full(n, 273.15),
+                              'par1': np.full(n, 1.5), 'par2': np.full(n, 0.5), 'par3': np.nan, 'par4': np.nan})
+    return grid, ic, parameter
+
+
+def write_grid_inputs(directory, kmax=40):
+    """ grid, ic and parameter input .csv files of grid_tables, as a dict of paths """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    files = {}
+    for name, table in zip(('grid', 'ic', 'parameter'), grid_tables(kmax)):
+        files[name] = str(directory / f"{name}.csv")
+        table.to_csv(files[name], index=False)
+    return files
+
+
+def grid_args(files, output, **options):
+    """ arguments of FreThaw1D_gridcreator.main (as parsed by make_grid) for the input files """
+    args = dict(grid_input_file_name=files['grid'], ic_input_file_name=files['ic'],
+                parameter_input_file_name=files['parameter'], output_file_name=str(output),
+                dz_min=0.01, b=0.1, grid_type='classical', interp_model='linear',
+                output_title='test', output_institution='', output_summary='')
+    args.update(options)
+    return argparse.Namespace(**args)
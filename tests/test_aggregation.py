@@ -0,0 +1,78 @@
+import cftime
+import numpy as np
+import pandas as pd
+import pytest
+
+from ftu.aggregation import (aggregate, aggregate_array, annual_envelope, degree_days,
+                             mean_annual_ground_temperature, period_codes)
+from ftu.all_variables import AllVariables
+
+from conftest import write_output
+
+
+RESAMPLE = {'D': 'D', 'M': 'MS', 'Y': 'YS'}
+
+
+def _hourly(days=800, k=3, seed=0):
+    t = pd.date_range('2001-01-01', periods=24 * days, freq='h')
+    rng = np.random.default_rng(seed)
+    values = rng.normal(0, 5, (len(t), k))
+    values[rng.random(values.shape) < 0.01] = np.nan
+    return t, values
+
+
+@pytest.mark.parametrize('freq', ['D', 'M', 'Y'])
+def test_statistics_match_pandas_resample(freq):
+    t, values = _hourly()
+    periods, stats = aggregate_array(t.values, values, freq, kelvin=False)
+
+    resampler = pd.DataFrame(values, index=t).resample(RESAMPLE[freq])
+    assert np.array_equal(periods.astype('datetime64[ns]'), resampler.mean().index.values)
+    for name in ('mean', 'min', 'max', 'count'):
+        assert np.allclose(stats[name], getattr(resampler, name)().values, equal_nan=True), name
+
+
+def test_degree_days_match_pandas_resample():
+    t, values = _hourly()
+    periods, stats = aggregate_array(t.values, values, 'M', kelvin=False)
+    frame = pd.DataFrame(values, index=t)
+    fdd = -frame.clip(upper=0).resample('MS').sum() / 24
+    tdd = frame.clip(lower=0).resample('MS').sum() / 24
+    assert np.allclose(stats['fdd'], fdd.values)
+    assert np.allclose(stats['tdd'], tdd.values)
+
+
+def test_annual_statistics_of_a_file_read_in_blocks(tmp_path):
+    path = write_output(tmp_path / 'output.nc', n_time=2 * 8760 + 48)
+    with AllVariables(path) as av:
+        frame = pd.DataFrame(av['T'] - 273.15, index=pd.DatetimeIndex(av.time))
+        yearly = frame.resample('YS')
+
+        years, magt = mean_annual_ground_temperature(av, block_size=1000)
+        assert np.array_equal(years.astype('datetime64[ns]'), yearly.mean().index.values)
+        assert np.allclose(magt - 273.15, yearly.mean().values)
+
+        _, low, high = annual_envelope(av, block_size=1000)
+        assert np.allclose(low - 273.15, yearly.min().values)
+        assert np.allclose(high - 273.15, yearly.max().values)
+
+        _, fdd, tdd = degree_days(av, block_size=1000)
+        assert np.allclose(fdd, -frame.clip(upper=0).resample('YS').sum().values / 24)
+        assert np.allclose(tdd, frame.clip(lower=0).resample('YS').sum().values / 24)
+
+
+def test_noleap_calendar(tmp_path):
+    path = write_output(tmp_path / 'noleap.nc', n_time=400, units='days since 2001-01-01', calendar='noleap')
+    with AllVariables(path) as av:
+        months, stats = aggregate(av, freq='M')
+        days, daily = aggregate(av, freq='D')
+    assert isinstance(months[0], cftime.DatetimeNoLeap)
+    assert (months[1].year, months[1].month) == (2001, 2) and len(months) == 14
+    assert stats['count'][1, 0] == 28
+    assert len(days) == 400 and daily['fdd'].shape == (400, 5)
+    assert np.allclose(daily['count'], 1)
+
+
+def test_invalid_frequency():
+    with pytest.raises(ValueError):
+        period_codes(np.array(['2001-01-01'], dtype='datetime64[ns]'), 'W')
@@ -0,0 +1,133 @@
+import netCDF4 as nc
+import numpy as np
+import pytest
+
+from ftu.all_variables import AllVariables, _subsample_valid, _valid_indices_2d
+from ftu.dataset_pool import DatasetPool
+
+
+def test_empty_pool_opens_no_direct_handle(output_file):
+    pool = DatasetPool()
+    av = AllVariables(output_file, pool=pool)
+    assert av._ds is None
+    assert len(pool) == 0
+    assert av['T'].shape == (48, 5)
+    assert len(pool) == 1
+
+
+def test_read_time_window_does_not_compute_bounds(output_file):
+    with AllVariables(output_file) as av:
+        t, values = av.read(['T'], '2000-01-01 06:00', '2000-01-01 12:00')
+        assert av._bounds is None
+        assert len(t) == 6 and values['T'].shape == (6, 6)
+        assert values['T'][:, -1].mask.all()
+
+
+def test_read_depth_range(output_file):
+    # heights 0.5, -0.5, ..., -3.5; the surface is the top of the first cell, 1.0
+    with AllVariables(output_file) as av:
+        t, values = av.read(['T', 'height'], '2000-01-01', '2000-01-02', depth=(0, 2))
+        assert av._bounds[0] == (0, 24)
+        assert values['T'].shape == (24, 2)
+        assert not values['T'].mask.any()
+
+        _, values = av.read(['T'], height=(-1, -3))
+        assert values['T'].shape == (48, 2)
+
+
+def test_subsample_without_valid_nodes():
+    height = np.zeros((4, 3))
+    valid = _valid_indices_2d(height)
+    assert _subsample_valid(np.ones((4, 3)), valid).shape == (4, 0)
+    assert _subsample_valid(np.ones((4, 3)), valid[:0], rows=slice(0, 0)).shape == (0, 0)
+
+
+def test_subsample_ragged_padding():
+    height = np.array([[1., 2, 0], [1, 0, 0]])
+    values = np.array([[10., 20, 30], [40, 50, 60]])
+    out = _subsample_valid(values, _valid_indices_2d(height), 'masked')
+    assert out.shape == (2, 2)
+    assert out[0].tolist() == [10, 20] and out[1, 0] == 40 and out.mask[1, 1]
+
+
+def test_get_known_profile(output_file):
+    # T = 273.15 + sin(t) + k at heights 0.5 - k; surface at 1.0, half a cell above the top node
+    with AllVariables(output_file) as av:
+        base = av['T'][:, 0]
+        np.testing.assert_allclose(av.get('T', atheight=-1.0), base + 1.5)
+        np.testing.assert_allclose(av.get('T', atdepth=[0.5, 1.5, 2.0]), base[:, None] + [0, 1, 1.5])
+        assert np.isnan(av.get('T', atdepth=0.25)).all()
+        np.testing.assert_allclose(av.height_bounds()[2], 1.0)
+
+
+def _ragged():
+    """ (time, k) heights with 3, 2 and 1 valid nodes (0, NaN and masked are not valid), and values """
+    height = np.ma.masked_array([[1., 2., 3., 0.],
+                                 [1., np.nan, 3., 0.],
+                                 [0., 0., 3., 4.]], mask=[[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 1]])
+    values = np.arange(12.).reshape(3, 4)
+    return height, values
+
+
+def test_valid_indices_2d():
+    height, _ = _ragged()
+    np.testing.assert_array_equal(_valid_indices_2d(height), [[1, 1, 1, 0], [1, 0, 1, 0], [0, 0, 1, 0]])
+
+
+def test_subsample_ragged_masked():
+    height, values = _ragged()
+    subsample = _subsample_valid(values, _valid_indices_2d(height), 'masked')
+    assert subsample.shape == (3, 3)
+    np.testing.assert_array_equal(subsample.mask, [[0, 0, 0], [0, 0, 1], [0, 1, 1]])
+    np.testing.assert_array_equal(subsample.compressed(), [0., 1., 2., 4., 6., 10.])
+
+
+def test_subsample_ragged_list():
+    height, values = _ragged()
+    subsample = _subsample_valid(values, _valid_indices_2d(height), 'list')
+    assert [s.tolist() for s in subsample] == [[0., 1., 2.], [4., 6.], [10.]]
+
+
+def test_subsample_ragged_raise():
+    height, values = _ragged()
+    with pytest.raises(ValueError):
+        _subsample_valid(values, _valid_indices_2d(height), 'raise')
+    # the same number of valid nodes per time step is not ragged
+    valid = np.array([[1, 1, 0], [0, 1, 1]], dtype=bool)
+    np.testing.assert_array_equal(_subsample_valid(np.arange(6.).reshape(2, 3), valid, 'raise'), [[0., 1.], [4., 5.]])
+
+
+def test_subsample_ragged_rows():
+    height, values = _ragged()
+    rows = slice(1, 3)
+    subsample = _subsample_valid(values, _valid_indices_2d(height[rows]), 'list', rows)
+    assert [s.tolist() for s in subsample] == [[4., 6.], [10.]]
+
+
+@pytest.mark.parametrize('ragged', ['masked', 'list', 'raise'])
+def test_ragged_file(tmp_path, ragged):
+    height, values = _ragged()
+    path = tmp_path / 'ragged.nc'
+    with nc.Dataset(path, 'w') as ds:
+        ds.createDimension('time', None)
+        ds.createDimension('k', 4)
+        t = ds.createVariable('time', 'f8', ('time',))
+        t.units = 'hours since 2000-01-01'
+        t[:] = np.arange(3)
+        ds.createVariable('height', 'f8', ('time', 'k'))[:] = np.ma.filled(height, 0.)
+        ds.createVariable('T', 'f8', ('time', 'k'))[:] = values
+
+    with AllVariables(path, ragged=ragged) as av:
+        if ragged == 'raise':
+            with pytest.raises(ValueError):
+                av['T']
+            np.testing.assert_array_equal(av.get('T', start='2000-01-01 02:00'), [[10.]])
+        elif ragged == 'list':
+            assert [s.tolist() for s in av['T']] == [[0., 1., 2.], [4., 6.], [10.]]
+        else:
+            assert av['T'].shape == (3, 3) and av['T'].count() == 6
+
+
+def test_invalid_ragged(output_file):
+    with pytest.raises(ValueError):
+        AllVariables(output_file, ragged='padded')
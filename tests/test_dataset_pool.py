@@ -0,0 +1,43 @@
+from ftu.all_variables import AllVariables
+from ftu.dataset_pool import DatasetPool
+
+from conftest import write_output
+
+
+def test_checked_out_dataset_is_not_evicted(tmp_path):
+    first, second = write_output(tmp_path / 'a.nc'), write_output(tmp_path / 'b.nc')
+    pool = DatasetPool(maxsize=1)
+    with pool.checkout(first) as ds:
+        pool.get(second)
+        assert ds.isopen()
+        assert len(pool) == 2
+        assert ds['T'][:].shape == (48, 6)
+    # released: back to maxsize, the checked-out dataset is no longer protected
+    assert len(pool) == 1
+    pool.get(first)
+    assert len(pool) == 1 and first in pool and second not in pool
+    pool.close_all()
+
+
+def test_nested_checkouts(tmp_path):
+    first, second = write_output(tmp_path / 'a.nc'), write_output(tmp_path / 'b.nc')
+    pool = DatasetPool(maxsize=1)
+    with pool.checkout(first) as ds:
+        with pool.checkout(first):
+            pass
+        pool.get(second)
+        assert ds.isopen()
+    pool.close_all()
+
+
+def test_block_iteration_survives_other_reads(tmp_path):
+    first, second = write_output(tmp_path / 'a.nc'), write_output(tmp_path / 'b.nc')
+    pool = DatasetPool(maxsize=1)
+    a, b = AllVariables(first, pool=pool), AllVariables(second, pool=pool)
+    rows = 0
+    for _, values in a.iter_blocks(['T'], 10):
+        rows += len(values['T'])
+        assert b['T'].shape == (48, 5)
+    assert rows == 48
+    assert len(pool) == 1
+    pool.close_all()
@@ -0,0 +1,82 @@
+from functools import partial
+
+import netCDF4 as nc
+import numpy as np
+import pandas as pd
+
+from ftu.all_variables import AllVariables
+from ftu.ensemble import active_layer_thickness, annual_extremes, reduce_ensemble, REDUCTIONS
+from ftu.isotherms import extract_alt_isotherm_depth
+
+from conftest import write_output
+
+
+def _write_run(path, years=3, deepening=0.0):
+    """ daily output with an active layer 1.3 m thick (isotherm at -0.3 m, surface at the top
+    of the 0.5 m node's cell: 1.0 m), deepening by deepening [m] every year """
+    n = 365 * years
+    summer = np.sin(np.arange(n) / 365 * 2 * np.pi) > 0
+    heights = np.array([0.5, -0.5, -1.5, -2.5, -3.5, 0])
+    with nc.Dataset(path, 'w') as ds:
+        ds.createDimension('time', None)
+        ds.createDimension('k', heights.size)
+        ds.createDimension('n', 2)
+        t = ds.createVariable('time', 'f8', ('time',))
+        t.units = 'days since 2001-01-01'
+        t[:] = np.arange(n)
+        ds.createVariable('height', 'f8', ('time', 'k'))[:] = np.tile(heights, (n, 1))
+        T = np.where(heights > -0.3, np.where(summer, 2.0, -5.0)[:, None], -2.0)
+        ds.createVariable('T', 'f8', ('time', 'k'))[:] = 273.15 + T
+        iso = ds.createVariable('isotherms', 'f8', ('time', 'n'), fill_value=-9999.)
+        level = -0.3 - deepening * (np.arange(n) // 365)
+        iso[:] = np.ma.masked_array(np.c_[level, level], mask=np.c_[~summer, np.ones(n, bool)])
+    return str(path)
+
+
+def _empty(av):
+    return pd.DataFrame()
+
+
+def _fail(av):
+    raise RuntimeError("should not run again")
+
+
+def test_active_layer_thickness(tmp_path):
+    with AllVariables(_write_run(tmp_path / 'run.nc')) as av:
+        alt = active_layer_thickness(av, depths=[0.1, 0.5, 1.0, 2.0, 3.0])
+    assert alt['year'].tolist() == [2001, 2002, 2003]
+    assert np.allclose(alt['value'], 1.3)
+
+
+def test_active_layer_thickness_matches_extract_alt_isotherm_depth(tmp_path):
+    depths = np.array([0.1, 0.5, 1.0, 2.0, 3.0])
+    with AllVariables(_write_run(tmp_path / 'run.nc', years=4, deepening=0.05)) as av:
+        alt = active_layer_thickness(av, depths=depths)
+        t = pd.DatetimeIndex(av.time)
+        expected = extract_alt_isotherm_depth(av.get('T', atdepth=depths), t, np.ma.asarray(av.ds['isotherms'][:]),
+                                              depths, av.height_bounds()[2])['alt'].astype(float)
+    expected = expected.groupby(expected.index.year).max()
+    assert alt['year'].tolist() == expected.index.tolist()
+    assert np.allclose(alt['value'], expected.values, equal_nan=True)
+    assert not np.allclose(alt['value'], alt['value'].iloc[0])
+
+
+def test_resume_skips_done_and_empty_reductions(tmp_path):
+    files = [_write_run(tmp_path / f'run_{i}.nc', years=1) for i in range(2)]
+    output = tmp_path / 'results.csv'
+    reductions = dict(REDUCTIONS, empty=_empty)
+
+    first = reduce_ensemble(files, reductions, output)
+    assert (first['status'] == 'ok').all()
+    assert len(first[first['reduction'] == 'empty']) == 2
+
+    again = reduce_ensemble(files, {name: _fail for name in reductions}, output)
+    assert (again['status'] == 'ok').all()
+    assert len(again) == len(first)
+
+
+def test_annual_extremes_noleap(tmp_path):
+    path = write_output(tmp_path / 'noleap.nc', n_time=400, units='days since 2001-01-01', calendar='noleap')
+    with AllVariables(path) as av:
+        rows = annual_extremes(av)
+    assert sorted(rows['year'].unique()) == [2001, 2002]
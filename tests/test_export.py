@@ -0,0 +1,19 @@
+import pytest
+
+from ftu.all_variables import AllVariables
+from ftu.export import export_columnar
+
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+
+
+@pytest.mark.parametrize('layout', ['long', 'wide'])
+def test_empty_range_writes_the_schema(output_file, tmp_path, layout):
+    full, empty = tmp_path / 'full.parquet', tmp_path / 'empty.parquet'
+    with AllVariables(output_file) as av:
+        assert export_columnar(av, full, ['T', 'height'], layout=layout) > 0
+        assert export_columnar(av, empty, ['T', 'height'], layout=layout, start=10, stop=10) == 0
+    table = pq.read_table(empty)
+    assert table.num_rows == 0
+    assert table.schema == pq.read_table(full).schema
+    assert table.schema.field('time').type == pa.timestamp('ns')
@@ -0,0 +1,69 @@
+import json
+from pathlib import Path
+
+import netCDF4 as nc
+import pandas as pd
+import pytest
+
+from ftu.grid_batch import make_grids, read_manifest
+
+from conftest import write_grid_inputs
+
+
+def _site(name, **columns):
+    site = {'site': name, 'grid_input': 'inputs/grid.csv', 'ic_input': 'inputs/ic.csv',
+            'parameter_input': 'inputs/parameter.csv', 'output': f'{name}.nc', 'grid_type': 'classical'}
+    site.update(columns)
+    return site
+
+
+def test_read_csv_manifest(tmp_path):
+    manifest = tmp_path / 'sites.csv'
+    manifest.write_text("# sites\n"
+                        "grid_input, ic_input, parameter_input, output, dz_min\n"
+                        "a/grid.csv, a/ic.csv, a/parameter.csv, out/a.nc, 0.01\n"
+                        "b/grid.csv, b/ic.csv, b/parameter.csv, out/b.nc,\n")
+    sites = read_manifest(manifest)
+    assert sites['site'].tolist() == ['a', 'b']
+    assert sites['output'].tolist() == [str(tmp_path / 'out' / 'a.nc'), str(tmp_path / 'out' / 'b.nc')]
+    assert sites['grid_input'][0] == str(tmp_path / 'a' / 'grid.csv')
+    assert sites['dz_min'][0] == 0.01 and pd.isna(sites['dz_min'][1])
+
+
+@pytest.mark.parametrize('wrapped', [False, True])
+def test_read_json_manifest(tmp_path, wrapped):
+    records = [_site('a'), _site('b', dz_min=0.02)]
+    manifest = tmp_path / 'sites.json'
+    manifest.write_text(json.dumps({'sites': records} if wrapped else records))
+    sites = read_manifest(manifest)
+    assert sites['site'].tolist() == ['a', 'b']
+    assert sites['parameter_input'][1] == str(tmp_path / 'inputs' / 'parameter.csv')
+
+
+def test_manifest_without_file_columns(tmp_path):
+    manifest = tmp_path / 'sites.csv'
+    pd.DataFrame([{'grid_input': 'grid.csv', 'output': 'a.nc'}]).to_csv(manifest, index=False)
+    with pytest.raises(ValueError, match='ic_input'):
+        read_manifest(manifest)
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_failed_sites_are_reported(tmp_path, capsys, jobs):
+    write_grid_inputs(tmp_path / 'inputs')
+    manifest = tmp_path / 'sites.json'
+    manifest.write_text(json.dumps([_site('ok', output_title='first site'),
+                                    _site('no_parameters', parameter_input='inputs/missing.csv'),
+                                    _site('bad_type', grid_type='spiral'),
+                                    _site('defaults', grid_type='')]))
+
+    report = make_grids(manifest, jobs=jobs, defaults={'grid_type': 'classical', 'dz_min': 0.01})
+    assert report['site'].tolist() == ['ok', 'no_parameters', 'bad_type', 'defaults']
+    assert report['status'].tolist() == ['ok', 'failed', 'failed', 'ok']
+    assert 'missing.csv' in report['error'][1]
+    assert report['error'][2] != '' and report['error'][0] == ''
+
+    assert not Path(report['output'][1]).exists()
+    with nc.Dataset(report['output'][0]) as ds:
+        assert ds.getncattr('title').startswith('first site')
+    with nc.Dataset(report['output'][3]) as ds:
+        assert ds.dimensions['z'].size > 0
@@ -0,0 +1,92 @@
+import os
+import time
+
+import netCDF4 as nc
+import pytest
+
+from ftu import grid_cache
+from ftu.grid_cache import GridCache, cached_main
+
+from conftest import grid_args, write_grid_inputs
+
+
+def _key(cache, files, **options):
+    return cache.key(files['grid'], files['ic'], files['parameter'], 0.01, 0.1, 'classical', 'linear', **options)
+
+
+def _attribute(path, name):
+    with nc.Dataset(path) as ds:
+        return ds.getncattr(name)
+
+
+def test_key_depends_on_contents_options_and_builder(tmp_path, monkeypatch):
+    cache = GridCache(tmp_path / 'cache')
+    a = write_grid_inputs(tmp_path / 'a')
+    b = write_grid_inputs(tmp_path / 'b')
+    assert _key(cache, a) == _key(cache, b)  # same contents, other paths
+    assert _key(cache, a) != _key(cache, a, zlib=True)
+
+    with open(b['ic'], 'a') as f:
+        f.write("-20.0,275.0\n")
+    assert _key(cache, a) != _key(cache, b)
+
+    key = _key(cache, a)
+    monkeypatch.setattr(grid_cache, 'builder_version', lambda: 'another builder')
+    assert _key(cache, a) != key
+
+
+def test_cache_hit_rewrites_the_title(tmp_path, capsys):
+    cache = GridCache(tmp_path / 'cache')
+    a = write_grid_inputs(tmp_path / 'a')
+    b = write_grid_inputs(tmp_path / 'b')
+    assert not cached_main(grid_args(a, tmp_path / 'a.nc'), cache)
+    assert cached_main(grid_args(b, tmp_path / 'b.nc'), cache)
+
+    assert b['grid'] in _attribute(tmp_path / 'b.nc', 'title')
+    assert a['grid'] not in _attribute(tmp_path / 'b.nc', 'title')
+    assert _attribute(tmp_path / 'a.nc', 'date_created') == _attribute(tmp_path / 'b.nc', 'date_created')
+    cached, = (tmp_path / 'cache').glob('*.nc')
+    assert a['grid'] in _attribute(cached, 'title')
+
+
+@pytest.mark.parametrize('link', ['hardlink', 'symlink'])
+def test_links(tmp_path, link, capsys):
+    cache = GridCache(tmp_path / 'cache', link=link)
+    a = write_grid_inputs(tmp_path / 'a')
+    b = write_grid_inputs(tmp_path / 'b')
+    cached_main(grid_args(a, tmp_path / 'a.nc'), cache)
+    cached, = (tmp_path / 'cache').glob('*.nc')
+
+    assert cached_main(grid_args(a, tmp_path / 'again.nc'), cache)
+    if link == 'hardlink':
+        assert os.stat(tmp_path / 'again.nc').st_ino == os.stat(cached).st_ino
+    else:
+        assert os.path.realpath(tmp_path / 'again.nc') == str(cached.resolve())
+
+    # another title: a copy, the cached grid keeps its own
+    assert cached_main(grid_args(b, tmp_path / 'b.nc'), cache)
+    assert not os.path.islink(tmp_path / 'b.nc') and os.stat(tmp_path / 'b.nc').st_ino != os.stat(cached).st_ino
+    assert a['grid'] in _attribute(cached, 'title')
+
+
+def _store(cache, tmp_path, key, size, age):
+    source = tmp_path / f"{key}.src"
+    source.write_bytes(b'0' * size)
+    path = cache.store(key, source)
+    past = time.time() - age
+    os.utime(path, (past, past))
+
+
+def test_evict_by_age_then_least_recently_used(tmp_path):
+    cache = GridCache(tmp_path / 'cache', max_size=250, max_age=3600)
+    for key, age in [('new', 10), ('recent', 100), ('old', 1000), ('stale', 7200)]:
+        _store(cache, tmp_path, key, 100, age)
+    assert cache.entries()['key'].tolist() == ['new', 'recent', 'old', 'stale']
+
+    assert sorted(cache.evict()) == ['old', 'stale']
+    assert cache.entries()['key'].tolist() == ['new', 'recent']
+    assert cache.size == 200
+
+    assert cache.fetch('recent', tmp_path / 'out.nc')  # now the most recently used
+    assert cache.evict(max_size=100) == ['new']
+    assert cache.clear() == ['recent']
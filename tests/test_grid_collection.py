@@ -0,0 +1,70 @@
+import numpy as np
+import pytest
+
+from ftu.FreThaw1D_gridcreator import main
+from ftu.Grid import Grid
+from ftu.grid_collection import GridCollection
+
+from conftest import grid_args, write_grid_inputs
+
+
+@pytest.fixture
+def grids(tmp_path, capsys):
+    directory = tmp_path / 'grids'
+    directory.mkdir()
+    files = []
+    for i, kmax in enumerate([20, 40, 60]):
+        inputs = write_grid_inputs(tmp_path / f'inputs_{i}', kmax=kmax)
+        files.append(str(directory / f'grid_{i}.nc'))
+        main(grid_args(inputs, files[-1]))
+    return directory, files
+
+
+def test_stacked_variables(grids):
+    directory, files = grids
+    gc = GridCollection(directory, max_workers=1)
+    assert gc.files == files and len(gc) == 3
+    for i, f in enumerate(files):
+        with Grid(f) as g:
+            n = len(g['z'])
+            assert gc.lengths[i] == n
+            assert np.array_equal(gc['ic'][i, :n], g['ic'])
+            assert gc['ic'].mask[i, n:].all()
+            assert gc['KMAX'][i] == g['KMAX'][0]
+    assert np.array_equal(gc.mask, ~np.ma.getmaskarray(gc['z']))
+
+
+def test_process_pool_reads_the_same(grids):
+    directory, _ = grids
+    serial = GridCollection(directory, variables=['ic'], max_workers=1)
+    pooled = GridCollection(str(directory / '*.nc'), variables=['ic'], max_workers=2)
+    assert serial.vars == pooled.vars == ['z', 'eta', 'ic']
+    assert np.ma.allequal(serial['ic'], pooled['ic'])
+
+
+def test_crosses_and_select(grids):
+    directory, files = grids
+    gc = GridCollection(directory, max_workers=1)
+    # the initial condition crosses 273.15 K between 5 and 10 m depth
+    assert gc.crosses(273.15, 'ic').all()
+    assert not gc.crosses(273.15, 'ic', max_depth=4).any()
+    assert gc.select(gc.crosses(273.15, 'ic', min_depth=4)) == files
+    assert gc.select([0, 2]) == [files[0], files[2]]
+
+
+def test_unreadable_files(grids, tmp_path):
+    directory, files = grids
+    bad = directory / 'bad.nc'
+    bad.write_text("not a grid")
+    with pytest.raises(RuntimeError):
+        GridCollection(directory, max_workers=1)
+    gc = GridCollection(directory, max_workers=1, errors='skip')
+    assert gc.files == files and list(gc.errors) == [str(bad)]
+
+
+def test_empty_collection(tmp_path):
+    gc = GridCollection(tmp_path, max_workers=1)
+    assert len(gc) == 0
+    assert gc.mask.shape == (0, 0)
+    assert gc['z'].shape == (0, 0)
+    assert gc.crosses().shape == (0,)
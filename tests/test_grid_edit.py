@@ -0,0 +1,65 @@
+import os
+
+import netCDF4 as nc
+import pytest
+
+from ftu.Grid import _reset_surface_height, _set_surface_height
+from ftu.grid_edit import edit_grids, reset_surface_height, set_surface_height
+
+
+def _write_grid(path, surface=0.0):
+    with nc.Dataset(path, 'w') as ds:
+        ds.createDimension('z', 4)
+        ds.createDimension('scalar', 1)
+        ds.createVariable('z', 'f8', ('z',))[:] = [1.0, 2.0, 3.5, 0.0]
+        ds.createVariable('surfaceHeight', 'f8', ('scalar',))[:] = [surface]
+    return str(path)
+
+
+def _surface(path):
+    with nc.Dataset(path) as ds:
+        return float(ds['surfaceHeight'][0])
+
+
+def test_dry_run_reports_without_writing(tmp_path):
+    grid = _write_grid(tmp_path / 'grid.nc')
+    before = os.stat(grid).st_mtime_ns
+    report = reset_surface_height([grid], dry_run=True, backup=True, atomic=True)
+    assert report[['old', 'new', 'status']].values.tolist() == [[0.0, 3.5, 'dry-run']]
+    assert _surface(grid) == 0.0 and os.stat(grid).st_mtime_ns == before
+    assert os.listdir(tmp_path) == ['grid.nc']
+
+
+def test_backup_keeps_the_original(tmp_path):
+    grid = _write_grid(tmp_path / 'grid.nc')
+    set_surface_height([grid], 1.0, backup=True)
+    set_surface_height([grid], 2.0, backup=True)
+    assert _surface(grid) == 2.0
+    assert _surface(grid + '.bak') == 0.0
+
+
+def test_atomic_replace(tmp_path):
+    grid = _write_grid(tmp_path / 'grid.nc')
+    inode = os.stat(grid).st_ino
+    report = edit_grids([grid], {'surfaceHeight': 1.5}, atomic=True)
+    assert (report['status'] == 'ok').all()
+    assert _surface(grid) == 1.5 and os.stat(grid).st_ino != inode
+    assert os.listdir(tmp_path) == ['grid.nc']
+
+
+def test_failed_atomic_edit_leaves_the_file(tmp_path):
+    grid = _write_grid(tmp_path / 'grid.nc')
+    report = edit_grids([grid], {'surfaceHeight': 1.5, 'missing': 0}, atomic=True)
+    assert (report['status'] == 'failed').all() and 'missing' in report['error'].iloc[0]
+    assert _surface(grid) == 0.0
+    assert os.listdir(tmp_path) == ['grid.nc']
+
+
+def test_grid_helpers_use_grid_edit(tmp_path):
+    grid = _write_grid(tmp_path / 'grid.nc')
+    _set_surface_height(grid, 1.0)
+    assert _surface(grid) == 1.0
+    _reset_surface_height(grid)
+    assert _surface(grid) == 3.5
+    with pytest.raises(RuntimeError):
+        _set_surface_height(str(tmp_path / 'missing.nc'), 1.0)
@@ -0,0 +1,32 @@
+import netCDF4 as nc
+import numpy as np
+
+from ftu.Grid import Grid
+
+
+def _write_grid(path):
+    with nc.Dataset(path, 'w') as ds:
+        ds.createDimension('z', 5)
+        ds.createDimension('parameter', 2)
+        ds.createDimension('scalar', 1)
+        ds.createVariable('z', 'f8', ('z',))[:] = [1.0, 2.0, 3.0, 0.0, 0.0]
+        ds.createVariable('parameterID', 'f8', ('z',))[:] = [0, 1, 1, 0, 0]
+        ds.createVariable('thetaS', 'f8', ('parameter',))[:] = [0.4, 0.3]
+        ds.createVariable('surfaceHeight', 'f8', ('scalar',))[:] = [0.5]
+        ds.createVariable('missing', 'f8', ('scalar',), fill_value=-9999.)[:] = np.ma.masked
+    return str(path)
+
+
+def test_sidecar_returns_the_types_of_the_netcdf_file(tmp_path):
+    grid = _write_grid(tmp_path / 'grid.nc')
+    with Grid(grid) as g:
+        expected = {n: g[n] for n in g.vars}
+    with Grid(grid, sidecar=tmp_path / 'cache'):
+        pass
+    with Grid(grid, sidecar=tmp_path / 'cache') as g:
+        assert g._nc is None
+        for name, value in expected.items():
+            assert type(g[name]) is type(value), name
+            assert np.ma.allequal(g[name], value) and np.array_equal(np.ma.getmaskarray(g[name]),
+                                                                     np.ma.getmaskarray(value)), name
+        assert g['missing'].mask.all()
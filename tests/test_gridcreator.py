@@ -0,0 +1,171 @@
+from pathlib import Path
+
+import netCDF4 as nc
+import numpy as np
+import pandas as pd
+import pytest
+
+from ftu.FreThaw1D_gridcreator import (_column_geometry, _compact_int_dtype, _drop_duplicates, _dual_spacing,
+                                       _exponential_thickness, _write_grid_dataset, build_grid, build_grid_exponential,
+                                       build_grid_exponential_family, set_initial_condition,
+                                       set_initial_condition_ensemble, set_parameters)
+
+# grids built by the loops of the grid creator before the vectorization, for the same inputs
+DATA = Path(__file__).parent / 'data'
+
+GEOMETRY = ['eta', 'eta_dual', 'space_delta', 'z', 'z_dual', 'control_volume']
+
+
+def _baseline(name):
+    with np.load(DATA / name) as f:
+        arrays = dict(f)
+    cases = sorted({int(k.split('_')[0]) for k in arrays})
+    return [{k.split('_', 1)[1]: v for k, v in arrays.items() if k.startswith(f'{i}_')} for i in cases]
+
+
+EXPONENTIAL = _baseline('baseline_exponential.npz')
+
+
+def _column(depth):
+    return pd.DataFrame({'Type': ['L', 'L'], 'eta': [0.0, -depth], 'K': [0, 0]})
+
+
+def _geometry(grid):
+    return dict(zip(['KMAX'] + GEOMETRY, grid))
+
+
+def _assert_same_geometry(grid, expected):
+    assert grid[0] == expected['KMAX']
+    for name, values in zip(GEOMETRY, grid[1:]):
+        np.testing.assert_allclose(values, expected[name], rtol=0, atol=1e-12, err_msg=name)
+
+
+@pytest.mark.parametrize('expected', EXPONENTIAL, ids=lambda e: '-'.join(map(str, e['case'])))
+def test_exponential_grid_as_baseline(expected):
+    depth, dz_min, b = expected['case']
+    _assert_same_geometry(build_grid_exponential(_column(depth), dz_min, b), expected)
+
+
+def test_exponential_family_as_baseline():
+    expected = [e for e in EXPONENTIAL if e['case'][0] == 10.0]
+    b = [0.0, 0.05, 0.1]
+    family = build_grid_exponential_family(_column(10.0), 0.005, b)
+    assert len(family) == len(b)
+    _assert_same_geometry(family[2], expected[0])
+    for grid, rate in zip(family, b):
+        _assert_same_geometry(grid, _geometry(build_grid_exponential(_column(10.0), 0.005, rate)))
+
+
+def test_exponential_thickness():
+    expected = EXPONENTIAL[0]
+    dz = _exponential_thickness(10.0, np.array([0.005, 0.5]), np.array([0.1, 0.0]))
+    np.testing.assert_allclose(dz[0], expected['control_volume'][::-1], atol=1e-12)
+    np.testing.assert_array_equal(dz[1], [0.5] * 20)  # no remainder cell
+    with pytest.raises(ValueError):
+        _exponential_thickness(10.0, np.array([0.0]), np.array([0.1]))
+    with pytest.raises(ValueError):
+        _exponential_thickness(10.0, np.array([0.1]), np.array([-0.1]))
+
+
+def test_column_geometry_and_dual_spacing():
+    for expected in EXPONENTIAL:
+        depth = expected['case'][0]
+        _assert_same_geometry(_column_geometry(expected['control_volume'][::-1].copy(), depth), expected)
+        space_delta, control_volume = _dual_spacing(expected['eta'], expected['eta_dual'])
+        np.testing.assert_allclose(space_delta, expected['space_delta'], atol=1e-12)
+        np.testing.assert_allclose(control_volume, expected['control_volume'], atol=1e-12)
+
+
+def test_compact_int_dtype():
+    assert _compact_int_dtype(np.array([1., 2., 127.])) == 'i1'
+    assert _compact_int_dtype(np.array([1., 300.])) == 'i2'
+    assert _compact_int_dtype(np.array([1., 1.5])) is None
+    assert _compact_int_dtype(np.array([1., np.nan])) is None
+
+
+def test_compact_ints_keep_non_integer_labels(tmp_path):
+    data = {'KMAX': np.array([3]), 'eta': np.zeros(3), 'etaDual': np.zeros(4), 'par1': np.zeros(2),
+            'rheologyID': np.array([1., 2., 2.]), 'parameterID': np.array([1., 1.5, 2.])}
+    _write_grid_dataset(tmp_path / 'grid.nc', data, {}, compact_ints=True)
+    with nc.Dataset(tmp_path / 'grid.nc') as ds:
+        assert ds['rheologyID'].dtype == np.int8
+        assert ds['parameterID'].dtype == np.float64
+        np.testing.assert_array_equal(ds['parameterID'][:], [1., 1.5, 2.])
+
+
+CLASSICAL = _baseline('baseline_classical.npz')
+
+
+@pytest.mark.parametrize('expected', CLASSICAL, ids=lambda e: ''.join(e['input_Type']))
+def test_classical_grid_as_baseline(expected):
+    table = pd.DataFrame({c: expected[f'input_{c}'] for c in ('Type', 'eta', 'K')})
+    _assert_same_geometry(build_grid(table), expected)
+
+
+def test_drop_duplicates_as_baseline():
+    x = np.array([-0.5, -1.0, -0.5, -2.0, -1.0, -1.0 + 1e-15, -3.0])
+    # the list comprehension of the baseline, which kept the first exact occurrence
+    kept = [v for n, v in enumerate(x) if v not in x[:n]]
+    np.testing.assert_array_equal(_drop_duplicates(x), [-0.5, -1.0, -2.0, -3.0])
+    np.testing.assert_array_equal(_drop_duplicates(x, rtol=0), kept)
+    assert _drop_duplicates(np.array([1.0])).tolist() == [1.0]
+
+
+PARAMETERS = _baseline('baseline_parameters.npz')
+
+
+def _parameter_table(n=4):
+    """ parameter table of baseline_parameters.npz """
+    return pd.DataFrame({'spDensity': np.full(n, 2650.0), 'spConductivity': np.linspace(2, 3, n),
+                         'spSpecificHeatCapacity': [900.0, np.nan, 850.0, 800.0], 'thetaS': np.linspace(0.3, 0.45, n),
+                         'thetaR': np.full(n, 0.05), 'meltingT': np.full(n, 273.15),
+                         'par1': np.full(n, 1.5), 'par2': np.full(n, 0.5), 'par3': np.nan, 'par4': np.nan})
+
+
+@pytest.mark.parametrize('expected', PARAMETERS)
+def test_set_parameters_as_baseline(expected):
+    # classical and exponential centroids, and points on the interfaces or outside of the column
+    table = pd.DataFrame({c: expected[f'input_{c}'] for c in ('Type', 'eta', 'K', 'rheologyID', 'parameterID')})
+    eta = expected['input_eta_nodes']
+    parameters = set_parameters(table, _parameter_table(), eta.size, eta)
+    assert set(parameters) == {k for k in expected if not k.startswith('input_')}
+    for name, values in parameters.items():
+        np.testing.assert_array_equal(values, expected[name], err_msg=name)
+
+
+def _members():
+    """ (eta, T0) profiles of three boreholes with different points, not sorted """
+    return [pd.DataFrame({'eta': [0.0, -2.0, -5.0, -10.0], 'T0': [270.0, 271.5, 272.5, 274.0]}),
+            pd.DataFrame({'eta': [-10.0, 0.0, -1.0], 'T0': [275.0, 265.0, 268.0]}),
+            pd.DataFrame({'eta': [0.0, -0.5, -3.0, -7.0, -8.0, -10.0], 'T0': [260.0, 262.0, 268.0, 271.0, 271.5, 273.0]})]
+
+
+def test_initial_condition_ensemble_linear():
+    eta = np.r_[0.0, np.linspace(-0.05, -9.95, 100), -10.0, -2.0]
+    members = _members()
+    expected = np.vstack([np.interp(eta, *m.sort_values('eta')[['eta', 'T0']].to_numpy().T) for m in members])
+    ic = set_initial_condition_ensemble(members, eta, 'linear')
+    np.testing.assert_allclose(ic, expected, rtol=1e-12)
+    for m, member_ic in zip(members, ic):
+        np.testing.assert_allclose(member_ic, set_initial_condition(m, eta, 'linear'), rtol=1e-12)
+
+    table = pd.concat([m.assign(member=i) for i, m in enumerate(members)])
+    np.testing.assert_array_equal(set_initial_condition_ensemble(table, eta, 'linear'), ic)
+
+
+def test_initial_condition_ensemble_shared_points_and_quadratic():
+    eta = np.linspace(-0.05, -9.95, 50)
+    shared = [_members()[0], _members()[0].assign(T0=lambda d: d['T0'] + 1)]
+    ic = set_initial_condition_ensemble(shared, eta, 'cubic')
+    np.testing.assert_allclose(ic[1] - ic[0], 1.0)
+    quadratic = set_initial_condition_ensemble(_members(), eta, 'quadratic')
+    for m, member_ic in zip(_members(), quadratic):
+        np.testing.assert_allclose(member_ic, set_initial_condition(m, eta, 'quadratic'), rtol=1e-12)
+
+
+def test_initial_condition_ensemble_errors():
+    members = _members()
+    with pytest.raises(ValueError):
+        set_initial_condition_ensemble(members, np.array([-11.0, -1.0]), 'linear')
+    with pytest.raises(ValueError):
+        set_initial_condition_ensemble(members + [pd.DataFrame({'eta': [0.0], 'T0': [270.0]})], np.array([0.0]), 'linear')
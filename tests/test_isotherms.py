@@ -0,0 +1,19 @@
+import numpy as np
+
+from ftu.isotherms import extract_alt_isotherm_depth
+from ftu.time_axis import decode_time
+
+
+def test_alt_with_datetime64_times():
+    # AllVariables.time is datetime64; three years of daily values, active layer 0.8 m thick
+    t = decode_time(np.arange(3 * 365), 'days since 2001-01-01')
+    depth = np.array([0.1, 0.5, 1.0, 2.0, 5.0])
+    summer = np.sin(np.arange(len(t)) / 365 * 2 * np.pi) > 0
+    T = np.where(depth < 0.8, np.where(summer, 2.0, -5.0)[:, None], -2.0)
+    iso = np.ma.masked_array(np.full((len(t), 2), -0.8), mask=np.c_[~summer, np.ones(len(t), bool)])
+    hs = np.zeros(len(t))
+
+    alt = extract_alt_isotherm_depth(T, t, iso, depth, hs)
+
+    assert len(alt) == len(t)
+    assert np.allclose(alt['alt'].dropna().astype(float), 0.8)
@@ -0,0 +1,91 @@
+import netCDF4 as nc
+import numpy as np
+import pandas as pd
+import pytest
+
+from ftu.FreThaw1D_gridcreator import main, set_initial_condition
+from ftu.Grid import Grid
+from ftu.memory_grid import MemoryGrid, create_grid
+
+from conftest import grid_args, grid_tables, write_grid_inputs
+
+
+@pytest.fixture
+def grid_file(tmp_path, capsys):
+    files = write_grid_inputs(tmp_path / 'inputs')
+    output = tmp_path / 'grid.nc'
+    main(grid_args(files, output, shallow_depth=4.0, shallow_output_file_name=str(tmp_path / 'shallow.nc')))
+    return output
+
+
+def _assert_same_grid(grid, expected):
+    assert sorted(grid.vars) == sorted(expected.vars)
+    for name in expected.vars:
+        np.testing.assert_array_equal(np.asarray(grid[name]), np.asarray(expected[name]), err_msg=name)
+        assert grid._units(name) == expected._units(name)
+
+
+def _assert_same_file(path, expected):
+    with nc.Dataset(path) as ds, nc.Dataset(expected) as ref:
+        assert ds.dimensions.keys() == ref.dimensions.keys()
+        for name in ref.variables:
+            np.testing.assert_array_equal(ds[name][:], ref[name][:], err_msg=name)
+            assert ds[name].dtype == ref[name].dtype
+
+
+def test_from_file(grid_file):
+    with Grid(grid_file) as grid:
+        _assert_same_grid(MemoryGrid.from_file(grid_file), grid)
+
+
+def test_create_grid_as_main(grid_file, tmp_path):
+    # the tables as main reads them (the .csv files round floats)
+    grid, ic, parameter = (pd.read_csv(tmp_path / 'inputs' / f"{n}.csv") for n in ('grid', 'ic', 'parameter'))
+    with Grid(grid_file) as expected:
+        _assert_same_grid(create_grid(grid, ic, parameter, dz_min=0.01, grid_type='classical'), expected)
+
+
+def test_shallow(grid_file, tmp_path):
+    shallow = MemoryGrid.from_file(grid_file).shallow(4.0)
+    with Grid(tmp_path / 'shallow.nc') as expected:
+        _assert_same_grid(shallow, expected)
+    _assert_same_file(shallow.save(tmp_path / 'saved_shallow.nc'), tmp_path / 'shallow.nc')
+
+
+def test_save(grid_file, tmp_path):
+    grid = MemoryGrid.from_file(grid_file)
+    _assert_same_file(grid.save(tmp_path / 'saved.nc'), grid_file)
+    with Grid(tmp_path / 'saved.nc') as saved, nc.Dataset(grid_file) as ds:
+        _assert_same_grid(grid, saved)
+        assert saved.nc.getncattr('title') == ds.getncattr('title')
+
+
+def test_with_ic(grid_file):
+    grid = MemoryGrid.from_file(grid_file)
+    eta = grid.data['eta'][:int(grid.data['KMAX'][0])]
+    ic = set_initial_condition(grid_tables()[1].assign(T0=260.0), eta, 'linear')
+    warm = grid.with_ic(ic)
+    np.testing.assert_allclose(warm['ic'], 260.0)
+    assert warm.data['eta'] is grid.data['eta']
+    assert not np.allclose(grid['ic'], 260.0)
+
+
+def test_save_ensemble(grid_file, tmp_path):
+    grid = MemoryGrid.from_file(grid_file)
+    kmax = np.size(grid.data['eta'])
+    ic = np.vstack([np.full(kmax, 270.0), np.full(kmax, 275.0)])
+
+    files = grid.save_ensemble(str(tmp_path / 'member_{member}.nc'), ic, per_member=True)
+    assert len(files) == 2
+    for member, f in enumerate(files):
+        with Grid(f) as saved:
+            _assert_same_grid(grid.with_ic(ic[member]), saved)
+
+    single = grid.save_ensemble(str(tmp_path / 'ensemble.nc'), ic)[0]
+    with nc.Dataset(single) as ds:
+        assert ds['icEnsemble'].dimensions == ('member', 'z')
+        np.testing.assert_array_equal(ds['icEnsemble'][:], ic)
+        np.testing.assert_array_equal(ds['ic'][:], grid.data['ic'])
+
+    with pytest.raises(ValueError):
+        grid.save_ensemble(str(tmp_path / 'bad.nc'), ic[:, 1:])
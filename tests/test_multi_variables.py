@@ -0,0 +1,86 @@
+import netCDF4 as nc
+import numpy as np
+import pytest
+
+from ftu.dataset_pool import DatasetPool
+from ftu.multi_variables import MultiVariables
+
+from conftest import write_output
+
+
+def _segments(tmp_path, n=5, steps=24):
+    return [write_output(tmp_path / f'segment_{i}.nc', n_time=steps, start=i * steps) for i in range(n)]
+
+
+def test_segments_are_opened_when_read(tmp_path):
+    files = _segments(tmp_path)
+    pool = DatasetPool()
+    mv = MultiVariables(files, pool=pool)
+    assert len(pool) == 0
+
+    blocks = list(mv.iter_blocks(['T'], stop=10))
+    assert len(blocks) == 1 and blocks[0][1]['T'].shape == (10, 5)
+    assert len(pool) == 1
+
+
+def test_read_concatenates_segments(tmp_path):
+    mv = MultiVariables(_segments(tmp_path))
+    t, values = mv.read(['T'], '2000-01-01 12:00', '2000-01-02 12:00')
+    assert len(t) == 24 and values['T'].shape == (24, 5)
+    assert t[0] == np.datetime64('2000-01-01T12:00')
+
+
+def test_read_empty_window(tmp_path):
+    mv = MultiVariables(_segments(tmp_path))
+    t, values = mv.read(['T', 'time'], '1990-01-01', '1991-01-01')
+    assert len(t) == 0
+    assert values['T'].shape[0] == 0 and values['T'].ndim == 2
+    assert values['time'].shape == (0,)
+
+
+def test_time_index_opens_segments_up_to_the_window(tmp_path):
+    pool = DatasetPool()
+    mv = MultiVariables(_segments(tmp_path), pool=pool)
+    assert mv.time_index('2000-01-02 06:00', '2000-01-02 12:00') == slice(30, 36)
+    assert len(pool) == 2
+    assert mv.time_index('1990-01-01', '1990-02-01') == slice(0, 0)
+    assert mv.time_index('2001-01-01') == slice(120, 120)
+
+
+def test_noleap_segments(tmp_path):
+    files = [write_output(tmp_path / f'segment_{i}.nc', n_time=200, start=i * 200,
+                          units='days since 2001-01-01', calendar='noleap') for i in range(2)]
+    with MultiVariables(files) as mv:
+        assert mv.time_index('2001-07-01', '2001-08-01') == slice(181, 212)
+        t, values = mv.read(['T'], '2001-07-01', '2001-08-01')
+        assert len(t) == 31 and values['T'].shape == (31, 5)
+        assert mv.bounds.shape == (2, 2) and mv.bounds[1, 1].year == 2002
+        assert mv.get('T', atheight=-1.0, start='2001-07-01', end='2001-08-01').shape == (31,)
+
+
+def test_height_range_reads_the_same_nodes_in_every_segment(tmp_path):
+    files = _segments(tmp_path, n=2)
+    with nc.Dataset(files[1], 'a') as ds:
+        h = ds['height'][:]
+        ds['height'][:] = np.where(h != 0, h + 1, 0)  # 1.5, 0.5, -0.5, ...
+    with MultiVariables(files) as mv:
+        _, values = mv.read(['T', 'height'], height=(-1.2, 0.6))
+        assert values['T'].shape == (48, 3)
+        assert values['height'][:24, 0].tolist() == [0.5] * 24 and values['height'].mask[:24, 2].all()
+        assert values['height'].mask[24:, 0].all() and values['height'][24:, 1].tolist() == [0.5] * 24
+
+
+def test_height_range_over_different_grids_raises(tmp_path):
+    files = [write_output(tmp_path / 'shallow.nc', n_time=24, n_k=4),
+             write_output(tmp_path / 'full.nc', n_time=24, n_k=6, start=24)]
+    with MultiVariables(files) as mv:
+        with pytest.raises(ValueError):
+            mv.read(['T'], height=(-1, 0))
+
+
+def test_get_time_window(tmp_path):
+    with MultiVariables(_segments(tmp_path)) as mv:
+        T = mv.get('T', atheight=[0.0, -1.0], start='2000-01-01 12:00', end='2000-01-02 12:00')
+        assert T.shape == (24, 2)
+        assert np.allclose(T, mv.get('T', atheight=[0.0, -1.0])[12:36])
+        assert mv.get('T', atheight=0.0, start='1990-01-01', end='1990-01-02').shape == (0,)
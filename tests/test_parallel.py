@@ -0,0 +1,18 @@
+import pytest
+
+from ftu.parallel import error_message, run_per_item
+
+
+def _scaled(x, factor):
+    return x * factor
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_results_in_item_order(jobs):
+    done = []
+    assert run_per_item(_scaled, range(10), (3,), jobs, callback=done.append) == [3 * i for i in range(10)]
+    assert sorted(done) == [3 * i for i in range(10)]
+
+
+def test_error_message():
+    assert error_message(KeyError('z')) == "KeyError: 'z'"
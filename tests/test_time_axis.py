@@ -0,0 +1,50 @@
+import cftime
+import numpy as np
+
+from ftu.all_variables import AllVariables
+from ftu.time_axis import decode_time, time_slice
+
+from conftest import write_output
+
+
+def test_standard_calendar_is_datetime64():
+    t = decode_time(np.ma.masked_array([0, 1.5, 2], mask=[0, 0, 1]), 'hours since 2000-01-01 00:00')
+    assert t.dtype == np.dtype('datetime64[ns]')
+    assert t[1] == np.datetime64('2000-01-01T01:30')
+    assert np.isnat(t[2])
+
+
+def test_noleap_falls_back_to_cftime():
+    t = decode_time(np.array([58, 59]), 'days since 2001-01-01', 'noleap')
+    assert isinstance(t[0], cftime.DatetimeNoLeap)
+    assert (t[1].month, t[1].day) == (3, 1)
+
+
+def test_early_reference_falls_back_to_num2date():
+    t = decode_time(np.array([1]), 'days since 1500-01-01')
+    assert t[0].year == 1500
+
+
+def test_noleap_output_file(tmp_path):
+    path = write_output(tmp_path / 'noleap.nc', units='days since 2001-01-01', calendar='noleap')
+    with AllVariables(path) as av:
+        assert isinstance(av.time[0], cftime.DatetimeNoLeap)
+
+
+def test_time_slice():
+    t = np.arange(48)
+    assert time_slice(t, 'hours since 2000-01-01', 'standard', '2000-01-01 12:00', '2000-01-02') == slice(12, 24)
+    assert time_slice(t, 'hours since 2000-01-01', 'standard', None, None) == slice(0, 48)
+
+
+def test_noleap_time_window(tmp_path):
+    path = write_output(tmp_path / 'noleap.nc', n_time=400, units='days since 2001-01-01', calendar='noleap')
+    with AllVariables(path) as av:
+        assert av.time_index('2001-01-10', '2001-01-20') == slice(9, 19)
+        # 2002-01-01 is day 365 of a noleap calendar (366 after a leap year would be wrong)
+        assert av.time_index(cftime.DatetimeNoLeap(2002, 1, 1)) == slice(365, 400)
+
+        t, values = av.read(['T'], '2001-01-10', '2001-01-20')
+        assert len(t) == 10 and isinstance(t[0], cftime.DatetimeNoLeap) and t[0].day == 10
+        assert values['T'].shape == (10, 6)
+        assert av.get('T', atdepth=1.0, start='2001-01-10', end='2001-01-20').shape == (10,)
@@ -0,0 +1,38 @@
+import numpy as np
+
+from ftu.validation import check_grid
+
+
+def _grid(length=None):
+    eta_dual = np.array([-3., -2, -1, 0])
+    eta = np.array([-2.5, -1.5, -0.5])
+    data = {'KMAX': np.array([3]), 'eta': eta, 'etaDual': eta_dual, 'z': eta + 3, 'zDual': eta_dual + 3,
+            'spaceDelta': np.array([0.5, 1, 1, 0.5]), 'volumeSoil': np.ones(3),
+            'parameterID': np.array([0, 0, 1]), 'thetaS': np.array([0.4, 0.4])}
+    if length is not None:
+        for name in ('eta', 'etaDual', 'z', 'zDual', 'spaceDelta', 'volumeSoil', 'parameterID'):
+            padded = np.zeros(length)
+            padded[:data[name].size] = data[name]
+            data[name] = padded
+    return data
+
+
+def test_valid_grid():
+    assert check_grid(_grid()) == []
+
+
+def test_padding_after_kmax_is_ignored():
+    # as written by extract_grid_for_shallow_spinup (_padded) or save_ensemble
+    assert check_grid(_grid(length=10)) == []
+
+
+def test_short_arrays():
+    data = _grid()
+    data['z'] = data['z'][:2]
+    assert check_grid(data)[0].startswith("sizes do not match KMAX=3: z (2)")
+
+
+def test_bad_parameter_id():
+    data = _grid(length=10)
+    data['parameterID'][2] = 5
+    assert any('parameterID' in p for p in check_grid(data))